@@ -0,0 +1,51 @@
+import sys
+from json import dumps
+from os.path import abspath, dirname
+from timeit import timeit
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from telebotapi import JsonCodec, OrjsonCodec, Update  # noqa: E402
+from payloads import updates  # noqa: E402
+
+MARKUP = {"inline_keyboard": [[{"text": f"option {i}.{j}", "callback_data": f"opt:{i}:{j}"} for j in range(3)]
+                              for i in range(4)]}
+
+
+def bodies(n, seed):
+    # getUpdates answers of up to 100 updates, as the server sends them
+    payloads = updates(n, seed)
+    return [dumps({"ok": True, "result": payloads[i:i + 100]}).encode() for i in range(0, n, 100)]
+
+
+def recorded(path):
+    # one getUpdates response body per line, e.g. captured from a running bot
+    with open(path, "rb") as f:
+        return [line for line in f if line.strip()]
+
+
+def codecs():
+    yield JsonCodec()
+    try:
+        yield OrjsonCodec()
+    except ImportError:
+        print("orjson is not installed, only the stdlib codec is measured")
+
+
+def main(source="10000", repeat=5, seed=0):
+    data = bodies(int(source), seed) if source.isdigit() else recorded(source)
+    count = sum(len(JsonCodec().loads(b)["result"]) for b in data)
+    print(f"{len(data)} responses, {count} updates, {sum(map(len, data)) / 1024:.0f} KiB")
+    for codec in codecs():
+        decode = timeit(lambda: [codec.loads(b) for b in data], number=repeat) / (repeat * count) * 1e6
+        lazy = timeit(lambda: [Update(u, lazy=True) for b in data for u in codec.loads(b)["result"]],
+                      number=repeat) / (repeat * count) * 1e6
+        eager = timeit(lambda: [Update(u) for b in data for u in codec.loads(b)["result"]],
+                       number=repeat) / (repeat * count) * 1e6
+        encode = timeit(lambda: codec.dumps(MARKUP), number=repeat * 10000) / (repeat * 10000) * 1e6
+        print(f"{codec.name:<8} decode {decode:>6.2f}  +lazy {lazy:>6.2f}  +eager {eager:>6.2f} us/update  "
+              f"reply_markup {encode:>5.2f} us")
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2], *map(int, sys.argv[2:]))
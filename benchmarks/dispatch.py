@@ -0,0 +1,27 @@
+import sys
+from collections import Counter
+from os.path import abspath, dirname
+from timeit import timeit
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from telebotapi import Message, Update  # noqa: E402
+from payloads import updates  # noqa: E402
+
+
+def per_update(fn, payloads, repeat):
+    return timeit(lambda: [fn(u) for u in payloads], number=repeat) / (repeat * len(payloads)) * 1e6
+
+
+def main(n=10000, repeat=5, seed=0):
+    payloads = updates(n, seed)
+    print("content types:", dict(Counter(Message.resolve(u)[0].__name__ for u in payloads)))
+    for name, fn in (("resolve", Message.resolve),
+                     ("cast", Message.cast),
+                     ("update lazy", lambda u: Update(u, lazy=True)),
+                     ("update eager", Update)):
+        print(f"{name:<14}{per_update(fn, payloads, repeat):>8.2f} us/update")
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
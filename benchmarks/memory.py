@@ -0,0 +1,128 @@
+import argparse
+import gc
+import io
+import os
+import subprocess
+import sys
+import tarfile
+import tempfile
+import tracemalloc
+from os.path import abspath, dirname
+
+ROOT = dirname(dirname(abspath(__file__)))
+# set by --baseline for the child process that imports an older copy of the library
+sys.path.insert(0, os.environ.get("TELEBOTAPI_PACKAGE", ROOT))
+
+from telebotapi import Update  # noqa: E402
+from payloads import updates  # noqa: E402
+
+
+def raw(u):
+    return u
+
+
+def eager(u):
+    return Update(u)
+
+
+def lazy(u):
+    return Update(u, lazy=True)
+
+
+def compact(u):
+    return Update(u).drop_raw()
+
+
+def measure(build, payloads):
+    # the payloads are created outside the traced section, so raw dicts kept alive by a model count as zero:
+    # what is measured is what the model adds on top of the decoded json
+    gc.collect()
+    tracemalloc.start()
+    kept = [build(u) for u in payloads]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def measure_owned(build, n, seed, only=None):
+    # same, but payloads are decoded inside the traced section, like they are when coming from the network
+    gc.collect()
+    tracemalloc.start()
+    kept = [build(u) for i, u in enumerate(updates(n, seed)) if only is None or i in only]
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def decodable(payloads):
+    # older versions reject some of the generated updates, every mode is measured on the ones they accept
+    only = set()
+    for i, u in enumerate(payloads):
+        try:
+            eager(u)
+        except (KeyError, TypeError):
+            continue
+        only.add(i)
+    return only
+
+
+def measure_eager(n, seed):
+    payloads = updates(n, seed)
+    only = decodable(payloads)
+    print(measure(eager, [u for i, u in enumerate(payloads) if i in only]), measure_owned(eager, n, seed, only))
+    print(" ".join(map(str, sorted(only))))
+
+
+def baseline(rev, n, seed):
+    # the library as it was at rev, eagerly decoding into dict backed objects before the slot based models,
+    # measured in a child process so the two versions are never imported together
+    archive = subprocess.run(["git", "archive", rev, "telebotapi"], cwd=ROOT, check=True,
+                             stdout=subprocess.PIPE).stdout
+    with tempfile.TemporaryDirectory() as tmp:
+        with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+            tar.extractall(tmp)
+        out = subprocess.run([sys.executable, abspath(__file__), str(n), str(seed), "--measure-eager"], check=True,
+                             stdout=subprocess.PIPE, env=dict(os.environ, TELEBOTAPI_PACKAGE=tmp)).stdout
+    sizes, only = out.decode().split("\n", 1)
+    added, owned = map(int, sizes.split())
+    return added, owned, set(map(int, only.split()))
+
+
+def row(name, added, owned, n, reference):
+    vs = f"{owned / reference:>11.2f}x" if reference else ""
+    print(f"{name:<10}{added:>16}{owned:>18}{owned / n:>14.1f}{vs}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="memory held by decoded updates")
+    parser.add_argument("n", nargs="?", type=int, default=10000)
+    parser.add_argument("seed", nargs="?", type=int, default=0)
+    parser.add_argument("--baseline", metavar="REV",
+                        help="git revision to compare against, e.g. the last one before the lazy and slot based "
+                             "models; its eager decoding is the reference for the savings")
+    parser.add_argument("--measure-eager", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.measure_eager:
+        return measure_eager(args.n, args.seed)
+    payloads = updates(args.n, args.seed)
+    reference = only = None
+    n = args.n
+    if args.baseline:
+        added, reference, only = baseline(args.baseline, args.n, args.seed)
+        n = len(only)
+        payloads = [u for i, u in enumerate(payloads) if i in only]
+        if n < args.n:
+            print(f"{args.baseline} cannot decode {args.n - n} of {args.n} updates, every mode is measured on the "
+                  f"other {n}")
+    print(f"{'mode':<10}{'added bytes':>16}{'retained bytes':>18}{'per update':>14}"
+          + (f"{'vs baseline':>12}" if args.baseline else ""))
+    if args.baseline:
+        row("baseline", added, reference, n, reference)
+    for build in (raw, eager, lazy, compact):
+        row(build.__name__, measure(build, payloads), measure_owned(build, args.n, args.seed, only), n, reference)
+
+
+if __name__ == "__main__":
+    main()
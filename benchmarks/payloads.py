@@ -0,0 +1,82 @@
+from random import Random
+
+FIRST_NAMES = ("Ann", "Bob", "Carla", "Dario", "Elena", "Fabio")
+MEDIA = ("video", "voice", "document", "location")
+WORDS = ("hello", "world", "ok", "thanks", "see", "you", "tomorrow", "what", "about", "this")
+
+
+def user(rnd, id_):
+    u = {"id": id_, "is_bot": False, "first_name": rnd.choice(FIRST_NAMES)}
+    if rnd.random() < .7:
+        u["username"] = f"user{id_}"
+    if rnd.random() < .8:
+        u["language_code"] = rnd.choice(("en", "it", "de"))
+    return u
+
+
+def chat(rnd, id_, sender):
+    if id_ > 0:
+        return {"id": id_, "type": "private", "first_name": sender["first_name"],
+                "username": sender.get("username", "")}
+    return {"id": id_, "type": "supergroup", "title": f"group {-id_}"}
+
+
+def text(rnd):
+    words = [rnd.choice(WORDS) for _ in range(rnd.randint(1, 12))]
+    entities = []
+    if rnd.random() < .3:
+        words.insert(0, "/start")
+        entities.append({"offset": 0, "length": 6, "type": "bot_command"})
+    return " ".join(words), entities
+
+
+def message(rnd, i, chat_id, kind):
+    sender = user(rnd, chat_id if chat_id > 0 else rnd.randint(1, 10 ** 9))
+    m = {"message_id": i, "from": sender, "chat": chat(rnd, chat_id, sender), "date": 1700000000 + i}
+    if kind == "text":
+        m["text"], entities = text(rnd)
+        if entities:
+            m["entities"] = entities
+        if rnd.random() < .1:
+            m["reply_to_message"] = message(rnd, i - 1, chat_id, "text")
+    elif kind == "photo":
+        m["photo"] = [{"file_id": f"photo{i}_{s}", "file_unique_id": f"u{i}_{s}", "file_size": 1000 * s,
+                       "width": 90 * s, "height": 60 * s} for s in (1, 4, 10)]
+        if rnd.random() < .5:
+            m["caption"], _ = text(rnd)
+    elif kind == "sticker":
+        m["sticker"] = {"file_id": f"sticker{i}", "file_unique_id": f"s{i}", "file_size": 20000,
+                        "width": 512, "height": 512, "emoji": "\U0001f600", "set_name": "pack", "is_animated": False}
+    elif kind == "video":
+        m["video"] = {"file_id": f"video{i}", "file_unique_id": f"v{i}", "file_size": 10 ** 6, "width": 640,
+                      "height": 360, "duration": rnd.randint(1, 120), "mime_type": "video/mp4"}
+    elif kind == "voice":
+        m["voice"] = {"file_id": f"voice{i}", "file_unique_id": f"o{i}", "file_size": 8000,
+                      "duration": rnd.randint(1, 60), "mime_type": "audio/ogg"}
+    elif kind == "document":
+        m["document"] = {"file_id": f"doc{i}", "file_unique_id": f"d{i}", "file_size": 5000,
+                         "file_name": f"file{i}.pdf", "mime_type": "application/pdf"}
+    elif kind == "location":
+        m["location"] = {"latitude": rnd.uniform(-90, 90), "longitude": rnd.uniform(-180, 180)}
+    if kind in ("video", "document") and rnd.random() < .5:
+        m["caption"], _ = text(rnd)
+    return m
+
+
+def update(rnd, i, chats=1000):
+    chat_id = rnd.randint(1, chats)
+    if rnd.random() < .3:
+        chat_id = -chat_id
+    r = rnd.random()
+    if r < .08:
+        return {"update_id": i, "callback_query": {
+            "id": str(i), "from": user(rnd, abs(chat_id)), "chat_instance": str(chat_id),
+            "data": f"btn:{rnd.randint(0, 9)}", "message": message(rnd, i, chat_id, "text")}}
+    kind = "text" if r < .75 else "photo" if r < .85 else "sticker" if r < .9 else rnd.choice(MEDIA)
+    return {"update_id": i, "message": message(rnd, i, chat_id, kind)}
+
+
+def updates(n, seed=0, chats=1000, start=1):
+    # a deterministic mix of text, photo, sticker and callback updates close to what a busy bot receives
+    rnd = Random(seed)
+    return [update(rnd, i, chats) for i in range(start, start + n)]
@@ -0,0 +1,41 @@
+import sys
+from os.path import abspath, dirname
+from time import perf_counter
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from telebotapi import TelegramBot, Update  # noqa: E402
+from telebotapi.sharding import ShardedDispatcher  # noqa: E402
+from payloads import updates  # noqa: E402
+
+WORK = 20000
+
+
+def handle(u):
+    # stands in for a cpu bound handler, about a millisecond of pure python
+    sum(i * i for i in range(WORK))
+
+
+def setup(index):
+    return handle
+
+
+def main(n=2000, max_workers=4, seed=0):
+    payloads = updates(n, seed)
+    bot = TelegramBot("0" * 46, lazy=True, rate_limiter=False)
+    base = None
+    workers = 1
+    while workers <= max_workers:
+        with ShardedDispatcher(bot, setup, workers) as d:
+            start = perf_counter()
+            for u in payloads:
+                d.submit(Update(u, lazy=True))
+            d.join()
+            elapsed = perf_counter() - start
+        base = base or elapsed
+        print(f"{workers:>2} workers {n / elapsed:>10.0f} updates/s  speedup {base / elapsed:.2f}x")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main(*map(int, sys.argv[1:]))
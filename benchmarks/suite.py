@@ -0,0 +1,287 @@
+import argparse
+import asyncio
+import gc
+import sys
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from os.path import abspath, dirname
+from time import monotonic, perf_counter, sleep
+
+sys.path.insert(0, dirname(dirname(abspath(__file__))))
+
+from telebotapi import TelegramBot, AsyncTelegramBot, Chat, Dispatcher, SessionTransport  # noqa: E402
+from telebotapi.aio import AiohttpTransport, ExecutorTransport, aiohttp, wait_for as async_wait_for  # noqa: E402
+from telebotapi.daemon import Condition, Filter, Forks, wait_for  # noqa: E402
+from telebotapi.fakeserver import FakeBotAPI  # noqa: E402
+from payloads import updates  # noqa: E402
+
+TOKEN = "0" * 46
+STOP = "__stop__"
+
+
+def stop_update(i):
+    return {"update_id": i, "message": {"message_id": i, "date": 0, "text": STOP,
+                                        "from": {"id": 1, "is_bot": False, "first_name": "stop"},
+                                        "chat": {"id": 1, "type": "private"}}}
+
+
+def is_stop(m):
+    return getattr(m, "text", None) == STOP
+
+
+def percentile(values, p):
+    s = sorted(values)
+    return s[min(int(len(s) * p), len(s) - 1)] if s else 0.
+
+
+def sync_bot(api, **kwargs):
+    return TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False, poll_timeout=1,
+                       **kwargs)
+
+
+def poll_sync(api, n, mode):
+    # poll -> Update -> wait_for, with the callbacks inline, on a dispatcher or inside a fork
+    seen = [0]
+
+    def count(m):
+        seen[0] += 1
+
+    bot = sync_bot(api, lazy=True)
+    first = api.clear()
+    api.push(*updates(n, start=first))
+    api.push(stop_update(first + n))
+    conditions = [Condition(Filter(is_stop), stop_return=True)]
+    forks = None
+    dispatcher = None
+    if mode == "forks":
+        # one fork seeing every update and never completing; counting in its filter keeps the fork from
+        # printing its "matched, but still running" warning for each update
+        forks = Forks()
+        forks.attach(completed=Condition(Filter(lambda m: count(m) and False), stop_return=True))
+    else:
+        conditions.insert(0, Condition(callback=count))
+    if mode == "dispatcher":
+        dispatcher = Dispatcher(4)
+    start = perf_counter()
+    bot.bootstrap()
+    wait_for(bot, *conditions, forks=forks, dispatcher=dispatcher)
+    if dispatcher is not None:
+        dispatcher.close()
+    elapsed = perf_counter() - start
+    bot.daemon.active = False
+    return n / elapsed
+
+
+def poll_async(api, n, transport):
+    seen = [0]
+
+    def count(m):
+        seen[0] += 1
+
+    async def run():
+        t = AiohttpTransport(api.base_url) if transport == "aiohttp" else \
+            ExecutorTransport(SessionTransport(api.base_url))
+        bot = AsyncTelegramBot(TOKEN, transport=t, rate_limiter=False, poll_timeout=1, lazy=True)
+        first = api.clear()
+        api.push(*updates(n, start=first))
+        api.push(stop_update(first + n))
+        start = perf_counter()
+        await bot.bootstrap()
+        await async_wait_for(bot, Condition(callback=count), Condition(Filter(is_stop), stop_return=True))
+        elapsed = perf_counter() - start
+        await bot.close()
+        return n / elapsed
+
+    return asyncio.run(run())
+
+
+def sends_sync(api, n, workers):
+    bot = sync_bot(api, max_inflight=workers)
+    bot.bootstrapped = True
+    start = perf_counter()
+    with ThreadPoolExecutor(workers) as ex:
+        list(ex.map(lambda i: bot.sendMessage(Chat.by_id(i % 1000 + 1), "benchmark"), range(n)))
+    return n / (perf_counter() - start)
+
+
+def sends_async(api, n, workers, transport):
+    async def run():
+        t = AiohttpTransport(api.base_url) if transport == "aiohttp" else \
+            ExecutorTransport(SessionTransport(api.base_url), max_workers=workers)
+        bot = AsyncTelegramBot(TOKEN, transport=t, rate_limiter=False, max_inflight=workers)
+        bot.bootstrapped = True
+        start = perf_counter()
+        await asyncio.gather(*[bot.sendMessage(Chat.by_id(i % 1000 + 1), "benchmark") for i in range(n)])
+        elapsed = perf_counter() - start
+        await bot.close()
+        return n / elapsed
+
+    return asyncio.run(run())
+
+
+def latency(api, n, interval):
+    # from the moment an update is available on the server to its callback running
+    delays = []
+
+    def record(m):
+        delays.append(monotonic() - api.pushed[int(m.id)])
+
+    bot = sync_bot(api, lazy=True)
+    first = api.clear()
+    bot.bootstrap()
+
+    def feed():
+        for u in updates(n, start=first):
+            api.push(u)
+            sleep(interval)
+        api.push(stop_update(first + n))
+
+    feeder = ThreadPoolExecutor(1)
+    feeder.submit(feed)
+    wait_for(bot, Condition(Filter(is_stop), stop_return=True), Condition(callback=record))
+    feeder.shutdown()
+    bot.daemon.active = False
+    return percentile(delays, .5) * 1e3, percentile(delays, .99) * 1e3
+
+
+def faults(api, n, workers):
+    # chat 1 gets three 429s and one answer that never comes in time, which is raised rather than sent twice;
+    # the other chats must keep flowing
+    bot = sync_bot(api, auto_retry=True, max_inflight=workers)
+    bot.bootstrapped = True
+    api.inject("429", method="sendMessage", chat_id=1, count=3, retry_after=1)
+    api.inject("timeout", method="sendMessage", chat_id=1, delay=6.)
+    finished = {}
+    failed = []
+    start = perf_counter()
+
+    def send(i):
+        chat_id = i % 50 + 1
+        try:
+            bot.sendMessage(Chat.by_id(chat_id), "benchmark")
+        except Exception as e:
+            failed.append(e)
+        finished[chat_id] = perf_counter() - start
+
+    with ThreadPoolExecutor(workers) as ex:
+        list(ex.map(send, range(n)))
+    others = max(v for k, v in finished.items() if k != 1)
+    return n / (perf_counter() - start), finished[1], others, len(failed)
+
+
+def edits(api, n, interval):
+    # progress messages edited far more often than the coalescer lets through
+    bot = sync_bot(api)
+    bot.bootstrapped = True
+    messages = [bot.sendMessage(Chat.by_id(i + 1), "0%") for i in range(20)]
+    before = api.calls["editMessageText"]
+    start = perf_counter()
+    with bot.edit_coalescer(interval) as coalescer:
+        for i in range(n):
+            coalescer.edit_text(messages[i % len(messages)], f"{i * 100 // n}%")
+            sleep(.0005)
+    return n, api.calls["editMessageText"] - before, perf_counter() - start
+
+
+def uploads(api, n, size, transport=None):
+    # sendDocument with a known size, sent with a Content-Length, and from an iterator, sent chunked
+    payload = b"x" * size
+
+    def chunks():
+        for i in range(0, size, 64 << 10):
+            yield payload[i:i + (64 << 10)]
+
+    def check(r, chunked):
+        # the server saw every byte, a chunked body it did not decode would also break the next request
+        assert r["result"]["document"]["file_size"] == size, (chunked, r["result"])
+
+    results = {}
+    if transport is None:
+        bot = sync_bot(api)
+        bot.bootstrapped = True
+        for chunked in (False, True):
+            start = perf_counter()
+            for i in range(n):
+                check(bot.sendDocument(Chat.by_id(i + 1), chunks() if chunked else payload, name="file.bin"), chunked)
+            results[chunked] = n / (perf_counter() - start)
+        return results
+
+    async def run():
+        t = AiohttpTransport(api.base_url) if transport == "aiohttp" else \
+            ExecutorTransport(SessionTransport(api.base_url))
+        bot = AsyncTelegramBot(TOKEN, transport=t, rate_limiter=False)
+        bot.bootstrapped = True
+        for chunked in (False, True):
+            start = perf_counter()
+            for i in range(n):
+                m = await bot.sendDocument(Chat.by_id(i + 1), chunks() if chunked else payload, name="file.bin")
+                check(m, chunked)
+            results[chunked] = n / (perf_counter() - start)
+        await bot.close()
+
+    asyncio.run(run())
+    return results
+
+
+def backlog_memory(api, n, lazy):
+    bot = sync_bot(api, lazy=lazy, poll_limit=100)
+    bot.poll_timeout = 0
+    bot.bootstrapped = True
+    first = api.clear()
+    api.push(*updates(n, start=first))
+    bot.last_update = first
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    while len(bot.updates) < n:
+        bot.poll()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    bot.updates.clear()
+    return (after - before) / n
+
+
+def main():
+    parser = argparse.ArgumentParser(description="telebotapi against a local fake Bot API server")
+    parser.add_argument("sections", nargs="*",
+                        default=["poll", "send", "latency", "faults", "edits", "uploads", "memory"])
+    parser.add_argument("-n", type=int, default=5000, help="updates or messages per measurement")
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--latency", type=float, default=0., help="added server latency in seconds")
+    args = parser.parse_args()
+    transports = ["aiohttp", "executor"] if aiohttp is not None else ["executor"]
+    with FakeBotAPI(latency=args.latency) as api:
+        if "poll" in args.sections:
+            for mode in ("wait_for", "dispatcher", "forks"):
+                print(f"poll sync {mode:<12}{poll_sync(api, args.n, mode):>10.0f} updates/s")
+            for t in transports:
+                print(f"poll async {t:<11}{poll_async(api, args.n, t):>10.0f} updates/s")
+        if "send" in args.sections:
+            print(f"send sync {'threads':<12}{sends_sync(api, args.n, args.workers):>10.0f} sends/s")
+            for t in transports:
+                print(f"send async {t:<11}{sends_async(api, args.n, args.workers, t):>10.0f} sends/s")
+        if "latency" in args.sections:
+            p50, p99 = latency(api, min(args.n, 500), .002)
+            print(f"end to end latency     p50 {p50:.2f} ms  p99 {p99:.2f} ms")
+        if "faults" in args.sections:
+            rate, faulty, others, failed = faults(api, min(args.n, 1000), args.workers)
+            print(f"send with faults       {rate:>10.0f} sends/s  faulty chat done after {faulty:.2f} s, "
+                  f"others after {others:.2f} s, {failed} failed")
+        if "edits" in args.sections:
+            requested, sent, elapsed = edits(api, args.n, 1.)
+            print(f"coalesced edits        {requested} requested, {sent} sent in {elapsed:.2f} s")
+        if "uploads" in args.sections:
+            size = 1 << 20
+            for t in [None] + transports:
+                r = uploads(api, min(args.n, 100), size, t)
+                print(f"upload {t or 'sync':<16}{r[False]:>10.0f} sized/s {r[True]:>7.0f} chunked/s  "
+                      f"({size >> 20} MiB each)")
+        if "memory" in args.sections:
+            for size in (1000, args.n):
+                for lazy in (False, True):
+                    per = backlog_memory(api, size, lazy)
+                    print(f"backlog {size:>7} {'lazy' if lazy else 'eager':<6}{per:>10.0f} bytes/update")
+
+
+if __name__ == "__main__":
+    main()
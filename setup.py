@@ -11,7 +11,8 @@ setuptools.setup(
       author='Lorenzo Bodini',
       author_email='lorenzo.bodini.private@gmail.com',
       packages=['telebotapi'],
-      python_requires='>=3.6',
+      extras_require={"async": ["aiohttp"]},
+      python_requires='>=3.7',
       license="GPL3",
       platform="All",
       long_description=LONGDESCRIPTION,
@@ -1,7 +1,29 @@
 from .chats import Chat, User
 from .entities import Entity
 from .files import File, PhotoFile, Document
-from .messages import Message, PhotoMessage, CallbackQuery, Sticker, Audio, Text
+from .messages import Message, PhotoMessage, CallbackQuery, Sticker, Audio, Text, Video, Voice, DocumentMessage, \
+    Location
 from .telebotapi import TelegramBot
 from .update import Update
 from . import exceptions
+from .transport import Transport, SessionTransport
+from .inflight import InFlight
+from .aio import AsyncTelegramBot, AsyncBotManager
+from .queues import UpdateQueue
+from .timers import TimerWheel
+from .routing import Route
+from .ratelimit import RateLimiter, TokenBucket
+from .broadcast import Broadcast, Checkpoint, Delivery
+from .offsets import OffsetStore, FileOffsetStore
+from .webhook import WebhookServer
+from .dispatcher import Dispatcher
+from .uploads import InputFile, MultipartBody
+from .downloads import FileCache
+from .chatcache import ChatCache
+from .manager import BotManager
+from .sharding import ShardedDispatcher, HashRing
+from .codec import JsonCodec, OrjsonCodec
+from .metrics import Metrics, Registry
+from .fakeserver import FakeBotAPI
+from .edits import EditCoalescer
+from .retry import RetryPolicy, RetryBudget, CircuitBreaker
@@ -0,0 +1,737 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from datetime import datetime
+from functools import partial
+from inspect import isawaitable
+from queue import Full
+from socket import timeout as socket_timeout
+from time import monotonic, perf_counter
+from requests.exceptions import ChunkedEncodingError, ConnectionError, ConnectTimeout, Timeout
+from .telebotapi import TelegramBot
+from .transport import API_URL, SessionTransport, error_response
+from .retry import Attempts
+from .update import Update
+from .daemon import Condition, Fork, Forks, ExpiredException
+from .broadcast import Broadcast, Delivery
+from .edits import EditCoalescer
+from .webhook import WebhookServer
+from .uploads import CHUNK_SIZE
+from .downloads import Download, deliver
+from .chatcache import ChatCache
+from .codec import default_codec
+from .manager import BotManager, bot_key
+from .dispatcher import handler_name
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+RETRY_ERRORS = (socket_timeout, Timeout, ConnectTimeout, ConnectionError, ChunkedEncodingError, asyncio.TimeoutError)
+if aiohttp is not None:
+    RETRY_ERRORS += (aiohttp.ClientConnectionError, aiohttp.ServerTimeoutError, aiohttp.ClientPayloadError)
+
+
+async def maybe_await(value):
+    if isawaitable(value):
+        return await value
+    return value
+
+
+class AsyncTransport:
+    def __init__(self, base_url=API_URL, codec=None):
+        self.base_url = base_url.rstrip("/")
+        self.codec = default_codec() if codec is None else codec
+
+    def url(self, token, method):
+        return f"{self.base_url}/bot{token}/{method}"
+
+    def file_url(self, token, path):
+        return f"{self.base_url}/file/bot{token}/{path}"
+
+    async def post(self, url, data=None, headers=None, timeout=None):
+        raise NotImplementedError
+
+    async def fetch(self, url, fileobj, timeout=None, chunk_size=CHUNK_SIZE):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+    async def close(self):
+        pass
+
+
+class AiohttpTransport(AsyncTransport):
+    def __init__(self, base_url=API_URL, limit=100, limit_per_host=0, codec=None):
+        if aiohttp is None:
+            raise ImportError("AiohttpTransport requires the aiohttp package")
+        AsyncTransport.__init__(self, base_url, codec)
+        self.limit = limit
+        self.limit_per_host = limit_per_host
+        self.session = None
+        self.requests = 0
+        self.connections = 0
+        self.reused = 0
+
+    async def on_create(self, session, ctx, params):
+        self.connections += 1
+
+    async def on_reuse(self, session, ctx, params):
+        self.reused += 1
+
+    def open(self):
+        # the session binds to the running loop, so it can only be built from a coroutine
+        if self.session is None or self.session.closed:
+            trace = aiohttp.TraceConfig()
+            trace.on_connection_create_end.append(self.on_create)
+            trace.on_connection_reuseconn.append(self.on_reuse)
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.limit, limit_per_host=self.limit_per_host),
+                trace_configs=[trace]
+            )
+        return self.session
+
+    async def post(self, url, data=None, headers=None, timeout=None):
+        # uploads arrive as a MultipartBody in data, already encoded
+        session = self.open()
+        if isinstance(data, dict):
+            data = {k: str(v) for k, v in data.items()}
+        self.requests += 1
+        async with session.post(url, data=data, headers=headers,
+                                timeout=aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout)) as r:
+            try:
+                return self.codec.loads(await r.read())
+            except ValueError:
+                return error_response(r.status, r.reason)
+
+    async def fetch(self, url, fileobj, timeout=None, chunk_size=CHUNK_SIZE):
+        session = self.open()
+        self.requests += 1
+        async with session.get(url, timeout=aiohttp.ClientTimeout(sock_connect=timeout, sock_read=timeout)) as r:
+            if r.status == 200:
+                async for chunk in r.content.iter_chunked(chunk_size):
+                    fileobj.write(chunk)
+            return r.status
+
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "connections": self.connections,
+            "reused": self.reused
+        }
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+
+    def __str__(self):
+        return f"AiohttpTransport({self.base_url})"
+
+    def __repr__(self):
+        return str(self)
+
+
+class ExecutorTransport(AsyncTransport):
+    def __init__(self, transport=None, max_workers=8):
+        if transport is None:
+            transport = SessionTransport(pool_maxsize=max_workers)
+        self.transport = transport
+        AsyncTransport.__init__(self, transport.base_url, transport.codec)
+        self.executor = ThreadPoolExecutor(max_workers, thread_name_prefix="telebotapi-io")
+
+    @property
+    def codec(self):
+        # decoding happens in the wrapped transport
+        return self.transport.codec
+
+    @codec.setter
+    def codec(self, codec):
+        self.transport.codec = codec
+
+    def url(self, token, method):
+        return self.transport.url(token, method)
+
+    def file_url(self, token, path):
+        return self.transport.file_url(token, path)
+
+    async def post(self, url, data=None, headers=None, timeout=None):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, partial(self.transport.post, url, data=data, headers=headers, timeout=timeout)
+        )
+
+    async def fetch(self, url, fileobj, timeout=None, chunk_size=CHUNK_SIZE):
+        return await asyncio.get_running_loop().run_in_executor(
+            self.executor, partial(self.transport.fetch, url, fileobj, timeout=timeout, chunk_size=chunk_size)
+        )
+
+    def stats(self):
+        return self.transport.stats()
+
+    async def close(self):
+        self.executor.shutdown(wait=False)
+        self.transport.close()
+
+    def __str__(self):
+        return f"ExecutorTransport({self.transport})"
+
+    def __repr__(self):
+        return str(self)
+
+
+class AsyncInFlight:
+    def __init__(self, max_inflight=8, max_waiting=None):
+        if max_inflight < 1:
+            raise ValueError("max_inflight must be at least 1")
+        self.max_inflight = max_inflight
+        self.max_waiting = max_waiting
+        self.semaphore = None
+        self.inflight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.
+        self.max_wait = 0.
+
+    async def acquire(self):
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.max_inflight)
+        if self.semaphore.locked() and self.max_waiting is not None and self.waiting >= self.max_waiting:
+            self.rejected += 1
+            raise Full(f"{self.waiting} requests already waiting for a free slot")
+        start = monotonic()
+        self.waiting += 1
+        try:
+            await self.semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        self.inflight += 1
+        waited = monotonic() - start
+        self.total_wait += waited
+        self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def release(self):
+        self.inflight -= 1
+        self.completed += 1
+        self.semaphore.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        await self.acquire()
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def stats(self):
+        started = self.completed + self.inflight
+        return {
+            "inflight": self.inflight,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "total_wait": self.total_wait,
+            "max_wait": self.max_wait,
+            "avg_wait": self.total_wait / started if started else 0.
+        }
+
+
+class AsyncTelegramBot(TelegramBot):
+    def __init__(self, token, name=None, safe_mode=None, max_telegram_timeout=60, auto_retry=None, transport=None,
+                 max_inflight=8, max_waiting=None, poll_timeout=30, poll_limit=None, allowed_updates=None,
+                 max_updates=0, lazy=False, keep_raw=True, rate_limiter=None, offset_store=None, file_cache=None,
+                 chat_cache=None, codec=None, metrics=None, retry_policy=None, circuit_breaker=None):
+        if transport is None:
+            transport = AiohttpTransport(limit=max_inflight + 1) if aiohttp is not None \
+                else ExecutorTransport(max_workers=max_inflight + 1)
+        if chat_cache is None:
+            chat_cache = AsyncChatCache()
+        TelegramBot.__init__(self, token, name=name, safe_mode=safe_mode, max_telegram_timeout=max_telegram_timeout,
+                             auto_retry=auto_retry, transport=transport, poll_timeout=poll_timeout,
+                             poll_limit=poll_limit, allowed_updates=allowed_updates, max_updates=max_updates,
+                             updates_block=False, lazy=lazy,
+                             keep_raw=keep_raw, rate_limiter=rate_limiter, offset_store=offset_store,
+                             file_cache=file_cache, chat_cache=chat_cache, codec=codec,
+                             metrics=metrics, retry_policy=retry_policy, circuit_breaker=circuit_breaker)
+        self.inflight = AsyncInFlight(max_inflight, max_waiting)
+        self.poll_inflight = AsyncInFlight(1)
+        self.poll_lock = None
+
+    async def query(self, method, params, connection=None, headers=None, timeout=5, files=None, progress=None):
+        body, headers, lane, chat_id, limited = self.request(method, params, headers, files, progress)
+        if limited:
+            start = monotonic()
+            wait = self.rate_limiter.reserve(chat_id)
+            if wait > 0:
+                await asyncio.sleep(wait)
+            wait = self.rate_limiter.reserve_global()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self.rate_limiter.record(method, chat_id, monotonic() - start)
+        attempts = Attempts(self, method, params)
+        while True:
+            attempts.begin()
+            try:
+                if body is not None:
+                    body.rewind()
+                async with lane.slot():
+                    start = perf_counter()
+                    r = await self.transport.post(self.transport.url(self.token, method),
+                                                  data=params if body is None else body, headers=headers,
+                                                  timeout=timeout)
+                delay = attempts.answered(r, perf_counter() - start)
+            except RETRY_ERRORS as e:
+                delay = attempts.failed(e)
+                if delay is None:
+                    raise
+            finally:
+                attempts.settle()
+            if delay is None:
+                break
+            await asyncio.sleep(delay)
+        if not r["ok"]:
+            exc, delay = attempts.error(r, limited, chat_id)
+            if delay is None:
+                raise exc
+            await asyncio.sleep(delay)
+            return await self.query(method, params, connection, headers if files is None else None, timeout, files,
+                                    progress)
+        return r
+
+    async def call(self, method, params, cast=None, **kwargs):
+        with self.span(method):
+            r = await self.query(method, params, **kwargs)
+        return r if cast is None else cast(r)
+
+    async def broadcast(self, chats, template, workers=16, checkpoint=None, **kwargs):
+        async for delivery in AsyncBroadcast(self, template, workers, checkpoint, **kwargs).run(chats):
+            yield delivery
+
+    def edit_coalescer(self, interval=1., workers=4, maxsize=10000):
+        return AsyncEditCoalescer(self, interval, workers, maxsize)
+
+    async def download(self, file, destination=None, chunk_size=CHUNK_SIZE):
+        d = Download(self, file, destination)
+        cached = d.cached()
+        if cached is not None:
+            return deliver(cached, destination)
+        while True:
+            path = d.link() or await self.getFile(d.file_id)
+            try:
+                with d.begin() as f:
+                    status = await self.transport.fetch(self.transport.file_url(self.token, path), f,
+                                                        self.upload_timeout, chunk_size)
+            except RETRY_ERRORS as e:
+                delay = d.failed(e)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                d.discard()
+                raise
+            if d.fetched(status, path):
+                return d.commit()
+
+    async def close(self):
+        if self.webhook_server is not None:
+            self.webhook_server.stop()
+        await self.transport.close()
+        if self.offset_store is not None:
+            self.offset_store.close()
+
+    async def bootstrap(self):
+        if self.restore():
+            self.bootstrapped = True
+            return
+        r = await self.getUpdates({"timeout": 0})
+        if len(r["result"]) > 0:
+            self.last_update = r["result"][0]["update_id"]
+        self.bootstrapped = True
+
+    async def webhook(self, url=None, host="0.0.0.0", port=8443, path="/", secret_token=None, ssl_context=None,
+                      max_connections=None, drop_pending_updates=None):
+        self.restore()
+        self.replay(block=False)
+        self.webhook_server = WebhookServer(self, host, port, path, secret_token, ssl_context).start()
+        if url is not None:
+            try:
+                await self.setWebhook(url, secret_token, max_connections, drop_pending_updates)
+            except Exception:
+                self.webhook_server.stop()
+                self.webhook_server = None
+                raise
+        self.bootstrapped = True
+        return self.webhook_server
+
+    async def poll(self):
+        # waits for updates the caller has not seen yet: updates already queued for other consumers do not count,
+        # otherwise a consumer filtering by chat would spin on them without ever yielding to the loop
+        if not self.bootstrapped:
+            raise self.BootstrapException("perform bootstrap before other operations.")
+        if self.poll_lock is None:
+            self.poll_lock = asyncio.Lock()
+        seen = self.fed
+        async with self.poll_lock:
+            self.replay(block=False)
+            if self.fed != seen:
+                # another consumer polled, or the backlog was replayed, while we were waiting for the lock
+                return self.fed - seen
+            if self.webhook_server is not None:
+                # updates are pushed by the webhook thread; cleared before checking, so one fed in between still
+                # wakes the wait up
+                self.updated.clear()
+                if self.fed != seen:
+                    return self.fed - seen
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(None, self.updated.wait, self.poll_timeout or self.daemon_delay)
+                return self.fed - seen
+            p = await self.getUpdates()
+            if p["result"]:
+                # never block the loop on a full queue, what does not fit is fetched again later
+                self.last_update = self.feed(p["result"], block=False)
+            return len(p["result"])
+
+    async def iter_updates(self, from_=None):
+        while True:
+            for u in self.get_updates(from_):
+                yield u
+            if not await self.poll() and not self.poll_timeout:
+                await asyncio.sleep(self.daemon_delay)
+
+    def restart_daemon(self):
+        raise self.BootstrapException("AsyncTelegramBot has no daemon, iterate over iter_updates() instead.")
+
+
+class AsyncChatCache(ChatCache):
+    async def lookup(self, chat_id, fetch):
+        future = asyncio.get_running_loop().create_future()
+        chat, waiting = self.join(chat_id, future)
+        if chat is not None:
+            return chat
+        if waiting is not future:
+            # one waiter being cancelled must not cancel the lookup the others wait for
+            return await asyncio.shield(waiting)
+        try:
+            chat = await fetch(chat_id)
+        except BaseException as e:
+            self.failed(chat_id, future)
+            if isinstance(e, asyncio.CancelledError):
+                future.cancel()
+            else:
+                future.set_exception(e)
+                # nobody may be waiting, the caller gets the exception anyway
+                future.exception()
+            raise
+        self.resolved(chat_id, future, chat)
+        future.set_result(chat)
+        return chat
+
+
+class AsyncEditCoalescer(EditCoalescer):
+    # sends run as tasks on the running loop and the returned futures are awaitable, workers is not used
+    def __init__(self, bot, interval=1., workers=4, maxsize=10000):
+        EditCoalescer.__init__(self, bot, interval, workers, maxsize)
+        self.tasks = set()
+        self.event = None
+
+    def future(self):
+        return asyncio.get_running_loop().create_future()
+
+    def schedule(self, key, e, delay):
+        loop = asyncio.get_running_loop()
+        if delay > 0 and not self.closing:
+            e.timer = loop.call_later(delay, self.due, key, e)
+            return
+        e.sending = True
+        task = loop.create_task(self.send(key, e))
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+
+    async def send(self, key, e):
+        kind, args, waiters, noop = self.take(e)
+        result = error = None
+        if not noop:
+            try:
+                result = await self.call(kind, e.message, args)
+            except Exception as ex:
+                error = ex
+        self.done(key, e, kind, args, waiters, noop, result, error)
+
+    def changed(self):
+        if self.event is not None:
+            self.event.set()
+
+    async def join(self):
+        while any(e.busy for e in self.edits.values()):
+            self.event = asyncio.Event()
+            await self.event.wait()
+
+    async def close(self):
+        self.closing = True
+        self.flush()
+        await self.join()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class AsyncBroadcast(Broadcast):
+    async def deliver(self, chat):
+        try:
+            message = await maybe_await(self.send(chat))
+        except Exception as e:
+            return Delivery(chat, error=e)
+        if self.checkpoint is not None:
+            self.checkpoint.add(chat.id)
+        return Delivery(chat, message)
+
+    async def run(self, chats):
+        window = set()
+        try:
+            for chat in self.pending(chats):
+                window.add(asyncio.ensure_future(self.deliver(chat)))
+                if len(window) >= self.workers:
+                    done, window = await asyncio.wait(window, return_when=asyncio.FIRST_COMPLETED)
+                    for f in done:
+                        yield self.count(f.result())
+            while window:
+                done, window = await asyncio.wait(window, return_when=asyncio.FIRST_COMPLETED)
+                for f in done:
+                    yield self.count(f.result())
+        finally:
+            for f in window:
+                f.cancel()
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+
+
+class AsyncFork(Fork):
+    def __init__(self, *conditions, completed, exclusive=False, timeout=None, timeout_callback=None, route=None):
+        Fork.__init__(self, *conditions, completed=completed, exclusive=exclusive, timeout=timeout,
+                      timeout_callback=timeout_callback, route=route)
+        self.event = None
+
+    def wake(self):
+        if self.event is None:
+            self.event = asyncio.Event()
+        self.event.set()
+
+    async def process(self, u_: Update):
+        if self.done:
+            return
+        if self.quick_stop and self.completed.meet(u_.content):
+            await maybe_await(self.completed.callback(u_.content))
+            self.finish(self.completed.stop_return(u_.content))
+            self.wake()
+            return
+        meet = False
+        for c in self.conditions:
+            if c.meet(u_.content):
+                meet = True
+                await maybe_await(c.callback(u_.content))
+                if self.exclusive:
+                    break
+        if self.completed.meet(u_.content):
+            await maybe_await(self.completed.callback(u_.content))
+            self.finish(self.completed.stop_return(u_.content))
+            self.wake()
+        elif meet:
+            print(":: warning: fork has matched, but is still running")
+
+    async def join(self):
+        if self.event is None:
+            self.event = asyncio.Event()
+        while not self.done:
+            if self.substitute:
+                await self.substitute.join()
+                break
+            remaining = None
+            if self.time_target is not None:
+                remaining = (self.time_target - datetime.now()).total_seconds()
+                if remaining <= 0:
+                    raise ExpiredException(self)
+            try:
+                await asyncio.wait_for(self.event.wait(), remaining)
+            except asyncio.TimeoutError:
+                raise ExpiredException(self)
+
+
+class AsyncForks(Forks):
+    fork_class = AsyncFork
+
+    def replace(self, id_, *conds: Condition, completed: Condition, exclusive=False, route=None):
+        old = Forks.replace(self, id_, *conds, completed=completed, exclusive=exclusive, route=route)
+        old.wake()
+        return old
+
+    async def send(self, u_: Update):
+        for f in self.candidates(u_):
+            await f.process(u_)
+        self.detach_expired()
+
+    async def attach_join_detach(self, *args, **kwargs):
+        if len(args) == 1 and isinstance(args[0], AsyncFork):
+            u = self.attach_fork(*args, **kwargs)
+        else:
+            u = self.attach(*args, **kwargs)
+        fork = self.get(u)
+        try:
+            await fork.join()
+            return fork.result
+        finally:
+            if self.forks.get(u) is fork:
+                self.detach(u)
+
+
+async def run_callback(t: AsyncTelegramBot, c: Condition, content):
+    metrics = t.metrics
+    if metrics is None:
+        return await maybe_await(c.callback(content))
+    name = handler_name(c.callback)
+    start = perf_counter()
+    failed = True
+    try:
+        with metrics.span("telebotapi.handler", {"handler": name}):
+            result = await maybe_await(c.callback(content))
+        failed = False
+        return result
+    finally:
+        metrics.handled(name, perf_counter() - start, failed)
+
+
+async def wait_for(t: AsyncTelegramBot,
+                   *conditions: Condition,
+                   timeout=0,
+                   forks=None):
+
+    async def run():
+        if forks and t.metrics is not None:
+            t.metrics.watch_forks(forks)
+        async for u in t.iter_updates():
+            for c in conditions:
+                if c.meet(u.content):
+                    await run_callback(t, c, u.content)
+                    if c.stop_return() is not None:
+                        return c.stop_return(u.content)
+                    continue
+            if forks:
+                await forks.send(u)
+
+    if timeout == 0:
+        return await run()
+    try:
+        return await asyncio.wait_for(run(), timeout)
+    except asyncio.TimeoutError:
+        return False
+
+
+def wait_for_task(t: AsyncTelegramBot,
+                  *conditions: Condition,
+                  timeout=0,
+                  forks=None):
+    return asyncio.ensure_future(wait_for(t, *conditions, timeout=timeout, forks=forks))
+
+
+class AsyncBotManager(BotManager):
+    # every bot long polls in a task of the running loop, all of them sharing one session
+    def __init__(self, transport=None, limit=100):
+        if transport is None:
+            transport = AiohttpTransport(limit=limit) if aiohttp is not None else ExecutorTransport(max_workers=limit)
+        BotManager.__init__(self, transport=transport)
+
+    async def bot(self, token, name=None, handler=None, **kwargs):
+        return await self.add(AsyncTelegramBot(token, name=name, transport=self.transport, **kwargs), handler)
+
+    async def add(self, bot, handler=None):
+        # handler(bot, update) may be a coroutine function
+        if bot.transport is not self.transport:
+            await bot.transport.close()
+            bot.transport = self.transport
+        BotManager.add(self, bot, handler)
+        if self.running:
+            self.spawn(self.bots[bot_key(bot)])
+        return bot
+
+    async def remove(self, bot):
+        h = self.detach(bot)
+        if h.task is not None:
+            h.task.cancel()
+            await asyncio.gather(h.task, return_exceptions=True)
+        return h.bot
+
+    def spawn(self, h):
+        h.task = asyncio.get_running_loop().create_task(self.serve(h))
+
+    async def start(self):
+        self.running = True
+        for h in list(self.bots.values()):
+            self.spawn(h)
+        return self
+
+    async def serve(self, h):
+        while True:
+            received = 0
+            failed = False
+            try:
+                if not h.bot.bootstrapped:
+                    await h.bot.bootstrap()
+                queued = len(h.bot.updates)
+                await h.bot.poll()
+                # the queue may already hold updates, only what it grew by is new
+                received = max(len(h.bot.updates) - queued, 0)
+                h.polls += 1
+                h.updates += received
+                if h.handler is not None:
+                    await self.handle(h)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                failed = True
+                h.errors += 1
+                print(f"Exception caught polling {h.key}: {e!r}")
+            if received or h.bot.poll_timeout and not failed and not (h.handler is None and h.bot.updates):
+                h.delay = 0.
+                continue
+            # short polling, errors and updates nobody consumes back off instead of spinning
+            h.delay = min(max(h.delay * 2, .05), self.idle_delay)
+            await asyncio.sleep(h.delay)
+
+    async def handle(self, h):
+        for u in h.bot.get_updates():
+            start = perf_counter()
+            failed = False
+            try:
+                await maybe_await(h.handler(h.bot, u))
+            except Exception as e:
+                failed = True
+                print(f"Exception caught in handler of {h.key}: {e!r}")
+            h.handling.add(perf_counter() - start, 0., failed)
+
+    async def stop(self):
+        self.running = False
+        tasks = [h.task for h in self.bots.values() if h.task is not None]
+        for t in tasks:
+            t.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def close(self):
+        await self.stop()
+        for h in list(self.bots.values()):
+            if h.bot.offset_store is not None:
+                h.bot.offset_store.close()
+        await self.transport.close()
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    def __str__(self):
+        return f"AsyncBotManager({len(self.bots)} bots)"
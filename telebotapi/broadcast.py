@@ -0,0 +1,144 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from .chats import Chat
+from .files import PhotoFile
+
+
+class Checkpoint:
+    # append-only file of chat ids that already received the broadcast, one per line
+    def __init__(self, path, sync_every=100):
+        self.path = path
+        self.sync_every = sync_every
+        self.lock = threading.Lock()
+        self.delivered = set()
+        if os.path.exists(path):
+            with open(path) as f:
+                for line in f:
+                    line = line.strip()
+                    if line:
+                        self.delivered.add(int(line) if line.lstrip("-").isdigit() else line)
+        self.file = None
+        self.unsynced = 0
+
+    def add(self, chat_id):
+        with self.lock:
+            self.delivered.add(chat_id)
+            if self.file is None:
+                self.file = open(self.path, "a")
+            # a torn last line after a crash only costs one duplicate message
+            self.file.write(f"{chat_id}\n")
+            self.file.flush()
+            self.unsynced += 1
+            if self.unsynced >= self.sync_every:
+                os.fsync(self.file.fileno())
+                self.unsynced = 0
+
+    def close(self):
+        with self.lock:
+            if self.file is not None:
+                os.fsync(self.file.fileno())
+                self.file.close()
+                self.file = None
+                self.unsynced = 0
+
+    def __contains__(self, chat_id):
+        return chat_id in self.delivered
+
+    def __len__(self):
+        return len(self.delivered)
+
+
+class Delivery:
+    __slots__ = ("chat", "message", "error")
+
+    def __init__(self, chat, message=None, error=None):
+        self.chat = chat
+        self.message = message
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __str__(self):
+        return f"Delivery({self.chat}, {'ok' if self.ok else repr(self.error)})"
+
+    def __repr__(self):
+        return str(self)
+
+
+class Broadcast:
+    def __init__(self, bot, template, workers=16, checkpoint=None, **kwargs):
+        # template is the text to send, a PhotoFile (or photo file id with photo=True) or a
+        # callable(bot, chat) performing the send itself
+        if workers < 1:
+            raise ValueError("workers must be at least 1")
+        self.bot = bot
+        self.template = template
+        self.workers = workers
+        self.checkpoint = Checkpoint(checkpoint) if isinstance(checkpoint, str) else checkpoint
+        self.photo = kwargs.pop("photo", isinstance(template, PhotoFile))
+        self.kwargs = kwargs
+        self.sent = 0
+        self.failed = 0
+        self.skipped = 0
+
+    def send(self, chat):
+        if callable(self.template):
+            return self.template(self.bot, chat)
+        if self.photo:
+            return self.bot.sendPhoto(chat, self.template, **self.kwargs)
+        return self.bot.sendMessage(chat, self.template, **self.kwargs)
+
+    def deliver(self, chat):
+        try:
+            message = self.send(chat)
+        except Exception as e:
+            return Delivery(chat, error=e)
+        if self.checkpoint is not None:
+            self.checkpoint.add(chat.id)
+        return Delivery(chat, message)
+
+    def count(self, delivery):
+        if delivery.ok:
+            self.sent += 1
+        else:
+            self.failed += 1
+        return delivery
+
+    def pending(self, chats):
+        for chat in chats:
+            if not isinstance(chat, Chat):
+                chat = Chat.by_id(chat)
+            if self.checkpoint is not None and chat.id in self.checkpoint:
+                self.skipped += 1
+                continue
+            yield chat
+
+    def run(self, chats):
+        # only a window of sends is submitted at a time, so huge recipient lists are consumed lazily;
+        # results come back in completion order
+        pool = ThreadPoolExecutor(self.workers, thread_name_prefix="telebotapi-broadcast")
+        window = set()
+        try:
+            for chat in self.pending(chats):
+                window.add(pool.submit(self.deliver, chat))
+                if len(window) >= self.workers * 2:
+                    done, window = wait(window, return_when=FIRST_COMPLETED)
+                    for f in done:
+                        yield self.count(f.result())
+            while window:
+                done, window = wait(window, return_when=FIRST_COMPLETED)
+                for f in done:
+                    yield self.count(f.result())
+        finally:
+            # sends not started yet are dropped, the ones running finish (shutdown(cancel_futures=True) is 3.9+)
+            for f in window:
+                f.cancel()
+            pool.shutdown()
+            if self.checkpoint is not None:
+                self.checkpoint.close()
+
+    def stats(self):
+        return {"sent": self.sent, "failed": self.failed, "skipped": self.skipped}
@@ -0,0 +1,136 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from time import monotonic
+from .chats import Chat
+
+ENVELOPE_CHATS = ("chat", "from", "sender_chat")
+
+
+class ChatCache:
+    # getChat results by chat id, dropped after ttl seconds or when maxsize is exceeded, least recently used first
+    def __init__(self, ttl=300, maxsize=10000, from_updates=False):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        # fill the cache with the chats and users that updates already carry
+        self.from_updates = from_updates
+        self.entries = OrderedDict()
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.observed = 0
+
+    def get(self, chat_id):
+        with self.lock:
+            entry = self.entries.get(chat_id)
+            if entry is None:
+                return None
+            if entry[1] <= monotonic():
+                del self.entries[chat_id]
+                return None
+            self.entries.move_to_end(chat_id)
+            return entry[0]
+
+    def put(self, chat):
+        with self.lock:
+            self.store(chat)
+
+    def store(self, chat):
+        self.entries[chat.id] = (chat, monotonic() + self.ttl)
+        self.entries.move_to_end(chat.id)
+        while len(self.entries) > self.maxsize:
+            self.entries.popitem(last=False)
+
+    def invalidate(self, chat_id=None):
+        # a lookup already on its way for an invalidated chat will not store its answer
+        with self.lock:
+            if chat_id is None:
+                self.entries.clear()
+                self.pending.clear()
+            else:
+                self.entries.pop(chat_id, None)
+                self.pending.pop(chat_id, None)
+
+    def join(self, chat_id, future):
+        # returns the pending lookup to wait for, or registers future as the one doing it
+        with self.lock:
+            entry = self.entries.get(chat_id)
+            if entry is not None and entry[1] > monotonic():
+                self.hits += 1
+                self.entries.move_to_end(chat_id)
+                return entry[0], None
+            if chat_id in self.pending:
+                self.coalesced += 1
+                return None, self.pending[chat_id]
+            self.misses += 1
+            self.pending[chat_id] = future
+            return None, future
+
+    def resolved(self, chat_id, future, chat):
+        with self.lock:
+            if self.pending.get(chat_id) is future:
+                del self.pending[chat_id]
+                self.store(chat)
+
+    def failed(self, chat_id, future):
+        with self.lock:
+            if self.pending.get(chat_id) is future:
+                del self.pending[chat_id]
+
+    def lookup(self, chat_id, fetch):
+        # concurrent lookups of the same chat share the one fetch(chat_id) in flight
+        future = Future()
+        chat, waiting = self.join(chat_id, future)
+        if chat is not None:
+            return chat
+        if waiting is not future:
+            return waiting.result()
+        try:
+            chat = fetch(chat_id)
+        except BaseException as e:
+            self.failed(chat_id, future)
+            future.set_exception(e)
+            raise
+        self.resolved(chat_id, future, chat)
+        future.set_result(chat)
+        return chat
+
+    def observe(self, u):
+        # reads the raw update, so lazy updates are not decoded for it
+        for k, v in u.items():
+            if not isinstance(v, dict):
+                continue
+            for key in ENVELOPE_CHATS:
+                c = v.get(key)
+                if c is None:
+                    continue
+                with self.lock:
+                    entry = self.entries.get(c["id"])
+                    # only fills gaps: what an update carries is a fraction of a getChat answer, which it must not
+                    # replace
+                    if entry is not None and entry[1] > monotonic():
+                        continue
+                    if key == "from":
+                        # a user's id doubles as the id of the private chat with them
+                        c = dict(c, type="private")
+                    self.store(Chat(c))
+                    self.observed += 1
+
+    def stats(self):
+        with self.lock:
+            return {"chats": len(self.entries), "hits": self.hits, "misses": self.misses, "coalesced": self.coalesced,
+                    "observed": self.observed, "pending": len(self.pending)}
+
+    def __contains__(self, chat_id):
+        return self.get(chat_id) is not None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __str__(self):
+        return f"ChatCache({len(self.entries)} chats, ttl={self.ttl})"
+
+    def __repr__(self):
+        return str(self)
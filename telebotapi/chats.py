@@ -1,10 +1,16 @@
-class Chat:
+from .model import Model
+
+
+class Chat(Model):
+    __slots__ = ("id", "last_name", "type", "username", "language_code", "first_name", "is_bot")
+    known = frozenset(("id", "last_name", "type", "username", "language_code", "first_name", "is_bot"))
+
     def __init__(self, c):
+        Model.__init__(self, c)
         self.id = c["id"]
         for i in ("last_name", "type", "username", "language_code", "first_name", "is_bot"):
             if i in c:
                 self.__setattr__(i, c[i])
-        self.raw = c
 
     def __str__(self):
         return f"Chat({self.id})"
@@ -19,14 +25,13 @@ class Chat:
 
     @staticmethod
     def by_id(i):
+        # "@username" addresses a public channel or supergroup wherever a chat id is accepted
+        if isinstance(i, str) and i.startswith("@"):
+            return Chat({"id": i})
         return Chat({"id": int(i)})
 
 
 class User(Chat):
-    def __init__(self, u):
-        Chat.__init__(self, u)
-        self.raw = u
-
     def __str__(self):
         return f"User({self.id})"
 
@@ -0,0 +1,42 @@
+import json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class JsonCodec:
+    # decodes api responses and webhook bodies, encodes the json valued parameters such as reply_markup
+    name = "json"
+
+    def loads(self, data):
+        return json.loads(data)
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False)
+
+    def __str__(self):
+        return f"{type(self).__name__}()"
+
+    def __repr__(self):
+        return str(self)
+
+
+class OrjsonCodec(JsonCodec):
+    name = "orjson"
+
+    def __init__(self):
+        if orjson is None:
+            raise ImportError("OrjsonCodec requires the orjson package")
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+    def dumps(self, obj):
+        # orjson only produces bytes, form fields want text
+        return orjson.dumps(obj).decode()
+
+
+def default_codec():
+    return OrjsonCodec() if orjson is not None else JsonCodec()
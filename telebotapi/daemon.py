@@ -1,10 +1,14 @@
 from .telebotapi import TelegramBot
+from .update import Update
 from typing import Callable
 from inspect import getsource
 from datetime import datetime, timedelta
-from time import sleep
+from time import monotonic, perf_counter
 from uuid import uuid4
-from threading import Thread
+from threading import Thread, Event, Lock
+from .timers import TimerWheel
+from .routing import Route, RouteIndex
+from .dispatcher import handler_name
 
 
 class Filter:
@@ -26,7 +30,10 @@ class Filter:
 
 
 class Condition:
-    def __init__(self, *filters: Filter, callback=lambda l_: None, stop_return=None, reversed_=False):
+    def __init__(self, *filters: Filter, callback=lambda l_: None, stop_return=None, reversed_=False, route=None):
+        if route is not None and not isinstance(route, Route):
+            raise TypeError(route)
+        self.route = route
         self.callback = callback
         self.stop_return_ = stop_return
         self.reversed = reversed_
@@ -37,6 +44,9 @@ class Condition:
             self.filters.append(i)
 
     def meet(self, msg):
+        # a route is checked before any filter runs, and is never affected by reversed_
+        if self.route is not None and not self.route.match(msg):
+            return False
         ret = all(map(lambda l: l.call(msg), self.filters))
         if self.reversed:
             return not ret
@@ -62,7 +72,11 @@ class ExpiredException(Exception):
 
 
 class Fork:
-    def __init__(self, *conditions, completed, exclusive=False, timeout=None, timeout_callback=None):
+    def __init__(self, *conditions, completed, exclusive=False, timeout=None, timeout_callback=None, route=None):
+        if route is not None and not isinstance(route, Route):
+            raise TypeError(route)
+        self.route = route
+        self.on_expire = None
         self.exclusive = exclusive
         self.quick_stop = True
         self.conditions = conditions
@@ -76,20 +90,47 @@ class Fork:
             raise TypeError("\"completed\" argument must have the stop_return attribute set")
         self.result = None
         self.done = False
+        self.timed_out = False
+        self.finished = Event()
+        self.timeout_callback = timeout_callback
+        self.timer = None
+        # a dispatcher may hand updates of different chats to the same fork concurrently
+        self.lock = Lock()
         if timeout is not None:
             if not isinstance(timeout, timedelta):
                 raise TypeError(timeout)
             self.time_target = datetime.now() + timeout
+            self.timer = TimerWheel.default().schedule(timeout.total_seconds(), self.expire)
         else:
             self.time_target = None
 
-    def process(self, u_: TelegramBot.Update):
+    def finish(self, result):
+        self.result = result
+        self.done = True
+        if self.timer is not None:
+            self.timer.cancel()
+        self.finished.set()
+
+    def expire(self):
+        if self.done:
+            return
+        self.timed_out = True
+        if self.timeout_callback is not None:
+            self.timeout_callback(self)
+        if self.on_expire is not None:
+            self.on_expire()
+        self.finished.set()
+
+    def process(self, u_: Update):
+        with self.lock:
+            self.process_locked(u_)
+
+    def process_locked(self, u_: Update):
         if self.done:
             return
         if self.quick_stop and self.completed.meet(u_.content):
             self.completed.callback(u_.content)
-            self.result = self.completed.stop_return(u_.content)
-            self.done = True
+            self.finish(self.completed.stop_return(u_.content))
             return
         meet = False
         for c in self.conditions:
@@ -100,59 +141,86 @@ class Fork:
                     break
         if self.completed.meet(u_.content):
             self.completed.callback(u_.content)
-            self.result = self.completed.stop_return(u_.content)
-            self.done = True
+            self.finish(self.completed.stop_return(u_.content))
         elif meet:
             print(":: warning: fork has matched, but is still running")
 
     def join(self):
+        # woken by finish(), expire() or Forks.replace()
         while not self.done:
             if self.substitute:
                 self.substitute.join()
                 break
             if self.expired():
                 raise ExpiredException(self)
-            sleep(.2)
+            self.finished.wait()
 
     def get_result(self):
         return self.result
 
     def expired(self):
-        if self.time_target is None:
-            return False
-        return datetime.now() > self.time_target
+        return self.timed_out
 
 
 class Forks:
+    fork_class = Fork
+
     def __init__(self):
         self.forks = {}
+        self.routes = RouteIndex()
+        self.lock = Lock()
+        self.expired = []
 
-    def attach(self, *conds: Condition, completed: Condition, exclusive=False, custom_id=None, timeout=None):
-        return self.attach_fork(Fork(*conds, completed=completed, exclusive=exclusive, timeout=timeout), custom_id)
+    def attach(self, *conds: Condition, completed: Condition, exclusive=False, custom_id=None, timeout=None,
+               route=None):
+        return self.attach_fork(self.fork_class(*conds, completed=completed, exclusive=exclusive, timeout=timeout,
+                                                route=route), custom_id)
 
     def attach_fork(self, fork: Fork, custom_id=None):
-        if not isinstance(fork, Fork):
+        if not isinstance(fork, self.fork_class):
             raise TypeError(fork)
         u_ = str(uuid4()) if custom_id is None else str(custom_id)
-        self.forks[u_] = fork
+        with self.lock:
+            self.forks[u_] = fork
+            self.routes.add(u_, fork.route)
+        fork.on_expire = lambda: self.expired.append((u_, fork))
         return u_
 
     def detach(self, id_):
-        self.forks.pop(id_)
-
-    def replace(self, id_, *conds: Condition, completed: Condition, exclusive=False):
-        new_fork = Fork(*conds, completed=completed, exclusive=exclusive)
-        self.get(id_).substitute = new_fork
-        self.forks[id_] = new_fork
-
-    def send(self, u_: TelegramBot.Update):
-        exp = []
-        for id_, f in self.forks.items():
+        with self.lock:
+            self.routes.remove(id_)
+            return self.forks.pop(id_)
+
+    def replace(self, id_, *conds: Condition, completed: Condition, exclusive=False, route=None):
+        old = self.get(id_)
+        new_fork = self.fork_class(*conds, completed=completed, exclusive=exclusive,
+                                   route=old.route if route is None else route)
+        old.substitute = new_fork
+        old.finished.set()
+        with self.lock:
+            self.forks[id_] = new_fork
+            self.routes.add(id_, new_fork.route)
+        new_fork.on_expire = lambda: self.expired.append((id_, new_fork))
+        return old
+
+    def candidates(self, u_: Update):
+        # only forks whose route can match the update are evaluated, unrouted ones always are
+        with self.lock:
+            return [self.forks[id_] for id_ in self.routes.candidates(u_.content)]
+
+    def send(self, u_: Update):
+        for f in self.candidates(u_):
             f.process(u_)
-            if f.expired():
-                exp.append(id_)
-        for id_ in exp:
-            self.detach(id_)
+        self.detach_expired()
+
+    def detach_expired(self):
+        # expired forks are reported by the timer wheel, they may not have seen any update at all
+        while self.expired:
+            id_, f = self.expired.pop()
+            with self.lock:
+                if self.forks.get(id_) is f:
+                    self.routes.remove(id_)
+                    self.forks.pop(id_)
 
     def get(self, id_) -> Fork:
         return self.forks[id_]
@@ -168,40 +236,72 @@ class Forks:
         return ret
 
 
+def run_callback(t: TelegramBot, c: Condition, content):
+    # timed and traced when the bot has metrics, exceptions still reach the caller
+    metrics = t.metrics
+    if metrics is None:
+        return c.callback(content)
+    name = handler_name(c.callback)
+    start = perf_counter()
+    failed = True
+    try:
+        with metrics.span("telebotapi.handler", {"handler": name}):
+            result = c.callback(content)
+        failed = False
+        return result
+    finally:
+        metrics.handled(name, perf_counter() - start, failed)
+
+
 def wait_for(t: TelegramBot,
              *conditions: Condition,
              timeout=0,
-             forks=None):
-
-    t.daemon.delay = 0.5
+             forks=None,
+             dispatcher=None):
 
     if timeout == 0:
         infinite = True
     else:
         infinite = False
-        timeout_end = datetime.now() + timedelta(seconds=timeout)
+        timeout_end = monotonic() + timeout
+    if forks and t.metrics is not None:
+        t.metrics.watch_forks(forks)
 
     while True:
-        for u in t.get_updates():
-            for c in conditions:
-                if c.meet(u.content):
-                    c.callback(u.content)
-                    if c.stop_return() is not None:
-                        return c.stop_return(u.content)
-                    continue
-            if forks:
-                forks.send(u)
-        if not infinite:
-            if timeout_end < datetime.now():
+        # blocks on the update queue, so the poller wakes us as soon as something arrives
+        if infinite:
+            u = t.get_update()
+        else:
+            remaining = timeout_end - monotonic()
+            if remaining <= 0:
                 return False
-        sleep(0.1)
+            u = t.get_update(remaining)
+        if u is None:
+            continue
+        if dispatcher is not None:
+            # callbacks and forks run on the dispatcher pool, in order within each chat
+            stop = dispatcher.dispatch(u, *conditions, forks=forks)
+            if stop is not None:
+                c, future = stop
+                future.result()
+                return c.stop_return(u.content)
+            continue
+        for c in conditions:
+            if c.meet(u.content):
+                run_callback(t, c, u.content)
+                if c.stop_return() is not None:
+                    return c.stop_return(u.content)
+                continue
+        if forks:
+            forks.send(u)
 
 
 def wait_for_threaded(t: TelegramBot,
                       *conditions: Condition,
                       timeout=0,
-                      forks=None):
-    th = Thread(target=wait_for, args=(t, ) + conditions, kwargs={"timeout": timeout, "forks": forks},
-                daemon=True)
+                      forks=None,
+                      dispatcher=None):
+    th = Thread(target=wait_for, args=(t, ) + conditions,
+                kwargs={"timeout": timeout, "forks": forks, "dispatcher": dispatcher}, daemon=True)
     th.start()
     return th
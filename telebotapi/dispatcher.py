@@ -0,0 +1,198 @@
+import threading
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import monotonic, perf_counter
+from .inflight import InFlight
+
+
+def chat_key(u):
+    # updates of the same chat share a key and run in order, None runs unordered
+    content = u.content
+    for attr in ("chat", "from_"):
+        try:
+            return getattr(content, attr).id
+        except AttributeError:
+            continue
+    return None
+
+
+def handler_name(fn):
+    name = getattr(fn, "__qualname__", None) or type(fn).__qualname__
+    if name == "<lambda>":
+        return f"<lambda>:{fn.__code__.co_filename.rsplit('/', 1)[-1]}:{fn.__code__.co_firstlineno}"
+    return name
+
+
+def timed(fn, args):
+    # module level so that it can be shipped to a process pool
+    start = perf_counter()
+    try:
+        return fn(*args), None, perf_counter() - start
+    except Exception as e:
+        return None, e, perf_counter() - start
+
+
+class HandlerStats:
+    __slots__ = ("calls", "errors", "total", "max", "queued", "recent")
+
+    def __init__(self, keep=1024):
+        self.calls = 0
+        self.errors = 0
+        self.total = 0.
+        self.max = 0.
+        self.queued = 0.
+        self.recent = deque(maxlen=keep)
+
+    def add(self, elapsed, queued, failed):
+        self.calls += 1
+        self.errors += failed
+        self.total += elapsed
+        self.max = max(self.max, elapsed)
+        self.queued += queued
+        self.recent.append(elapsed)
+
+    def percentile(self, p):
+        if not self.recent:
+            return 0.
+        s = sorted(self.recent)
+        return s[min(int(len(s) * p), len(s) - 1)]
+
+    def as_dict(self):
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg": self.total / self.calls if self.calls else 0.,
+            "max": self.max,
+            "p50": self.percentile(.5),
+            "p99": self.percentile(.99),
+            "avg_queued": self.queued / self.calls if self.calls else 0.
+        }
+
+
+class Task:
+    __slots__ = ("fn", "args", "name", "future", "queued")
+
+    def __init__(self, fn, args, name):
+        self.fn = fn
+        self.args = args
+        self.name = name
+        self.future = Future()
+        self.queued = monotonic()
+
+
+class Dispatcher:
+    def __init__(self, workers=8, max_inflight=256, executor=None, metrics=None):
+        # any concurrent.futures executor works, a process pool needs picklable handlers and updates
+        self.executor = ThreadPoolExecutor(workers, thread_name_prefix="telebotapi-dispatch") \
+            if executor is None else executor
+        self.own_executor = executor is None
+        self.inflight = InFlight(max_inflight)
+        self.lock = threading.Condition()
+        self.chats = {}
+        self.pending = 0
+        self.handlers = {}
+        self.metrics = metrics
+
+    def submit(self, key, fn, *args, name=None):
+        # blocks while max_inflight tasks are queued or running, which stops the caller from pulling more
+        # updates; never submit from inside a handler with a full dispatcher
+        self.inflight.acquire()
+        task = Task(fn, args, handler_name(fn) if name is None else name)
+        with self.lock:
+            self.pending += 1
+            if key is not None:
+                if key in self.chats:
+                    # an earlier update of this chat is still running, this one goes after it
+                    self.chats[key].append(task)
+                    return task.future
+                self.chats[key] = deque()
+        self.start(key, task)
+        return task.future
+
+    def start(self, key, task):
+        started = monotonic()
+        try:
+            f = self.executor.submit(timed, task.fn, task.args)
+        except Exception as e:
+            self.finish(key, task, started, None, e, 0.)
+            return
+        f.add_done_callback(lambda f_: self.done(key, task, started, f_))
+
+    def done(self, key, task, started, f):
+        try:
+            result, error, elapsed = f.result()
+        except Exception as e:
+            # the executor failed to run the task at all, e.g. an unpicklable handler for a process pool
+            result, error, elapsed = None, e, monotonic() - started
+        self.finish(key, task, started, result, error, elapsed)
+
+    def finish(self, key, task, started, result, error, elapsed):
+        with self.lock:
+            stats = self.handlers.get(task.name)
+            if stats is None:
+                stats = self.handlers[task.name] = HandlerStats()
+            stats.add(elapsed, started - task.queued, error is not None)
+        if self.metrics is not None:
+            self.metrics.handled(task.name, elapsed, error is not None)
+        if error is not None:
+            print(f"Exception caught in handler {task.name}: {error!r}")
+            task.future.set_exception(error)
+        else:
+            task.future.set_result(result)
+        self.inflight.release()
+        following = None
+        with self.lock:
+            self.pending -= 1
+            if key is not None:
+                queue = self.chats[key]
+                if queue:
+                    following = queue.popleft()
+                else:
+                    del self.chats[key]
+            self.lock.notify_all()
+        if following is not None:
+            self.start(key, following)
+
+    def dispatch(self, u, *conditions, forks=None):
+        # runs the callbacks of the matching conditions and the forks for one update, ordered per chat;
+        # returns the first matching condition with stop_return and the future of its callback
+        key = chat_key(u)
+        for c in conditions:
+            if c.meet(u.content):
+                future = self.submit(key, c.callback, u.content)
+                if c.stop_return() is not None:
+                    return c, future
+        if forks:
+            self.submit(key, forks.send, u)
+        return None
+
+    def join(self, timeout=None):
+        with self.lock:
+            return self.lock.wait_for(lambda: not self.pending, timeout)
+
+    def close(self, wait=True):
+        if wait:
+            self.join()
+        if self.own_executor:
+            self.executor.shutdown(wait=wait)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "pending": self.pending,
+                "busy_chats": len(self.chats),
+                "inflight": self.inflight.stats(),
+                "handlers": {k: v.as_dict() for k, v in self.handlers.items()}
+            }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __str__(self):
+        return f"Dispatcher(pending={self.pending}, busy_chats={len(self.chats)})"
+
+    def __repr__(self):
+        return str(self)
@@ -0,0 +1,239 @@
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from time import monotonic
+from uuid import uuid4
+from .exceptions import DownloadFailed
+from .files import File
+from .retry import Attempts
+
+# telegram guarantees a file_path link for at least an hour, keep a margin for the download itself
+LINK_TTL = 3600 - 60
+
+
+def file_ids(file):
+    # accepts File objects, messages carrying one in .file, or a bare file id without cache key
+    if isinstance(file, str):
+        return file, None
+    if not isinstance(file, File):
+        file = getattr(file, "file", None)
+        if not isinstance(file, File):
+            raise TypeError(f"Cannot download {type(file)}")
+    return file.id, file.unique_id or None
+
+
+class PathCache:
+    # file_id -> file_path, valid for as long as telegram keeps the download link alive
+    def __init__(self, ttl=LINK_TTL, maxsize=10000):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.paths = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, file_id):
+        with self.lock:
+            entry = self.paths.get(file_id)
+            if entry is None:
+                return None
+            if entry[1] <= monotonic():
+                del self.paths[file_id]
+                return None
+            return entry[0]
+
+    def put(self, file_id, path):
+        with self.lock:
+            self.paths[file_id] = (path, monotonic() + self.ttl)
+            self.paths.move_to_end(file_id)
+            while len(self.paths) > self.maxsize:
+                self.paths.popitem(last=False)
+
+    def invalidate(self, file_id):
+        with self.lock:
+            self.paths.pop(file_id, None)
+
+
+class FileCache:
+    # downloaded files named by their file_unique_id, the least recently used ones go first when full
+    def __init__(self, directory, max_bytes=256 << 20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evicted = 0
+        os.makedirs(directory, exist_ok=True)
+        found = []
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            if name.endswith(".part"):
+                # left over by an interrupted download
+                os.remove(path)
+                continue
+            st = os.stat(path)
+            found.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(found):
+            self.entries[name] = size
+            self.size += size
+        self.evict()
+
+    def path(self, unique_id):
+        return os.path.join(self.directory, unique_id)
+
+    def get(self, unique_id):
+        if unique_id is None:
+            return None
+        with self.lock:
+            if unique_id not in self.entries:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(unique_id)
+            self.hits += 1
+        path = self.path(unique_id)
+        try:
+            # mtime keeps the lru order across restarts
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.size -= self.entries.pop(unique_id, 0)
+            return None
+        return path
+
+    def temporary(self, unique_id):
+        # concurrent downloads of the same file each write their own copy, the last one to finish stays
+        return self.path(f"{unique_id}.{uuid4().hex}.part")
+
+    def put(self, unique_id, tmp):
+        path = self.path(unique_id)
+        os.replace(tmp, path)
+        size = os.path.getsize(path)
+        with self.lock:
+            self.size += size - self.entries.pop(unique_id, 0)
+            self.entries[unique_id] = size
+            self.evict(keep=unique_id)
+        return path
+
+    def evict(self, keep=None):
+        while self.size > self.max_bytes and self.entries:
+            unique_id, size = next(iter(self.entries.items()))
+            if unique_id == keep:
+                # a single file bigger than the whole cache stays until something else comes in
+                break
+            del self.entries[unique_id]
+            self.size -= size
+            self.evicted += 1
+            try:
+                os.remove(self.path(unique_id))
+            except FileNotFoundError:
+                pass
+
+    def stats(self):
+        with self.lock:
+            return {"files": len(self.entries), "bytes": self.size, "hits": self.hits, "misses": self.misses,
+                    "evicted": self.evicted}
+
+    def __contains__(self, unique_id):
+        return unique_id in self.entries
+
+    def __len__(self):
+        return len(self.entries)
+
+
+def deliver(path, destination):
+    # a cached file is copied out, so evicting it later never breaks the caller's copy
+    if destination is None:
+        return path
+    if hasattr(destination, "write"):
+        with open(path, "rb") as f:
+            shutil.copyfileobj(f, destination)
+        return destination
+    shutil.copyfile(path, destination)
+    return destination
+
+
+class Download:
+    # one download: written into the cache when there is one, else straight to the destination. Every decision is
+    # taken here, TelegramBot and AsyncTelegramBot only resolve the link, fetch it and sleep for the delays given
+    def __init__(self, bot, file, destination=None):
+        self.bot = bot
+        self.file_id, self.unique_id = file_ids(file)
+        self.cache = bot.file_cache if self.unique_id is not None else None
+        if self.cache is None and destination is None:
+            raise ValueError("downloads need a destination when they cannot go through a file cache")
+        self.destination = destination
+        self.tmp = None
+        self.start = None
+        self.opened = False
+        self.attempts = None
+        self.refreshed = False
+        if self.cache is None and hasattr(destination, "write"):
+            try:
+                self.start = destination.tell() if destination.seekable() else None
+            except (AttributeError, OSError, ValueError):
+                self.start = None
+
+    def cached(self):
+        return self.cache.get(self.unique_id) if self.cache is not None else None
+
+    def link(self):
+        # the file_path getFile handed out, None when it has to be asked again
+        return self.bot.file_paths.get(self.file_id)
+
+    def begin(self):
+        # the file to write the next attempt into
+        if self.attempts is None:
+            self.attempts = Attempts(self.bot, "download", {"file_id": self.file_id}, breaker=False)
+        self.attempts.begin()
+        return self.open()
+
+    def failed(self, error):
+        # a network error: the delay before trying again, or None to raise it
+        self.discard()
+        return self.attempts.failed(error)
+
+    def fetched(self, status, path):
+        # True when the file is complete, False to fetch it again from a fresh link, else DownloadFailed
+        if status == 200:
+            return True
+        self.discard()
+        self.bot.file_paths.invalidate(self.file_id)
+        if status != 404 or self.refreshed:
+            raise DownloadFailed(status, path)
+        # the link went stale before its hour was up, a new getFile hands out a fresh one
+        self.refreshed = True
+        return False
+
+    def open(self):
+        # called before every attempt, a retry starts the file over
+        if self.cache is not None:
+            self.tmp = self.cache.temporary(self.unique_id)
+        elif hasattr(self.destination, "write"):
+            if self.opened:
+                if self.start is None:
+                    raise OSError("the download was interrupted and its destination cannot be rewound")
+                self.destination.seek(self.start)
+                self.destination.truncate()
+            self.opened = True
+            # the caller's file stays open
+            return nullcontext(self.destination)
+        else:
+            self.tmp = f"{os.fspath(self.destination)}.part"
+        return open(self.tmp, "wb")
+
+    def commit(self):
+        if self.cache is not None:
+            return deliver(self.cache.put(self.unique_id, self.tmp), self.destination)
+        if self.tmp is not None:
+            os.replace(self.tmp, self.destination)
+        return self.destination
+
+    def discard(self):
+        if self.tmp is not None:
+            try:
+                os.remove(self.tmp)
+            except FileNotFoundError:
+                pass
+            self.tmp = None
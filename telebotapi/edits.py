@@ -0,0 +1,246 @@
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import monotonic
+from .exceptions import MessageNotModified
+from .timers import TimerWheel
+
+
+class Edit:
+    __slots__ = ("message", "kind", "text", "parse_mode", "markup", "a", "waiters", "shown", "last_sent", "sending",
+                 "timer")
+
+    def __init__(self, message):
+        self.message = message
+        # what is wanted and not sent yet: "text", "markup" or None
+        self.kind = None
+        self.text = None
+        self.parse_mode = None
+        self.markup = None
+        self.a = None
+        self.waiters = []
+        # (text, parse_mode, markup) last sent, None until the first edit goes through
+        self.shown = None
+        self.last_sent = 0.
+        self.sending = False
+        self.timer = None
+
+    @property
+    def busy(self):
+        return self.kind is not None or self.sending
+
+    def take(self):
+        job = (self.kind, (self.text, self.parse_mode, self.markup, self.a), self.waiters)
+        self.kind = None
+        self.a = None
+        self.waiters = []
+        return job
+
+    def noop(self, kind, args):
+        if self.shown is None:
+            return False
+        if kind == "text":
+            return self.shown == args[:3]
+        return self.shown[2] == args[2]
+
+    def show(self, kind, args):
+        if kind == "text":
+            self.shown = args[:3]
+        else:
+            self.shown = (None, None, args[2]) if self.shown is None else self.shown[:2] + (args[2], )
+
+
+class EditCoalescer:
+    # live-updating messages: only the latest text or markup of each message is kept and it is sent at most once
+    # every interval seconds; edits superseded in between, and edits to what the message already shows, are never
+    # sent. Every edit returns a future resolved with the outcome of the send that covered it
+    def __init__(self, bot, interval=1., workers=4, maxsize=10000, wheel=None):
+        self.bot = bot
+        self.interval = interval
+        self.workers = workers
+        self.maxsize = maxsize
+        self.wheel = wheel
+        self.edits = OrderedDict()
+        self.lock = threading.Condition()
+        self.executor = None
+        self.closing = False
+        self.requested = 0
+        self.sent = 0
+        self.superseded = 0
+        self.skipped = 0
+        self.not_modified = 0
+        self.failed = 0
+
+    def entry(self, message):
+        key = (message.chat.id, message.id)
+        e = self.edits.get(key)
+        if e is None:
+            e = self.edits[key] = Edit(message)
+            self.evict()
+        else:
+            self.edits.move_to_end(key)
+            e.message = message
+        return key, e
+
+    def evict(self):
+        # idle messages are forgotten first, the next edit of one of them can at worst be a redundant one
+        while len(self.edits) > self.maxsize:
+            for key, e in self.edits.items():
+                if not e.busy:
+                    break
+            else:
+                return
+            del self.edits[key]
+
+    def edit_text(self, message, body, parse_mode="markdown", reply_markup=None, a=None):
+        # like editMessageText, without reply_markup the keyboard goes away as it does there
+        with self.lock:
+            key, e = self.entry(message)
+            if e.kind is not None:
+                self.superseded += 1
+            e.kind = "text"
+            e.text = body
+            e.parse_mode = parse_mode
+            e.markup = None if reply_markup is None else self.bot.encode(reply_markup)
+            e.a = a
+            return self.queue(key, e)
+
+    def edit_markup(self, reply_markup, message=None, a=None):
+        # a pending text edit takes the new markup along instead of becoming a separate call
+        if message is None:
+            raise TypeError("message parameter must be specified.")
+        with self.lock:
+            key, e = self.entry(message)
+            if e.kind is not None:
+                self.superseded += 1
+            if e.kind is None:
+                e.kind = "markup"
+                e.a = a
+            e.markup = self.bot.encode(reply_markup)
+            return self.queue(key, e)
+
+    def future(self):
+        return Future()
+
+    def queue(self, key, e):
+        self.requested += 1
+        f = self.future()
+        e.waiters.append(f)
+        if not e.sending and e.timer is None:
+            self.schedule(key, e, e.last_sent + self.interval - monotonic())
+        return f
+
+    def schedule(self, key, e, delay):
+        if delay > 0 and not self.closing:
+            e.timer = (self.wheel or TimerWheel.default()).schedule(delay, lambda: self.due(key, e))
+            return
+        e.sending = True
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="telebotapi-edits")
+        self.executor.submit(self.send, key, e)
+
+    def due(self, key, e):
+        with self.lock:
+            e.timer = None
+            if e.kind is not None and not e.sending:
+                self.schedule(key, e, 0)
+
+    def call(self, kind, message, args):
+        if kind == "text":
+            return self.bot.editMessageText(message, *args)
+        return self.bot.editMessageReplyMarkup(args[2], message, args[3])
+
+    def take(self, e):
+        with self.lock:
+            kind, args, waiters = e.take()
+            return kind, args, waiters, e.noop(kind, args)
+
+    def send(self, key, e):
+        kind, args, waiters, noop = self.take(e)
+        result = error = None
+        if not noop:
+            try:
+                result = self.call(kind, e.message, args)
+            except Exception as ex:
+                error = ex
+        self.done(key, e, kind, args, waiters, noop, result, error)
+
+    def done(self, key, e, kind, args, waiters, noop, result, error):
+        with self.lock:
+            if isinstance(error, MessageNotModified):
+                # the message already showed it, e.g. it was edited elsewhere or before the coalescer knew it
+                error = None
+                self.not_modified += 1
+            elif error is not None:
+                self.failed += 1
+            elif noop:
+                self.skipped += 1
+            else:
+                self.sent += 1
+            if error is None:
+                e.show(kind, args)
+            if not noop:
+                e.last_sent = monotonic()
+            e.sending = False
+            if e.kind is not None:
+                self.schedule(key, e, e.last_sent + self.interval - monotonic())
+            self.changed()
+        for f in waiters:
+            if f.done():
+                continue
+            if error is not None:
+                f.set_exception(error)
+            else:
+                f.set_result(e.message if result is None or result is True else result)
+
+    def changed(self):
+        self.lock.notify_all()
+
+    def flush(self):
+        # sends everything pending now, ignoring the interval
+        with self.lock:
+            for key, e in self.edits.items():
+                if e.kind is not None and not e.sending:
+                    if e.timer is not None:
+                        e.timer.cancel()
+                        e.timer = None
+                    self.schedule(key, e, 0)
+
+    def join(self, timeout=None):
+        with self.lock:
+            return self.lock.wait_for(lambda: not any(e.busy for e in self.edits.values()), timeout)
+
+    def close(self):
+        with self.lock:
+            self.closing = True
+        self.flush()
+        self.join()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+            self.executor = None
+
+    def stats(self):
+        with self.lock:
+            pending = sum(1 for e in self.edits.values() if e.kind is not None)
+        return {
+            "requested": self.requested,
+            "sent": self.sent,
+            "superseded": self.superseded,
+            "skipped": self.skipped,
+            "not_modified": self.not_modified,
+            "failed": self.failed,
+            "pending": pending,
+            "messages": len(self.edits)
+        }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __str__(self):
+        return f"EditCoalescer({len(self.edits)} messages, every {self.interval}s)"
+
+    def __repr__(self):
+        return str(self)
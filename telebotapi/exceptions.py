@@ -5,6 +5,7 @@ class QueryException(Exception):
     def __init__(self, data, method, query):
         self.error_code = data.get("error_code")
         self.description = data.get("description")
+        self.parameters = data.get("parameters") or {}
         self.method = method
         self.query = query
 
@@ -46,7 +47,24 @@ class MessageNotModified(QueryException):
 class TooManyRequests(QueryException):
     def __init__(self, *args, **kwargs):
         super(TooManyRequests, self).__init__(*args, **kwargs)
-        try:
-            self.delay = int(self.description.split("retry after ")[-1])
-        except ValueError:
-            self.delay = None
+        # parameters.retry_after is authoritative, the description only repeats it
+        self.delay = self.parameters.get("retry_after")
+        if self.delay is None:
+            try:
+                self.delay = int(self.description.split("retry after ")[-1])
+            except (ValueError, AttributeError):
+                self.delay = None
+
+
+class CircuitOpen(QueryException):
+    def __init__(self, method, query, retry_in):
+        description = f"circuit open, the Bot API is considered down, next probe in {retry_in:.1f} seconds"
+        super(CircuitOpen, self).__init__({"description": description}, method, query)
+        self.retry_in = retry_in
+
+
+class DownloadFailed(QueryException):
+    def __init__(self, status, path):
+        super(DownloadFailed, self).__init__({"error_code": status, "description": f"download of {path} failed"},
+                                             "download", {"file_path": path})
+        self.path = path
@@ -0,0 +1,331 @@
+import threading
+from collections import Counter, deque
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from json import dumps, loads
+from time import monotonic, sleep, time
+from urllib.parse import parse_qsl
+from zlib import crc32
+
+BOT = {"id": 1, "is_bot": True, "first_name": "fake", "username": "fake_bot"}
+
+
+class Fault:
+    __slots__ = ("kind", "method", "chat_id", "count", "retry_after", "delay")
+
+    def __init__(self, kind, method=None, chat_id=None, count=1, retry_after=1, delay=10.):
+        if kind not in ("429", "timeout", "error"):
+            raise ValueError(f"unknown fault {kind}")
+        self.kind = kind
+        self.method = method
+        self.chat_id = chat_id
+        self.count = count
+        self.retry_after = retry_after
+        self.delay = delay
+
+    def matches(self, method, params):
+        return (self.method is None or self.method == method) and \
+            (self.chat_id is None or str(self.chat_id) == str(params.get("chat_id")))
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "telebotapi-fake"
+    # headers and body leave in one segment, a keep-alive client would otherwise wait out a delayed ack each call
+    wbufsize = -1
+    disable_nagle_algorithm = True
+
+    def reply(self, body, code=200):
+        data = dumps(body).encode()
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def body(self):
+        if "chunked" not in self.headers.get("Transfer-Encoding", "").lower():
+            return self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        # streamed uploads of unknown size; the whole body has to be read or the next request on this connection
+        # would start in the middle of it
+        chunks = []
+        while True:
+            size = int(self.rfile.readline().split(b";", 1)[0].strip(), 16)
+            if size == 0:
+                break
+            chunks.append(self.rfile.read(size))
+            self.rfile.readline()
+        while self.rfile.readline().strip():
+            # trailers
+            pass
+        return b"".join(chunks)
+
+    def params(self, body):
+        kind = self.headers.get("Content-Type", "")
+        if kind.startswith("application/json"):
+            return loads(body or b"{}")
+        if kind.startswith("multipart/"):
+            # fields as strings, files as their name and size; upload is the size of the whole body
+            params = {"upload": len(body)}
+            form = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {kind}\r\n\r\n".encode() + body)
+            for part in form.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                payload = part.get_payload(decode=True) or b""
+                filename = part.get_filename()
+                params[name] = payload.decode() if filename is None else {"name": filename, "size": len(payload)}
+            return params
+        return dict(parse_qsl(body.decode()))
+
+    def do_POST(self):
+        server = self.server
+        body = self.body()
+        try:
+            method = self.path.split("/bot", 1)[1].split("/", 1)[1].split("?", 1)[0]
+        except IndexError:
+            return self.reply({"ok": False, "error_code": 404, "description": "Not Found"}, 404)
+        params = self.params(body)
+        fault = server.fault(method, params)
+        if fault is not None:
+            if fault.kind == "timeout":
+                # answers after the client gave up, or never for a delay longer than the connection lives
+                sleep(fault.delay)
+            elif fault.kind == "429":
+                return self.reply({"ok": False, "error_code": 429,
+                                   "description": f"Too Many Requests: retry after {fault.retry_after}",
+                                   "parameters": {"retry_after": fault.retry_after}}, 429)
+            else:
+                return self.reply({"ok": False, "error_code": 500, "description": "Internal Server Error"}, 500)
+        if server.latency:
+            sleep(server.latency)
+        handler = getattr(server, f"api_{method}", None)
+        if handler is None:
+            server.record(method, params)
+            return self.reply({"ok": False, "error_code": 404, "description": "Not Found: method not found"}, 404)
+        result = handler(params)
+        server.record(method, params)
+        self.reply({"ok": True, "result": result})
+
+    def do_GET(self):
+        if not self.path.startswith("/file/bot"):
+            return self.do_POST()
+        server = self.server
+        path = self.path.split("/", 3)[3] if self.path.count("/") >= 3 else ""
+        fault = server.fault("download", {"file_path": path})
+        if fault is not None:
+            if fault.kind == "timeout":
+                sleep(fault.delay)
+            else:
+                return self.reply({"ok": False, "error_code": 500, "description": "Internal Server Error"}, 500)
+        server.record("download", {"file_path": path})
+        data = server.content(path)
+        if data is None:
+            # unknown or expired link
+            return self.reply({"ok": False, "error_code": 404, "description": "Not Found"}, 404)
+        self.send_response(200)
+        self.send_header("Content-Type", "application/octet-stream")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeBotAPI(ThreadingHTTPServer):
+    # a local stand-in for api.telegram.org: give base_url to a transport, push updates, read what the bot sent
+    daemon_threads = True
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0., keep=100000):
+        ThreadingHTTPServer.__init__(self, (host, port), FakeHandler)
+        self.latency = latency
+        self.lock = threading.Condition()
+        self.pending = deque()
+        self.next_update_id = 1
+        self.next_message_id = 1
+        self.faults = []
+        # what the bot sent, newest last: (monotonic time, method, params)
+        self.sent = deque(maxlen=keep)
+        self.calls = Counter()
+        self.pushed = {}
+        self.thread = None
+        # file_id -> content, file_path -> file_id for the links getFile handed out
+        self.files = {}
+        self.links = {}
+
+    @property
+    def base_url(self):
+        return f"http://{self.server_address[0]}:{self.server_address[1]}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="telebotapi-fake", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def push(self, *updates):
+        # raw updates, recorded or generated; missing update_ids are assigned in order
+        with self.lock:
+            for u in updates:
+                if "update_id" not in u:
+                    u = dict(u, update_id=self.next_update_id)
+                self.next_update_id = max(self.next_update_id, u["update_id"] + 1)
+                self.pending.append(u)
+                self.pushed[u["update_id"]] = monotonic()
+            self.lock.notify_all()
+        return self.next_update_id - 1
+
+    def clear(self):
+        # drops what is still queued, e.g. updates a previous client never confirmed
+        with self.lock:
+            self.pending.clear()
+            self.pushed.clear()
+        return self.next_update_id
+
+    def load(self, path):
+        # a recording with one update, or one getUpdates answer, per line
+        with open(path) as f:
+            for line in f:
+                if line.strip():
+                    u = loads(line)
+                    self.push(*(u["result"] if "result" in u else [u]))
+
+    def inject(self, kind, method=None, chat_id=None, count=1, retry_after=1, delay=10.):
+        # the next count matching calls fail with a 429, a 500 or by answering only after delay seconds
+        with self.lock:
+            self.faults.append(Fault(kind, method, chat_id, count, retry_after, delay))
+
+    def fault(self, method, params):
+        with self.lock:
+            for f in self.faults:
+                if f.matches(method, params):
+                    f.count -= 1
+                    if f.count <= 0:
+                        self.faults.remove(f)
+                    return f
+        return None
+
+    def record(self, method, params):
+        with self.lock:
+            self.calls[method] += 1
+            self.sent.append((monotonic(), method, params))
+
+    def wait_for_calls(self, method, count, timeout=None):
+        with self.lock:
+            return self.lock.wait_for(lambda: self.calls[method] >= count, timeout)
+
+    def message(self, params, **extra):
+        with self.lock:
+            message_id = self.next_message_id
+            self.next_message_id += 1
+        m = {"message_id": message_id, "from": BOT, "date": int(time()), "chat": self.chat(params.get("chat_id", 0))}
+        m.update(extra)
+        return m
+
+    @staticmethod
+    def chat(chat_id):
+        # an @username is a public channel, answered with a made up numeric id as the real server does
+        if isinstance(chat_id, str) and chat_id.startswith("@"):
+            return {"id": -1000000000000 - crc32(chat_id.encode()), "type": "channel", "username": chat_id[1:]}
+        chat_id = int(chat_id)
+        return {"id": chat_id, "type": "private" if chat_id > 0 else "supergroup"}
+
+    def api_getUpdates(self, params):
+        offset = int(params.get("offset", 0))
+        limit = int(params.get("limit", 100))
+        end = monotonic() + float(params.get("timeout", 0))
+        with self.lock:
+            # an offset confirms everything before it, as on the real server
+            while self.pending and self.pending[0]["update_id"] < offset:
+                self.pending.popleft()
+            while not self.pending and monotonic() < end:
+                self.lock.wait(end - monotonic())
+            return [u for _, u in zip(range(limit), self.pending)]
+
+    def api_getMe(self, params):
+        return BOT
+
+    def api_sendMessage(self, params):
+        return self.message(params, text=params.get("text", ""))
+
+    def api_editMessageText(self, params):
+        m = self.message(params, text=params.get("text", ""), edit_date=int(time()))
+        m["message_id"] = int(params.get("message_id", 0))
+        return m
+
+    def api_editMessageReplyMarkup(self, params):
+        m = self.message(params, text="", edit_date=int(time()))
+        m["message_id"] = int(params.get("message_id", 0))
+        return m
+
+    def document(self, params, field):
+        upload = params.get(field)
+        if isinstance(upload, dict):
+            return {"file_id": f"{field}{self.next_message_id}", "file_unique_id": f"u{self.next_message_id}",
+                    "file_name": upload["name"], "file_size": upload["size"]}
+        return {"file_id": str(upload), "file_unique_id": f"u{self.next_message_id}", "file_size": 0}
+
+    def api_sendDocument(self, params):
+        return self.message(params, document=self.document(params, "document"))
+
+    def api_sendPhoto(self, params):
+        # every photo comes in several sizes, smallest first; the largest one is what was sent
+        photo = self.document(params, "photo")
+        photo.pop("file_name", None)
+        sizes = [dict(photo, file_id=f"{photo['file_id']}-{side}", width=side, height=side) for side in (90, 320)]
+        return self.message(params, photo=sizes + [dict(photo, width=800, height=800)])
+
+    def add_file(self, data, file_id=None):
+        # a file the bot can getFile and download, returned as the raw dict a message would carry
+        with self.lock:
+            file_id = file_id or f"file{len(self.files) + 1}"
+            self.files[file_id] = data
+        return {"file_id": file_id, "file_unique_id": f"u{file_id}", "file_size": len(data)}
+
+    def expire(self):
+        # every file_path handed out so far stops working, as telegram's do after an hour
+        with self.lock:
+            self.links.clear()
+
+    def content(self, path):
+        with self.lock:
+            return self.files.get(self.links.get(path))
+
+    def api_getFile(self, params):
+        # every call hands out a new link, an unknown file_id gets one that answers 404
+        file_id = params["file_id"]
+        with self.lock:
+            path = f"documents/{file_id}-{self.calls['getFile']}"
+            self.links[path] = file_id
+            size = len(self.files.get(file_id, b""))
+        return {"file_id": file_id, "file_unique_id": f"u{file_id}", "file_size": size, "file_path": path}
+
+    def api_getChat(self, params):
+        return self.chat(params["chat_id"])
+
+    def api_answerCallbackQuery(self, params):
+        return True
+
+    def api_deleteMessage(self, params):
+        return True
+
+    def stats(self):
+        with self.lock:
+            return {"pending": len(self.pending), "calls": dict(self.calls), "faults": len(self.faults)}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def __str__(self):
+        return f"FakeBotAPI({self.base_url})"
+
+    def __repr__(self):
+        return str(self)
@@ -1,9 +1,15 @@
-class File:
+from .model import Model
+
+
+class File(Model):
+    __slots__ = ("id", "unique_id", "size")
+    known = frozenset(("file_id", "file_unique_id", "file_size"))
+
     def __init__(self, f):
+        Model.__init__(self, f)
         self.id = f["file_id"]
         self.unique_id = f["file_unique_id"]
         self.size = f["file_size"]
-        self.raw = f
 
     def __str__(self):
         return f"File(id={self.id}, unique_id={self.unique_id}, size={self.size})"
@@ -18,6 +24,9 @@ class File:
 
 
 class PhotoFile(File):
+    __slots__ = ("height", "width")
+    known = File.known | {"height", "width"}
+
     def __init__(self, f):
         File.__init__(self, f)
         self.height = f["height"]
@@ -31,7 +40,10 @@ class PhotoFile(File):
 
 
 class Document(File):
+    __slots__ = ("file_name", "mime")
+    known = File.known | {"file_name", "mime_type"}
+
     def __init__(self, f):
         File.__init__(self, f)
-        self.file_name = f["file_name"]
-        self.mime = f["mime_type"]
+        self.file_name = f.get("file_name")
+        self.mime = f.get("mime_type")
@@ -0,0 +1,72 @@
+import threading
+from contextlib import contextmanager
+from queue import Full
+from time import monotonic
+
+
+class InFlight:
+    def __init__(self, max_inflight=8, max_waiting=None):
+        if max_inflight < 1:
+            raise ValueError("max_inflight must be at least 1")
+        self.max_inflight = max_inflight
+        self.max_waiting = max_waiting
+        self.lock = threading.Condition()
+        self.inflight = 0
+        self.waiting = 0
+        self.completed = 0
+        self.rejected = 0
+        self.total_wait = 0.
+        self.max_wait = 0.
+
+    def acquire(self, timeout=None):
+        start = monotonic()
+        with self.lock:
+            if self.inflight >= self.max_inflight:
+                if self.max_waiting is not None and self.waiting >= self.max_waiting:
+                    self.rejected += 1
+                    raise Full(f"{self.waiting} requests already waiting for a free slot")
+                self.waiting += 1
+                try:
+                    if not self.lock.wait_for(lambda: self.inflight < self.max_inflight, timeout):
+                        self.rejected += 1
+                        raise Full(f"no free slot after {timeout} seconds")
+                finally:
+                    self.waiting -= 1
+            self.inflight += 1
+            waited = monotonic() - start
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        return waited
+
+    def release(self):
+        with self.lock:
+            self.inflight -= 1
+            self.completed += 1
+            self.lock.notify()
+
+    @contextmanager
+    def slot(self, timeout=None):
+        self.acquire(timeout)
+        try:
+            yield self
+        finally:
+            self.release()
+
+    def stats(self):
+        with self.lock:
+            started = self.completed + self.inflight
+            return {
+                "inflight": self.inflight,
+                "waiting": self.waiting,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "total_wait": self.total_wait,
+                "max_wait": self.max_wait,
+                "avg_wait": self.total_wait / started if started else 0.
+            }
+
+    def __str__(self):
+        return f"InFlight({self.inflight}/{self.max_inflight}, waiting={self.waiting})"
+
+    def __repr__(self):
+        return str(self)
@@ -0,0 +1,192 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic, perf_counter
+from .telebotapi import TelegramBot
+from .transport import SessionTransport
+from .dispatcher import HandlerStats
+
+
+def bot_key(bot):
+    # the numeric part of the token identifies the bot even when it has no name
+    return bot.name or bot.token.split(":", 1)[0]
+
+
+class Hosted:
+    __slots__ = ("bot", "key", "handler", "added", "polls", "updates", "errors", "handling", "delay", "next_poll",
+                 "polling", "task")
+
+    def __init__(self, bot, key, handler):
+        self.bot = bot
+        self.key = key
+        self.handler = handler
+        self.added = monotonic()
+        self.polls = 0
+        self.updates = 0
+        self.errors = 0
+        self.handling = HandlerStats()
+        self.delay = 0.
+        self.next_poll = 0.
+        self.polling = False
+        self.task = None
+
+    def stats(self):
+        elapsed = monotonic() - self.added
+        return {
+            "polls": self.polls,
+            "updates": self.updates,
+            "errors": self.errors,
+            "updates_per_second": self.updates / elapsed if elapsed else 0.,
+            "queued": len(self.bot.updates),
+            "handler": self.handling.as_dict() if self.handler is not None else None
+        }
+
+
+class BotManager:
+    # hosts many bots on a few worker threads and one connection pool, instead of a daemon thread and pool per bot.
+    # Bots are short polled in turn: one that got updates is polled again right away, an idle one backs off up to
+    # idle_delay seconds
+    def __init__(self, workers=4, transport=None, pool_connections=4, pool_maxsize=32, idle_delay=1.):
+        if transport is None:
+            transport = SessionTransport(pool_connections=pool_connections, pool_maxsize=pool_maxsize)
+        self.transport = transport
+        self.workers = workers
+        self.idle_delay = idle_delay
+        self.executor = None
+        self.bots = {}
+        self.lock = threading.Condition()
+        self.thread = None
+        self.running = False
+
+    def bot(self, token, name=None, handler=None, **kwargs):
+        kwargs.setdefault("poll_timeout", 0)
+        return self.add(TelegramBot(token, name=name, transport=self.transport, **kwargs), handler)
+
+    def add(self, bot, handler=None):
+        # handler(bot, update) runs for every update of the bot, in order; without one the updates stay in the bot's
+        # queue for wait_for, Forks or get_updates
+        key = bot_key(bot)
+        if bot.transport is not self.transport:
+            bot.transport.close()
+            bot.transport = self.transport
+        h = Hosted(bot, key, handler)
+        with self.lock:
+            if key in self.bots:
+                raise KeyError(f"bot {key} is already hosted")
+            self.bots[key] = h
+            self.lock.notify()
+        return bot
+
+    def detach(self, bot):
+        key = bot if isinstance(bot, str) else bot_key(bot)
+        with self.lock:
+            h = self.bots.pop(key)
+            self.lock.notify()
+        return h
+
+    def remove(self, bot):
+        # stops polling the bot, a poll already running finishes first; the shared transport stays open
+        return self.detach(bot).bot
+
+    def get(self, key):
+        return self.bots[key].bot
+
+    def start(self):
+        self.executor = ThreadPoolExecutor(self.workers, thread_name_prefix="telebotapi-bots")
+        self.running = True
+        self.thread = threading.Thread(target=self.run, name="telebotapi-manager", daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        while True:
+            with self.lock:
+                if not self.running:
+                    return
+                now = monotonic()
+                due = [h for h in self.bots.values() if not h.polling and h.next_poll <= now]
+                if not due:
+                    wake = min((h.next_poll for h in self.bots.values() if not h.polling), default=None)
+                    self.lock.wait(None if wake is None else wake - now)
+                    continue
+                for h in due:
+                    h.polling = True
+            for h in due:
+                self.executor.submit(self.poll, h)
+
+    def poll(self, h):
+        n = 0
+        try:
+            if not h.bot.bootstrapped:
+                h.bot.bootstrap(start_daemon=False)
+            n = h.bot.poll()
+            h.polls += 1
+            h.updates += n
+            if h.handler is not None:
+                self.handle(h)
+        except Exception as e:
+            h.errors += 1
+            print(f"Exception caught polling {h.key}: {e!r}")
+        with self.lock:
+            h.polling = False
+            h.delay = 0. if n else min(max(h.delay * 2, .05), self.idle_delay)
+            h.next_poll = monotonic() + h.delay
+            self.lock.notify()
+
+    def handle(self, h):
+        for u in h.bot.get_updates():
+            start = perf_counter()
+            failed = False
+            try:
+                h.handler(h.bot, u)
+            except Exception as e:
+                failed = True
+                print(f"Exception caught in handler of {h.key}: {e!r}")
+            h.handling.add(perf_counter() - start, 0., failed)
+
+    def stop(self):
+        with self.lock:
+            self.running = False
+            self.lock.notify()
+        if self.thread is not None:
+            self.thread.join()
+        if self.executor is not None:
+            self.executor.shutdown(wait=True)
+
+    def close(self):
+        self.stop()
+        for h in list(self.bots.values()):
+            if h.bot.offset_store is not None:
+                h.bot.offset_store.close()
+        self.transport.close()
+
+    def stats(self):
+        with self.lock:
+            hosted = list(self.bots.values())
+        bots = {h.key: h.stats() for h in hosted}
+        return {
+            "bots": len(bots),
+            "polls": sum(b["polls"] for b in bots.values()),
+            "updates": sum(b["updates"] for b in bots.values()),
+            "errors": sum(b["errors"] for b in bots.values()),
+            "updates_per_second": sum(b["updates_per_second"] for b in bots.values()),
+            "connections": self.transport.stats(),
+            "per_bot": bots
+        }
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __contains__(self, key):
+        return key in self.bots
+
+    def __len__(self):
+        return len(self.bots)
+
+    def __str__(self):
+        return f"BotManager({len(self.bots)} bots)"
+
+    def __repr__(self):
+        return str(self)
@@ -1,29 +1,46 @@
 from .entities import Entity
-from .files import File, PhotoFile
+from .files import File, PhotoFile, Document
 from .chats import User, Chat
+from .model import Model, lazy
 
+MESSAGE_ENVELOPES = ("message", "edited_message", "channel_post", "edited_channel_post", "result")
+# envelope -> ((content key, class), ...) in priority order, filled by Message.handles
+DISPATCH = {i: () for i in MESSAGE_ENVELOPES + ("callback_query",)}
+FALLBACK = {}
 
-class CallbackQuery:
-    def __init__(self, c):
+
+class CallbackQuery(Model):
+    __slots__ = ("id", "chat_instance", "data")
+    type = "callback_query"
+    known = frozenset(("id", "from", "text", "entities", "chat_instance", "data", "message"))
+
+    def __init__(self, c, lazy=False):
+        Model.__init__(self, c)
         self.id = c["id"]
-        if "from" in c:
-            self.from_ = User(c["from"])
-        self.entities = []
-        if "entities" in c:
-            self.text = c["text"]
-            for i in c["entities"]:
-                self.entities.append(Entity(i, self.text))
-
-        self.type = "callback_query"
-        self.original_message = Message.cast({"message": c["message"]})[0]
-        self.chat = self.original_message.chat
         self.chat_instance = c["chat_instance"]
         self.data = c["data"]
+        if not lazy:
+            self.decode(True)
+
+    @lazy.on("from")
+    def from_(self, c):
+        return User(c["from"])
+
+    @lazy.on("entities", "text")
+    def text(self, c):
+        return c["text"]
+
+    @lazy
+    def entities(self, c):
+        return [Entity(i, self.text) for i in c["entities"]] if "entities" in c else []
 
-        for i in dict([(k, c[k]) for k in c if k not in "id text from chat entities caption caption_entities"
-                                                        "chat_instance data message reply_to_message"]):
-            self.__setattr__(i, c[i])
-        self.raw = c
+    @lazy
+    def original_message(self, c):
+        return Message.cast_content(c["message"], lazy=True)[0]
+
+    @lazy
+    def chat(self, c):
+        return self.original_message.chat
 
     def __str__(self):
         return f"CallbackQuery(id={self.id}, chat_instance={self.chat_instance}, " \
@@ -33,55 +50,86 @@ class CallbackQuery:
         return str(self)
 
 
-class Message:
-    def __init__(self, c):
+class Message(Model):
+    __slots__ = ("id",)
+    known = frozenset(("message_id", "from", "chat", "reply_to_message", "text", "entities"))
+
+    def __init__(self, c, lazy=False):
+        Model.__init__(self, c)
         self.id = c["message_id"]
-        if "from" in c:
-            self.from_ = User(c["from"])
-        self.chat = Chat(c["chat"])
-        if "reply_to_message" in c:
-            self.reply_to_message = Message.cast({"message": c["reply_to_message"]})[
-                0]
-        self.entities = []
-        if "entities" in c:
-            self.text = c["text"]
-            for i in c["entities"]:
-                self.entities.append(Entity(i, self.text))
+        if not lazy:
+            self.decode(True)
+
+    @lazy.on("from")
+    def from_(self, c):
+        return User(c["from"])
+
+    @lazy
+    def chat(self, c):
+        return Chat(c["chat"])
+
+    @lazy.on("reply_to_message")
+    def reply_to_message(self, c):
+        return Message.cast_content(c["reply_to_message"], lazy=True)[0]
+
+    @lazy.on("entities", "text")
+    def text(self, c):
+        return c["text"]
+
+    @lazy
+    def entities(self, c):
+        return [Entity(i, self.text) for i in c["entities"]] if "entities" in c else []
 
     def __str__(self):
         return f"GenericMessage(from={self.from_}, chat={self.chat})"
 
     @staticmethod
-    def cast(u):
-        for i in ("message", "edited_message", "channel_post", "edited_channel_post", "callback_query",
-                  "result"):
-            if i in u:
-                for t, c in zip(["text", "photo", "message", "sticker", "audio"],
-                                [Text, PhotoMessage, CallbackQuery, Sticker, Audio]):
-                    if t in u[i]:
-                        return c(u[i]), t
-
-                return Message(u[i]), i
+    def resolve(u):
+        for i in u:
+            if i in DISPATCH:
+                c, t = Message.kind_of(u[i], i)
+                return c, i, t
         raise TypeError(f"Unrecognized data: {u}")
 
+    @staticmethod
+    def kind_of(c, envelope="message"):
+        # first registered content key found in the payload wins
+        for t, cls in DISPATCH[envelope]:
+            if t in c:
+                return cls, t
+        return FALLBACK.get(envelope, Message), envelope
+
+    @staticmethod
+    def cast(u, lazy=False):
+        c, i, t = Message.resolve(u)
+        return c(u[i], lazy=lazy), t
+
+    @staticmethod
+    def cast_content(c, envelope="message", lazy=False):
+        cls, t = Message.kind_of(c, envelope)
+        return cls(c, lazy=lazy), t
+
+    @staticmethod
+    def handles(key, envelopes=MESSAGE_ENVELOPES):
+        # class decorator: payloads carrying `key` in one of `envelopes` are decoded as the decorated class
+        def register(cls):
+            for i in envelopes:
+                DISPATCH[i] = DISPATCH.get(i, ()) + ((key, cls),)
+            return cls
+        return register
+
     @staticmethod
     def by_id(message_id, chat_id):
         return Message({"message_id": message_id, "chat": Chat.by_id(chat_id).raw})
 
 
+@Message.handles("text")
 class Text(Message):
-    def __init__(self, c):
-        super().__init__(c)
-        self.type = "text"
-        self.text = c["text"]
-
-        for k, v in [
-            (k, v)
-            for k, v in c.items()
-            if k not in "id text from chat entities caption caption_entities reply_to_message"
-        ]:
-            self.__setattr__(k, v)
-        self.raw = c
+    type = "text"
+
+    @lazy.on("text")
+    def text(self, c):
+        return c["text"]
 
     def __str__(self):
         return f"Text(\"{self.text}\", chat={self.chat})"
@@ -90,30 +138,34 @@ class Text(Message):
         return str(self)
 
 
-class Audio(Message, File):
-    def __init__(self, c):
-        super().__init__(c)
-        File.__init__(self, c)
-        self.duration = c["duration"]
-        for k, v in [
-            (k, v)
-            for k, v in c.items()
-            if k not in "performer title file_name mime_type thumb"
-        ]:
-            if k == "thumb":
-                self.__setattr__(k, PhotoMessage(v))
-            else:
-                self.__setattr__(k, v)
-
-
-class Sticker(Message, File):
-    def __init__(self, f):
-        Message.__init__(self, f)
-        s = f["sticker"]
-        self.file = File(s)
-        self.height = s["height"]
-        self.width = s["width"]
-        self.raw = f
+@Message.handles("audio")
+class Audio(Message):
+    known = Message.known | {"audio"}
+
+    @lazy
+    def file(self, c):
+        return File(c["audio"])
+
+    @lazy
+    def duration(self, c):
+        return c["audio"]["duration"]
+
+
+@Message.handles("sticker")
+class Sticker(Message):
+    known = Message.known | {"sticker"}
+
+    @lazy
+    def file(self, c):
+        return File(c["sticker"])
+
+    @lazy
+    def height(self, c):
+        return c["sticker"]["height"]
+
+    @lazy
+    def width(self, c):
+        return c["sticker"]["width"]
 
     @staticmethod
     def from_id(id_):
@@ -139,17 +191,38 @@ class Sticker(Message, File):
                f"{Message.__str__(self)}>"
 
 
-class PhotoMessage(Message):
-    def __init__(self, c):
-        Message.__init__(self, c)
-        self.photos = []
-        self.type = "photo"
-        self.thumbnail = PhotoFile(c["photo"][0])
-        self.photo = PhotoFile(c["photo"][1])
-        if "caption" in c:
-            self.text = c["caption"]
-            for i in c["caption_entities"]:
-                self.entities.append(Entity(i, self.text))
+class Captioned(Message):
+    # media messages carry their text in caption and caption_entities
+    known = Message.known | {"caption", "caption_entities"}
+
+    @lazy.on("caption")
+    def text(self, c):
+        return c["caption"]
+
+    @lazy
+    def entities(self, c):
+        if "caption" not in c:
+            return []
+        return [Entity(i, self.text) for i in c.get("caption_entities", ())]
+
+
+@Message.handles("photo")
+class PhotoMessage(Captioned):
+    type = "photo"
+    known = Captioned.known | {"photo"}
+
+    @lazy
+    def thumbnail(self, c):
+        return PhotoFile(c["photo"][0])
+
+    @lazy
+    def photo(self, c):
+        # sizes are listed smallest first, how many depends on the photo
+        return PhotoFile(c["photo"][-1])
+
+    @lazy
+    def photos(self, c):
+        return []
 
     @staticmethod
     def from_id(id_):
@@ -164,3 +237,91 @@ class PhotoMessage(Message):
 
     def __repr__(self):
         return str(self)
+
+
+@Message.handles("video")
+class Video(Captioned):
+    type = "video"
+    known = Captioned.known | {"video"}
+
+    @lazy
+    def file(self, c):
+        return File(c["video"])
+
+    @lazy
+    def duration(self, c):
+        return c["video"]["duration"]
+
+    @lazy
+    def height(self, c):
+        return c["video"]["height"]
+
+    @lazy
+    def width(self, c):
+        return c["video"]["width"]
+
+    def __str__(self):
+        return f"Video({self.file}, duration={self.duration})"
+
+    def __repr__(self):
+        return str(self)
+
+
+@Message.handles("voice")
+class Voice(Message):
+    type = "voice"
+    known = Message.known | {"voice"}
+
+    @lazy
+    def file(self, c):
+        return File(c["voice"])
+
+    @lazy
+    def duration(self, c):
+        return c["voice"]["duration"]
+
+    def __str__(self):
+        return f"Voice({self.file}, duration={self.duration})"
+
+    def __repr__(self):
+        return str(self)
+
+
+@Message.handles("document")
+class DocumentMessage(Captioned):
+    type = "document"
+    known = Captioned.known | {"document"}
+
+    @lazy
+    def file(self, c):
+        return Document(c["document"])
+
+    def __str__(self):
+        return f"DocumentMessage({self.file})"
+
+    def __repr__(self):
+        return str(self)
+
+
+@Message.handles("location")
+class Location(Message):
+    type = "location"
+    known = Message.known | {"location"}
+
+    @lazy
+    def latitude(self, c):
+        return c["location"]["latitude"]
+
+    @lazy
+    def longitude(self, c):
+        return c["location"]["longitude"]
+
+    def __str__(self):
+        return f"Location({self.latitude}, {self.longitude})"
+
+    def __repr__(self):
+        return str(self)
+
+
+Message.handles("message", ("callback_query",))(CallbackQuery)
+FALLBACK["callback_query"] = CallbackQuery
@@ -0,0 +1,222 @@
+import threading
+import weakref
+from bisect import bisect_left
+from contextlib import nullcontext
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_BUCKETS = (.005, .01, .025, .05, .1, .25, .5, 1., 2.5, 5., 10., 30., 60.)
+NULL_SPAN = nullcontext()
+
+
+def escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    type = "untyped"
+
+    def __init__(self, name, help_="", labels=()):
+        self.name = name
+        self.help = help_
+        self.labels = tuple(labels)
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def samples(self):
+        # (suffix, label values, extra labels, value)
+        with self.lock:
+            return [("", k, (), v) for k, v in self.values.items()]
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for suffix, values, extra, value in self.samples():
+            pairs = list(zip(self.labels, values)) + list(extra)
+            labels = "{" + ",".join(f'{k}="{escape(v)}"' for k, v in pairs) + "}" if pairs else ""
+            lines.append(f"{self.name}{suffix}{labels} {number(value)}")
+        return "\n".join(lines)
+
+    def __str__(self):
+        return f"{type(self).__name__}({self.name})"
+
+    def __repr__(self):
+        return str(self)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def get(self, *labels):
+        return self.values.get(labels, 0)
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def __init__(self, name, help_="", labels=(), fn=None):
+        Metric.__init__(self, name, help_, labels)
+        # read at scrape time, returns a number or {label values: number}; nothing is paid between scrapes
+        self.fn = fn
+
+    def set(self, value, *labels):
+        with self.lock:
+            self.values[labels] = value
+
+    def samples(self):
+        if self.fn is None:
+            return Metric.samples(self)
+        value = self.fn()
+        if not isinstance(value, dict):
+            value = {(): value}
+        return [("", k, (), v) for k, v in value.items()]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help_="", labels=(), buckets=DEFAULT_BUCKETS):
+        Metric.__init__(self, name, help_, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        with self.lock:
+            h = self.values.get(labels)
+            if h is None:
+                # one slot per bucket plus +Inf, then the sum
+                h = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.]
+            h[bisect_left(self.buckets, value)] += 1
+            h[-1] += value
+
+    def count(self, *labels):
+        h = self.values.get(labels)
+        return sum(h[:-1]) if h is not None else 0
+
+    def samples(self):
+        with self.lock:
+            values = [(k, list(h)) for k, h in self.values.items()]
+        out = []
+        for k, h in values:
+            total = 0
+            for bound, n in zip(self.buckets + (float("inf"),), h):
+                total += n
+                out.append(("_bucket", k, (("le", number(float(bound))),), total))
+            out.append(("_sum", k, (), h[-1]))
+            out.append(("_count", k, (), total))
+        return out
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = self.server.registry.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self.server = None
+
+    def register(self, metric):
+        # asking twice for the same name returns the metric created first
+        with self.lock:
+            existing = self.metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric):
+                    raise ValueError(f"{metric.name} is already registered as a {existing.type}")
+                return existing
+            self.metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name, help_="", labels=()):
+        return self.register(Counter(name, help_, labels))
+
+    def gauge(self, name, help_="", labels=(), fn=None):
+        return self.register(Gauge(name, help_, labels, fn))
+
+    def histogram(self, name, help_="", labels=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, help_, labels, buckets))
+
+    def render(self):
+        with self.lock:
+            metrics = list(self.metrics.values())
+        return "\n".join(m.render() for m in metrics) + "\n"
+
+    def serve(self, host="0.0.0.0", port=9464):
+        # a /metrics endpoint for prometheus to scrape, any path answers
+        self.server = ThreadingHTTPServer((host, port), MetricsHandler)
+        self.server.daemon_threads = True
+        self.server.registry = self
+        threading.Thread(target=self.server.serve_forever, name="telebotapi-metrics", daemon=True).start()
+        return self.server
+
+    def close(self):
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+class Metrics:
+    # the instruments the library reports to; a bot without one only pays a None check per call.
+    # tracer is anything with start_as_current_span(name, attributes=...), e.g. an opentelemetry Tracer
+    def __init__(self, registry=None, tracer=None, prefix="telebotapi"):
+        self.registry = Registry() if registry is None else registry
+        self.tracer = tracer
+        r = self.registry
+        self.query_seconds = r.histogram(f"{prefix}_query_seconds", "Bot API request latency", ("method",))
+        self.retries = r.counter(f"{prefix}_query_retries_total", "Bot API requests sent again", ("method", "reason"))
+        self.errors = r.counter(f"{prefix}_query_errors_total", "Bot API errors by exception", ("method", "error"))
+        self.rate_limited = r.histogram(f"{prefix}_rate_limit_wait_seconds", "Time spent in the rate limiter",
+                                        ("method",))
+        self.received = r.counter(f"{prefix}_updates_received_total", "Updates received", ("bot",))
+        self.handler_seconds = r.histogram(f"{prefix}_handler_seconds", "Callback and handler duration",
+                                           ("handler",))
+        self.handler_errors = r.counter(f"{prefix}_handler_errors_total", "Callbacks and handlers that raised",
+                                        ("handler",))
+        self.bots = weakref.WeakSet()
+        self.forks = weakref.WeakSet()
+        r.gauge(f"{prefix}_updates_backlog", "Updates queued and not consumed yet", ("bot",),
+                lambda: {(bot.name or "bot",): len(bot.updates) for bot in list(self.bots)})
+        r.gauge(f"{prefix}_forks_active", "Attached forks", (),
+                lambda: sum(len(f.forks) for f in list(self.forks)))
+
+    def watch_bot(self, bot):
+        self.bots.add(bot)
+
+    def watch_forks(self, forks):
+        self.forks.add(forks)
+
+    def span(self, name, attributes):
+        if self.tracer is None:
+            return NULL_SPAN
+        return self.tracer.start_as_current_span(name, attributes=attributes)
+
+    def handled(self, name, elapsed, failed):
+        self.handler_seconds.observe(elapsed, name)
+        if failed:
+            self.handler_errors.inc(name)
+
+    def render(self):
+        return self.registry.render()
+
+    def __str__(self):
+        return f"Metrics({len(self.registry.metrics)} metrics)"
+
+    def __repr__(self):
+        return str(self)
@@ -0,0 +1,192 @@
+from types import MappingProxyType
+
+EMPTY = MappingProxyType({})
+
+
+class lazy:
+    member = None
+
+    def __init__(self, decode, requires=(), deferred=False):
+        self.decode = decode
+        self.requires = requires
+        # deferred fields are skipped by Model.decode() and only forced by Model.drop_raw()
+        self.deferred = deferred
+        self.name = decode.__name__
+
+    @classmethod
+    def on(cls, *keys):
+        # the field only exists when all of these raw keys are present
+        return lambda decode: cls(decode, keys)
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def present(self, raw):
+        for k in self.requires:
+            if k not in raw:
+                return False
+        return True
+
+    def load(self, obj):
+        raw = obj.raw
+        if raw is None or not self.present(raw):
+            raise AttributeError(self.name)
+        try:
+            value = self.decode(obj, raw)
+        except KeyError:
+            raise AttributeError(self.name) from None
+        self.member.__set__(obj, value)
+        return value
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        # an empty slot means the field has not been decoded yet
+        try:
+            return self.member.__get__(obj, owner)
+        except AttributeError:
+            return self.load(obj)
+
+    def __set__(self, obj, value):
+        self.member.__set__(obj, value)
+
+
+class ModelType(type):
+    # gives every lazy field a "_<name>" slot, so models never carry a per-instance __dict__
+    def __new__(mcs, name, bases, ns, **kwargs):
+        taken = set()
+        for b in bases:
+            for k in b.__mro__:
+                taken.update(k.__dict__.get("__slots__", ()))
+        slots = list(ns.get("__slots__", ()))
+        for k, v in ns.items():
+            if isinstance(v, lazy) and "_" + k not in taken and "_" + k not in slots:
+                slots.append("_" + k)
+        ns["__slots__"] = tuple(slots)
+        cls = super().__new__(mcs, name, bases, ns, **kwargs)
+        fields = {}
+        attributes = set()
+        for k in reversed(cls.__mro__):
+            attributes.update(k.__dict__.get("__slots__", ()))
+            for n, v in vars(k).items():
+                if isinstance(v, lazy):
+                    fields[n] = v
+                    attributes.add(n)
+        for n, v in fields.items():
+            if v.member is None:
+                v.member = getattr(cls, "_" + n)
+        cls.lazy_fields = tuple(fields.values())
+        # models with only deferred fields have nothing for decode() to do
+        cls.decodable = any(not f.deferred for f in cls.lazy_fields)
+        cls.decode_plan = tuple((f.decode, f.requires, f.member.__set__) for f in cls.lazy_fields if not f.deferred)
+        cls.attributes = frozenset(attributes)
+        return cls
+
+
+class Model(metaclass=ModelType):
+    __slots__ = ("raw",)
+    # raw keys decoded into declared fields, everything else ends up in extra
+    known = frozenset()
+
+    def __init__(self, raw):
+        self.raw = raw
+
+    def extra(self, c):
+        known = self.known
+        extra = {k: v for k, v in c.items() if k not in known}
+        return extra if extra else EMPTY
+
+    extra = lazy(extra, deferred=True)
+
+    def decode(self, fresh=False):
+        # forces every lazy field, nested models included; fresh skips the checks for already decoded
+        # fields, which is only correct right after construction
+        raw = self.raw
+        if raw is None:
+            return self
+        if fresh:
+            for decode, requires, store in self.decode_plan:
+                if requires:
+                    for k in requires:
+                        if k not in raw:
+                            break
+                    else:
+                        requires = None
+                    if requires is not None:
+                        continue
+                try:
+                    value = decode(self, raw)
+                except (KeyError, AttributeError):
+                    continue
+                store(self, value)
+                if isinstance(value, Model):
+                    if value.decodable:
+                        value.decode(True)
+                elif value.__class__ is list:
+                    for i in value:
+                        if isinstance(i, Model) and i.decodable:
+                            i.decode(True)
+            return self
+        for f in self.lazy_fields:
+            if f.deferred:
+                continue
+            try:
+                value = f.member.__get__(self)
+            except AttributeError:
+                pass
+            else:
+                if isinstance(value, Model) and value.decodable:
+                    value.decode()
+                elif value.__class__ is list:
+                    for i in value:
+                        if isinstance(i, Model) and i.decodable:
+                            i.decode()
+                continue
+            if f.requires and not f.present(raw):
+                continue
+            try:
+                value = f.decode(self, raw)
+            except (KeyError, AttributeError):
+                continue
+            f.member.__set__(self, value)
+            if isinstance(value, Model):
+                if value.decodable:
+                    value.decode(True)
+            elif value.__class__ is list:
+                for i in value:
+                    if isinstance(i, Model) and i.decodable:
+                        i.decode(True)
+        return self
+
+    def drop_raw(self):
+        # decodes everything first, afterwards the model no longer references the raw dict
+        if self.raw is None:
+            return self
+        self.decode()
+        for f in self.lazy_fields:
+            try:
+                value = f.member.__get__(self)
+            except AttributeError:
+                if f.deferred:
+                    try:
+                        f.load(self)
+                    except AttributeError:
+                        pass
+                continue
+            if isinstance(value, Model):
+                value.drop_raw()
+            elif value.__class__ is list:
+                for i in value:
+                    if isinstance(i, Model):
+                        i.drop_raw()
+        self.raw = None
+        return self
+
+    def __getattr__(self, name):
+        # only reached for names that are not set, unknown raw keys are served from extra
+        if name in self.attributes or name.startswith("_"):
+            raise AttributeError(name)
+        try:
+            return self.extra[name]
+        except KeyError:
+            raise AttributeError(name) from None
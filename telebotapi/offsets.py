@@ -0,0 +1,169 @@
+import os
+import threading
+from json import dumps, loads, JSONDecodeError
+from time import monotonic
+
+
+class OffsetStore:
+    # in memory only, tracks what has been fetched and acknowledged but forgets it on restart
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.fetched = 0
+        self.pending = {}
+        self.acked = 0
+
+    def load(self):
+        # returns the offset to poll from and the raw updates that were fetched but never acknowledged
+        with self.lock:
+            return self.fetched, [self.pending[i] for i in sorted(self.pending)]
+
+    def received(self, updates):
+        with self.lock:
+            for u in updates:
+                self.pending[u["update_id"]] = u
+                self.fetched = max(self.fetched, u["update_id"] + 1)
+
+    def ack(self, update_ids):
+        with self.lock:
+            for i in update_ids:
+                if self.pending.pop(i, None) is not None:
+                    self.acked += 1
+
+    @property
+    def offset(self):
+        # everything below this id has been acknowledged
+        with self.lock:
+            return min(self.pending) if self.pending else self.fetched
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.flush()
+
+    def stats(self):
+        with self.lock:
+            return {"fetched": self.fetched, "pending": len(self.pending), "acked": self.acked}
+
+    def __len__(self):
+        return len(self.pending)
+
+
+class FileOffsetStore(OffsetStore):
+    # append-only journal: {"u": update} when an update is received, {"a": [ids]} for a batch of acks and
+    # {"o": offset} at the top of a compacted file
+    def __init__(self, path, batch=256, interval=1., compact_every=10000):
+        OffsetStore.__init__(self)
+        self.path = path
+        self.batch = batch
+        self.interval = interval
+        self.compact_every = compact_every
+        self.unflushed = []
+        self.last_flush = monotonic()
+        self.lines = 0
+        self.syncs = 0
+        if os.path.exists(path):
+            self.replay()
+        self.file = open(path, "a")
+
+    def replay(self):
+        acked = set()
+        good = 0
+        with open(self.path, "rb") as f:
+            for line in f:
+                try:
+                    # a line without its newline was cut short as well, even when it happens to parse
+                    entry = loads(line) if line.endswith(b"\n") else None
+                except (JSONDecodeError, UnicodeDecodeError):
+                    entry = None
+                if entry is None:
+                    # torn write from a crash, nothing after it was ever synced
+                    break
+                good += len(line)
+                self.lines += 1
+                if "u" in entry:
+                    u = entry["u"]
+                    self.pending[u["update_id"]] = u
+                    self.fetched = max(self.fetched, u["update_id"] + 1)
+                elif "a" in entry:
+                    acked.update(entry["a"])
+                elif "o" in entry:
+                    self.fetched = max(self.fetched, entry["o"])
+        if good < os.path.getsize(self.path):
+            # new entries must not land behind the torn line, the next replay would stop before them
+            with open(self.path, "r+b") as f:
+                f.truncate(good)
+        # acks may have been journaled before the update itself
+        for i in acked:
+            self.pending.pop(i, None)
+
+    def write(self, entries):
+        for e in entries:
+            self.file.write(dumps(e, separators=(",", ":")) + "\n")
+        self.lines += len(entries)
+
+    def sync(self):
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.syncs += 1
+        self.last_flush = monotonic()
+
+    def received(self, updates):
+        if not updates:
+            return
+        with self.lock:
+            entries = [{"u": u} for u in updates]
+            # pending acks ride along with the fsync that has to happen anyway
+            if self.unflushed:
+                entries.append({"a": self.unflushed})
+                self.unflushed = []
+            self.write(entries)
+            self.sync()
+            for u in updates:
+                self.pending[u["update_id"]] = u
+                self.fetched = max(self.fetched, u["update_id"] + 1)
+
+    def ack(self, update_ids):
+        with self.lock:
+            for i in update_ids:
+                if self.pending.pop(i, None) is not None:
+                    self.acked += 1
+                    self.unflushed.append(i)
+            if len(self.unflushed) >= self.batch or monotonic() - self.last_flush >= self.interval:
+                self.flush_locked()
+
+    def flush_locked(self):
+        if self.unflushed:
+            self.write([{"a": self.unflushed}])
+            self.unflushed = []
+            self.sync()
+        if self.lines >= self.compact_every and len(self.pending) < self.lines // 2:
+            self.compact()
+
+    def flush(self):
+        with self.lock:
+            self.flush_locked()
+
+    def compact(self):
+        # rewrites the journal with only the offset and the unacknowledged updates
+        tmp = self.path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(dumps({"o": self.fetched}) + "\n")
+            for i in sorted(self.pending):
+                f.write(dumps({"u": self.pending[i]}, separators=(",", ":")) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        self.file.close()
+        os.replace(tmp, self.path)
+        self.file = open(self.path, "a")
+        self.lines = len(self.pending) + 1
+
+    def close(self):
+        with self.lock:
+            self.flush_locked()
+            self.file.close()
+
+    def stats(self):
+        s = OffsetStore.stats(self)
+        s.update({"unflushed": len(self.unflushed), "syncs": self.syncs, "journal_lines": self.lines})
+        return s
@@ -0,0 +1,169 @@
+import threading
+from collections import deque
+from itertools import count
+from queue import Empty, Full
+from .chats import Chat, User
+
+
+class UpdateQueue:
+    class Entry:
+        __slots__ = ("seq", "update", "taken")
+
+        def __init__(self, seq, update):
+            self.seq = seq
+            self.update = update
+            self.taken = False
+
+    def __init__(self, maxsize=0, block=True, per_chat=True):
+        self.maxsize = maxsize
+        self.block = block
+        self.per_chat = per_chat
+        self.cond = threading.Condition()
+        self.counter = count()
+        self.entries = deque()
+        self.by_chat = {}
+        self.by_user = {}
+        self.size = 0
+        self.garbage = 0
+
+    @staticmethod
+    def keys(update):
+        # read from the raw payload while there is one, queueing a lazy update must not decode it
+        raw = update.raw
+        if raw is None:
+            content = update.content
+            chat = getattr(content, "chat", None)
+            from_ = getattr(content, "from_", None)
+            return None if chat is None else chat.id, None if from_ is None else from_.id
+        c = raw[update.envelope]
+        from_ = c.get("from")
+        if update.envelope == "callback_query":
+            # CallbackQuery.chat is the chat of the message the button is on
+            c = c.get("message", {})
+        chat = c.get("chat")
+        return None if chat is None else chat["id"], None if from_ is None else from_["id"]
+
+    def put(self, update, block=None, timeout=None):
+        if block is None:
+            block = self.block
+        with self.cond:
+            if self.maxsize and self.size >= self.maxsize:
+                if not block or not self.cond.wait_for(lambda: self.size < self.maxsize, timeout):
+                    raise Full(f"update queue is full ({self.maxsize})")
+            e = self.Entry(next(self.counter), update)
+            self.entries.append(e)
+            if self.per_chat:
+                chat_id, user_id = self.keys(update)
+                if chat_id is not None:
+                    self.by_chat.setdefault(chat_id, deque()).append(e)
+                if user_id is not None:
+                    self.by_user.setdefault(user_id, deque()).append(e)
+            self.size += 1
+            self.cond.notify_all()
+
+    def get(self, block=True, timeout=None, from_=None):
+        with self.cond:
+            e = self.peek(from_)
+            if e is None:
+                if not block or not self.cond.wait_for(lambda: self.peek(from_) is not None, timeout):
+                    raise Empty
+                e = self.peek(from_)
+            return self.take(e)
+
+    def get_nowait(self, from_=None):
+        return self.get(False, from_=from_)
+
+    def drain(self, from_=None):
+        while True:
+            try:
+                yield self.get(False, from_=from_)
+            except Empty:
+                return
+
+    def peek(self, from_=None):
+        # returns the oldest live entry matching from_, dropping stale heads on the way
+        if from_ is None:
+            return self.head(self.entries)
+        if isinstance(from_, list):
+            heads = [e for e in map(self.peek, from_) if e is not None]
+            return min(heads, key=lambda e: e.seq) if heads else None
+        if not isinstance(from_, Chat):
+            raise TypeError(f"Parameter \"from_\" must be User or Chat {type(from_)} provided.")
+        if not self.per_chat:
+            return self.scan(from_)
+        index = self.by_user if isinstance(from_, User) else self.by_chat
+        q = index.get(from_.id)
+        if q is None:
+            return None
+        e = self.head(q)
+        if e is None:
+            del index[from_.id]
+        return e
+
+    @staticmethod
+    def head(q):
+        while q and q[0].taken:
+            q.popleft()
+        return q[0] if q else None
+
+    def scan(self, from_):
+        for e in self.entries:
+            if e.taken:
+                continue
+            chat_id, user_id = self.keys(e.update)
+            if (user_id if isinstance(from_, User) else chat_id) == from_.id:
+                return e
+        return None
+
+    def take(self, e):
+        e.taken = True
+        self.size -= 1
+        self.garbage += 1
+        # taken entries are left behind in the other indexes, compact once they outnumber live ones
+        if self.garbage > max(self.size, 1024):
+            self.compact()
+        self.cond.notify_all()
+        return e.update
+
+    def compact(self):
+        self.entries = deque(e for e in self.entries if not e.taken)
+        for index in (self.by_chat, self.by_user):
+            for k in list(index):
+                q = deque(e for e in index[k] if not e.taken)
+                if q:
+                    index[k] = q
+                else:
+                    del index[k]
+        self.garbage = 0
+
+    def clear(self):
+        with self.cond:
+            for e in self.entries:
+                e.taken = True
+            self.entries.clear()
+            self.by_chat.clear()
+            self.by_user.clear()
+            self.size = 0
+            self.garbage = 0
+            self.cond.notify_all()
+
+    def qsize(self):
+        return self.size
+
+    def empty(self):
+        return self.size == 0
+
+    def full(self):
+        return bool(self.maxsize) and self.size >= self.maxsize
+
+    def __len__(self):
+        return self.size
+
+    def __bool__(self):
+        return self.size > 0
+
+    def __str__(self):
+        return f"UpdateQueue({self.size}/{self.maxsize or 'inf'})"
+
+    def __repr__(self):
+        return str(self)
@@ -0,0 +1,137 @@
+import threading
+from time import monotonic, sleep
+
+LIMITED = frozenset(("sendMessage", "sendPhoto", "sendSticker", "sendDocument", "forwardMessage",
+                     "editMessageText", "editMessageCaption", "editMessageReplyMarkup"))
+
+
+class TokenBucket:
+    __slots__ = ("interval", "tolerance", "tat")
+
+    def __init__(self, rate, burst=1):
+        self.interval = 1 / rate
+        self.tolerance = (burst - 1) * self.interval
+        # theoretical arrival time of the next request, the bucket is full while it lies in the past
+        self.tat = 0.
+
+    def ready(self, now):
+        return max(now, self.tat - self.tolerance)
+
+    def take(self, at):
+        self.tat = max(self.tat, at) + self.interval
+
+    def idle(self, now):
+        return self.tat <= now
+
+
+def is_group(chat_id):
+    # private chats have positive ids, groups, supergroups and channels negative ones or an @username
+    if isinstance(chat_id, str):
+        return chat_id.startswith(("-", "@"))
+    return chat_id < 0
+
+
+class RateLimiter:
+    def __init__(self, rate=30, burst=30, chat_rate=1, chat_burst=3, group_rate=20 / 60, group_burst=3,
+                 methods=LIMITED, on_wait=None):
+        self.rate = (rate, burst)
+        self.chat_rate = (chat_rate, chat_burst)
+        self.group_rate = (group_rate, group_burst)
+        self.methods = methods
+        # called with (method, chat_id, waited) after every limited call left the queue
+        self.on_wait = on_wait
+        self.lock = threading.Lock()
+        self.bucket = TokenBucket(rate, burst)
+        self.chats = {}
+        self.blocked = {}
+        self.reserved = 0
+        self.calls = 0
+        self.delayed = 0
+        self.throttled = 0
+        self.total_wait = 0.
+        self.max_wait = 0.
+
+    def limits(self, method):
+        return method in self.methods
+
+    def reserve(self, chat_id=None):
+        # books a slot on the chat bucket and returns how long to wait for it; callers are served in
+        # reservation order, which smooths bursts instead of rejecting them
+        if chat_id is None:
+            return 0.
+        with self.lock:
+            now = monotonic()
+            chat = self.chats.get(chat_id)
+            if chat is None:
+                chat = self.chats[chat_id] = TokenBucket(*(self.group_rate if is_group(chat_id) else self.chat_rate))
+            at = max(chat.ready(now), self.blocked.get(chat_id, 0.))
+            chat.take(at)
+            self.reserved += 1
+            if self.reserved % 1024 == 0:
+                self.prune(now)
+            return at - now
+
+    def reserve_global(self):
+        # only booked once the chat is ready, so a chat that is held back never blocks the others
+        with self.lock:
+            now = monotonic()
+            at = self.bucket.ready(now)
+            self.bucket.take(at)
+            return at - now
+
+    def prune(self, now):
+        for k in [k for k, b in self.chats.items() if b.idle(now)]:
+            del self.chats[k]
+        for k in [k for k, t in self.blocked.items() if t <= now]:
+            del self.blocked[k]
+
+    def wait(self, method, chat_id=None):
+        start = monotonic()
+        delay = self.reserve(chat_id)
+        if delay > 0:
+            sleep(delay)
+        delay = self.reserve_global()
+        if delay > 0:
+            sleep(delay)
+        return self.record(method, chat_id, monotonic() - start)
+
+    def record(self, method, chat_id, waited):
+        with self.lock:
+            self.calls += 1
+            if waited > 0.001:
+                self.delayed += 1
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+        if self.on_wait is not None:
+            self.on_wait(method, chat_id, waited)
+        return waited
+
+    def penalize(self, chat_id, retry_after):
+        # a 429 only holds back the chat it was returned for, without a chat the whole bot waits
+        with self.lock:
+            self.throttled += 1
+            until = monotonic() + retry_after
+            if chat_id is None:
+                self.bucket.tat = max(self.bucket.tat, until + self.bucket.tolerance)
+            else:
+                self.blocked[chat_id] = max(self.blocked.get(chat_id, 0.), until)
+
+    def stats(self):
+        with self.lock:
+            now = monotonic()
+            return {
+                "calls": self.calls,
+                "delayed": self.delayed,
+                "throttled": self.throttled,
+                "blocked_chats": sum(1 for t in self.blocked.values() if t > now),
+                "tracked_chats": len(self.chats),
+                "total_wait": self.total_wait,
+                "max_wait": self.max_wait,
+                "avg_wait": self.total_wait / self.calls if self.calls else 0.
+            }
+
+    def __str__(self):
+        return f"RateLimiter({self.rate[0]}/s, chat={self.chat_rate[0]}/s, group={self.group_rate[0]:.2f}/s)"
+
+    def __repr__(self):
+        return str(self)
@@ -0,0 +1,279 @@
+import threading
+from random import uniform
+from time import monotonic
+from sys import stderr
+from requests.exceptions import ConnectionError, ConnectTimeout
+from urllib3.exceptions import NewConnectionError
+from .exceptions import CircuitOpen, QueryException, TooManyRequests
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+# sending one of these twice leaves the same state behind as sending it once
+IDEMPOTENT = frozenset((
+    "getMe", "getUpdates", "getChat", "getFile", "getChatMember", "getChatAdministrators", "getChatMemberCount",
+    "getUserProfilePhotos", "getMyCommands", "getStickerSet", "getWebhookInfo", "setWebhook", "deleteWebhook",
+    "setMyCommands", "deleteMyCommands", "editMessageText", "editMessageCaption", "editMessageMedia",
+    "editMessageReplyMarkup", "deleteMessage", "sendChatAction", "pinChatMessage", "unpinChatMessage",
+    "banChatMember", "unbanChatMember", "restrictChatMember", "promoteChatMember", "setChatTitle",
+    "setChatDescription", "download"
+))
+
+
+def unsent(error):
+    # the request failed before any of it reached the server, sending it again cannot duplicate anything
+    if isinstance(error, ConnectTimeout):
+        return True
+    if isinstance(error, ConnectionError):
+        reason = getattr(error.args[0], "reason", None) if error.args else None
+        return isinstance(reason, NewConnectionError)
+    return aiohttp is not None and isinstance(error, aiohttp.ClientConnectorError)
+
+
+class RetryBudget:
+    # retries spend tokens: every request earns ratio of one and min_per_second more trickle in regardless,
+    # so when everything fails retries stop multiplying the load as soon as the balance is gone
+    def __init__(self, ratio=.2, min_per_second=1., max_tokens=100.):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self.tokens = max_tokens
+        self.updated = monotonic()
+        self.lock = threading.Lock()
+        self.spent = 0
+        self.denied = 0
+
+    def refill(self, now):
+        self.tokens = min(self.tokens + (now - self.updated) * self.min_per_second, self.max_tokens)
+        self.updated = now
+
+    def deposit(self):
+        with self.lock:
+            self.refill(monotonic())
+            self.tokens = min(self.tokens + self.ratio, self.max_tokens)
+
+    def withdraw(self):
+        with self.lock:
+            self.refill(monotonic())
+            if self.tokens < 1:
+                self.denied += 1
+                return False
+            self.tokens -= 1
+            self.spent += 1
+            return True
+
+    def stats(self):
+        with self.lock:
+            return {"tokens": self.tokens, "spent": self.spent, "denied": self.denied}
+
+
+class RetryPolicy:
+    # decides whether a failed request is sent again and after how long. Requests that may have reached the server
+    # are only repeated for idempotent methods, so a timed out sendMessage is raised instead of sent twice.
+    # persistent methods, polling, are retried without limit or budget: nobody waits for them to give up
+    def __init__(self, max_attempts=4, base=.5, cap=30., budget=None, idempotent=IDEMPOTENT,
+                 persistent=frozenset(("getUpdates", ))):
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.base = base
+        self.cap = cap
+        self.budget = RetryBudget() if budget is None else budget or None
+        self.idempotent = idempotent
+        self.persistent = persistent
+
+    def backoff(self, attempt):
+        # full jitter: anywhere between nothing and the exponential step, so clients recovering together spread out
+        # the exponent is clamped, polling retries forever and 2 ** attempt would overflow a float after ~1000 tries
+        return uniform(0, min(self.cap, self.base * 2. ** min(attempt, 32)))
+
+    def started(self, method):
+        if self.budget is not None and method not in self.persistent:
+            self.budget.deposit()
+
+    def retry(self, method, attempt, sent=True):
+        # the delay before attempt number attempt + 1, or None to give up and raise
+        if sent and method not in self.idempotent:
+            return None
+        if method not in self.persistent:
+            if attempt >= self.max_attempts:
+                return None
+            if self.budget is not None and not self.budget.withdraw():
+                return None
+        return self.backoff(attempt)
+
+    def stats(self):
+        return self.budget.stats() if self.budget is not None else {}
+
+    def __str__(self):
+        return f"RetryPolicy({self.max_attempts} attempts, backoff up to {self.cap}s)"
+
+    def __repr__(self):
+        return str(self)
+
+
+class CircuitBreaker:
+    # after threshold failures in a row the api counts as down and calls fail fast with CircuitOpen; reset_timeout
+    # seconds later up to probes calls go through, the first success closes the circuit and a failure opens it again
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, threshold=5, reset_timeout=30., probes=1):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.probes = probes
+        self.state = self.CLOSED
+        self.failures = 0
+        self.probing = 0
+        self.opened = 0.
+        self.lock = threading.Lock()
+        self.rejected = 0
+        self.trips = 0
+
+    def allow(self):
+        # (wait, probe): wait is None when the call may go, otherwise the seconds until the next probe; a probe
+        # holds one of the half open slots until success(), failure() or abandon()
+        with self.lock:
+            if self.state == self.CLOSED:
+                return None, False
+            now = monotonic()
+            if self.state == self.OPEN:
+                if now < self.opened + self.reset_timeout:
+                    self.rejected += 1
+                    return self.opened + self.reset_timeout - now, False
+                self.state = self.HALF_OPEN
+                self.probing = 0
+            if self.probing < self.probes:
+                self.probing += 1
+                return None, True
+            self.rejected += 1
+            return 0., False
+
+    def abandon(self):
+        # a probe that ended without an answer either way, e.g. cancelled, gives its slot to the next call
+        with self.lock:
+            if self.state == self.HALF_OPEN and self.probing > 0:
+                self.probing -= 1
+
+    def success(self):
+        with self.lock:
+            self.failures = 0
+            self.probing = 0
+            if self.state != self.CLOSED:
+                print(":: circuit closed, the Bot API answers again")
+                self.state = self.CLOSED
+
+    def failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.state == self.CLOSED and self.failures >= self.threshold:
+                if self.state == self.CLOSED:
+                    print(f":: warning: circuit open after {self.failures} failures, failing fast for "
+                          f"{self.reset_timeout} seconds")
+                    self.trips += 1
+                self.state = self.OPEN
+                self.opened = monotonic()
+                self.probing = 0
+
+    def stats(self):
+        with self.lock:
+            return {"state": self.state, "failures": self.failures, "rejected": self.rejected, "trips": self.trips}
+
+    def __str__(self):
+        return f"CircuitBreaker({self.state})"
+
+    def __repr__(self):
+        return str(self)
+
+
+class Attempts:
+    # the attempts of one request through the retry policy, the circuit breaker and the metrics. Every decision is
+    # taken here, TelegramBot and AsyncTelegramBot only send, and sleep for the delays they are given
+    __slots__ = ("bot", "method", "params", "policy", "breaker", "gated", "metrics", "attempt", "probe")
+
+    def __init__(self, bot, method, params, breaker=True):
+        self.bot = bot
+        self.method = method
+        self.params = params
+        self.policy = bot.retry_policy
+        self.breaker = bot.circuit_breaker if breaker else None
+        # polling is never failed fast, its answers are what closes the circuit again
+        self.gated = self.breaker is not None and method not in self.policy.persistent
+        self.metrics = bot.metrics
+        self.attempt = 0
+        self.probe = False
+        self.policy.started(method)
+
+    def begin(self):
+        self.attempt += 1
+        if self.gated:
+            wait, self.probe = self.breaker.allow()
+            if wait is not None:
+                raise CircuitOpen(self.method, self.params, wait)
+
+    def settle(self):
+        # called after every attempt however it ended; a probe without an outcome must not hold its slot forever
+        if self.probe:
+            self.probe = False
+            self.breaker.abandon()
+
+    def success(self):
+        self.probe = False
+        if self.breaker is not None:
+            self.breaker.success()
+
+    def failure(self):
+        self.probe = False
+        if self.breaker is not None:
+            self.breaker.failure()
+
+    def failed(self, error):
+        # a network error: the delay before trying again, or None to raise it
+        self.failure()
+        delay = self.policy.retry(self.method, self.attempt, not unsent(error))
+        if self.metrics is not None:
+            if delay is None:
+                self.metrics.errors.inc(self.method, type(error).__name__)
+            else:
+                self.metrics.retries.inc(self.method, "timeout")
+        if delay is not None:
+            print(f"Telegram timed out, retrying in {delay:.1f} seconds...")
+        return delay
+
+    def answered(self, r, elapsed):
+        # an answer: the delay before trying again for a server error that may be retried, otherwise None
+        if self.metrics is not None:
+            self.metrics.query_seconds.observe(elapsed, self.method)
+        if r["ok"] or (r.get("error_code") or 0) < 500:
+            self.success()
+            return None
+        # the api, or a proxy in front of it, is failing; the request may have been carried out anyway
+        self.failure()
+        delay = self.policy.retry(self.method, self.attempt)
+        if delay is not None:
+            if self.metrics is not None:
+                self.metrics.retries.inc(self.method, "server_error")
+            print(f"Telegram answered {r['error_code']}, retrying in {delay:.1f} seconds...")
+        return delay
+
+    def error(self, r, limited, chat_id):
+        # an answer that is not ok: (exception, None) to raise it, or (exception, delay) to send the request again
+        # after delay seconds, which is 0 when the rate limiter already holds the chat back
+        exc = QueryException.cast(r, self.method, self.params)
+        if self.metrics is not None:
+            self.metrics.errors.inc(self.method, type(exc).__name__)
+        if not isinstance(exc, TooManyRequests):
+            return exc, None
+        delay = int(exc.delay or 30)
+        if limited:
+            # the limiter holds back this chat only, the retry queues behind the penalty
+            self.bot.rate_limiter.penalize(chat_id, delay)
+        if not self.bot.auto_retry:
+            return exc, None
+        if self.metrics is not None:
+            self.metrics.retries.inc(self.method, "too_many_requests")
+        print(f"too many requests, waiting {delay} seconds", file=stderr)
+        return exc, 0 if limited else delay
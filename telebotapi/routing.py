@@ -0,0 +1,126 @@
+from itertools import count
+from .chats import Chat
+
+
+def command_of(msg):
+    text = getattr(msg, "text", None)
+    if not isinstance(text, str) or not text.startswith("/"):
+        return None
+    # "/start@my_bot payload" -> "start"
+    parts = text[1:].split(maxsplit=1)
+    return parts[0].split("@", 1)[0] if parts else None
+
+
+class Route:
+    def __init__(self, chat=None, user=None, type_=None, command=None, callback_prefix=None):
+        self.chat = chat.id if isinstance(chat, Chat) else chat
+        self.user = user.id if isinstance(user, Chat) else user
+        self.type = type_
+        self.command = command.lstrip("/") if command is not None else None
+        self.callback_prefix = callback_prefix
+
+    def match(self, msg):
+        if self.chat is not None:
+            chat = getattr(msg, "chat", None)
+            if chat is None or chat.id != self.chat:
+                return False
+        if self.user is not None:
+            from_ = getattr(msg, "from_", None)
+            if from_ is None or from_.id != self.user:
+                return False
+        if self.type is not None and getattr(msg, "type", None) != self.type:
+            return False
+        if self.command is not None and command_of(msg) != self.command:
+            return False
+        if self.callback_prefix is not None:
+            data = getattr(msg, "data", None)
+            if not isinstance(data, str) or not data.startswith(self.callback_prefix):
+                return False
+        return True
+
+    def primary(self):
+        # the most selective key decides where the route is indexed
+        for dimension in ("chat", "user", "callback_prefix", "command", "type"):
+            value = getattr(self, dimension)
+            if value is not None:
+                return dimension, value
+        return None, None
+
+    def __str__(self):
+        keys = ", ".join(f"{k}={v!r}" for k, v in vars(self).items() if v is not None)
+        return f"Route({keys})"
+
+    def __repr__(self):
+        return str(self)
+
+
+class RouteIndex:
+    def __init__(self):
+        self.counter = count()
+        self.routes = {}
+        self.exact = {"chat": {}, "user": {}, "command": {}, "type": {}}
+        self.prefixes = {}
+        self.prefix_lengths = {}
+        self.any = {}
+
+    def add(self, key, route=None):
+        self.remove(key)
+        seq = next(self.counter)
+        self.routes[key] = (seq, route)
+        dimension, value = (None, None) if route is None else route.primary()
+        if dimension is None:
+            self.any[key] = seq
+        elif dimension == "callback_prefix":
+            self.prefixes.setdefault(value, {})[key] = seq
+            self.prefix_lengths[len(value)] = self.prefix_lengths.get(len(value), 0) + 1
+        else:
+            self.exact[dimension].setdefault(value, {})[key] = seq
+
+    def remove(self, key):
+        if key not in self.routes:
+            return
+        _, route = self.routes.pop(key)
+        dimension, value = (None, None) if route is None else route.primary()
+        if dimension is None:
+            self.any.pop(key, None)
+            return
+        if dimension == "callback_prefix":
+            bucket = self.prefixes
+            n = len(value)
+            self.prefix_lengths[n] -= 1
+            if not self.prefix_lengths[n]:
+                del self.prefix_lengths[n]
+        else:
+            bucket = self.exact[dimension]
+        bucket[value].pop(key, None)
+        if not bucket[value]:
+            del bucket[value]
+
+    def candidates(self, msg):
+        found = dict(self.any)
+        chat = getattr(msg, "chat", None)
+        if chat is not None:
+            found.update(self.exact["chat"].get(chat.id, ()))
+        from_ = getattr(msg, "from_", None)
+        if from_ is not None:
+            found.update(self.exact["user"].get(from_.id, ()))
+        type_ = getattr(msg, "type", None)
+        if type_ is not None:
+            found.update(self.exact["type"].get(type_, ()))
+        if self.exact["command"]:
+            command = command_of(msg)
+            if command is not None:
+                found.update(self.exact["command"].get(command, ()))
+        if self.prefixes:
+            data = getattr(msg, "data", None)
+            if isinstance(data, str):
+                for n in self.prefix_lengths:
+                    found.update(self.prefixes.get(data[:n], ()))
+        keys = sorted(found, key=found.get)
+        return [k for k in keys if self.routes[k][1] is None or self.routes[k][1].match(msg)]
+
+    def __len__(self):
+        return len(self.routes)
+
+    def __contains__(self, key):
+        return key in self.routes
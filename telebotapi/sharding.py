@@ -0,0 +1,247 @@
+import multiprocessing
+import os
+import threading
+from bisect import bisect
+from collections import OrderedDict
+from hashlib import blake2b
+from multiprocessing.connection import wait
+from .inflight import InFlight
+from .update import Update
+
+
+def ring_hash(key):
+    return int.from_bytes(blake2b(str(key).encode(), digest_size=8).digest(), "big")
+
+
+class HashRing:
+    # consistent hashing: resizing the ring only moves the chats of the shards that were added or removed
+    def __init__(self, shards, replicas=160):
+        if shards < 1:
+            raise ValueError("a ring needs at least one shard")
+        self.shards = shards
+        points = sorted((ring_hash(f"{s}-{i}"), s) for s in range(shards) for i in range(replicas))
+        self.points = [p[0] for p in points]
+        self.owners = [p[1] for p in points]
+
+    def shard(self, key):
+        return self.owners[bisect(self.points, ring_hash(key)) % len(self.points)]
+
+
+def raw_chat_key(u):
+    # same key as dispatcher.chat_key, read from the raw payload so the update is never decoded here
+    for k, v in u.items():
+        if not isinstance(v, dict):
+            continue
+        if k == "callback_query":
+            # CallbackQuery.chat is the chat of the message the button is on, not the user who pressed it
+            m = v.get("message")
+            if m is not None and "chat" in m:
+                return m["chat"]["id"]
+        for attr in ("chat", "from"):
+            c = v.get(attr)
+            if c is not None:
+                return c["id"]
+    return None
+
+
+def worker(index, setup, inbox, acks, lazy):
+    # setup(index) runs in the worker and returns handle(update), it builds whatever state the shard owns,
+    # e.g. its own Forks and a TelegramBot that never polls
+    handle = setup(index)
+    while True:
+        item = inbox.get()
+        if item is None:
+            break
+        update_id, raw = item
+        try:
+            handle(Update(raw, lazy=lazy))
+        except Exception as e:
+            print(f"Exception caught in shard {index}: {e!r}")
+        # a pipe write is done when send returns, a queue would still buffer it in a thread that dies with us
+        acks.send(update_id)
+
+
+class Shard:
+    __slots__ = ("index", "process", "inbox", "acks", "pending", "inflight", "sent", "acked", "restarts", "dropped")
+
+    def __init__(self, index, max_queued):
+        self.index = index
+        self.process = None
+        self.inbox = None
+        self.acks = None
+        # sent but not acknowledged, in sending order
+        self.pending = OrderedDict()
+        self.inflight = InFlight(max_queued)
+        self.sent = 0
+        self.acked = 0
+        self.restarts = 0
+        self.dropped = 0
+
+    def stats(self):
+        return {"sent": self.sent, "acked": self.acked, "pending": len(self.pending), "restarts": self.restarts,
+                "dropped": self.dropped, "alive": self.process is not None and self.process.is_alive()}
+
+
+class ShardedDispatcher:
+    # partitions updates by chat over worker processes, each one handling its chats one update at a time.
+    # A worker that dies is started again and gets back everything it had not acknowledged, so handlers must
+    # tolerate seeing the update they crashed on more than once
+    def __init__(self, bot, setup, workers=None, replicas=160, max_queued=1024, max_attempts=3, start_method=None,
+                 check_interval=.5):
+        if not bot.keep_raw:
+            raise ValueError("shards receive the raw payload, the bot cannot drop it")
+        self.bot = bot
+        self.setup = setup
+        self.ctx = multiprocessing.get_context(start_method)
+        workers = workers or os.cpu_count()
+        self.ring = HashRing(workers, replicas)
+        self.shards = [Shard(i, max_queued) for i in range(workers)]
+        self.lock = threading.Condition()
+        self.max_attempts = max_attempts
+        self.check_interval = check_interval
+        self.attempts = {}
+        self.running = False
+        self.collector = None
+
+    def spawn(self, shard):
+        shard.inbox = self.ctx.Queue()
+        shard.acks, acks = self.ctx.Pipe(duplex=False)
+        shard.process = self.ctx.Process(target=worker, name=f"telebotapi-shard-{shard.index}", daemon=True,
+                                         args=(shard.index, self.setup, shard.inbox, acks, self.bot.lazy))
+        shard.process.start()
+        acks.close()
+
+    def start(self):
+        self.running = True
+        for shard in self.shards:
+            self.spawn(shard)
+        self.collector = threading.Thread(target=self.collect, name="telebotapi-shards", daemon=True)
+        self.collector.start()
+        return self
+
+    def shard_of(self, raw):
+        key = raw_chat_key(raw)
+        return self.shards[self.ring.shard(raw["update_id"] if key is None else key)]
+
+    def submit(self, u):
+        # blocks while the shard has max_queued updates pending, which stops the caller from pulling more
+        raw = u.raw
+        shard = self.shard_of(raw)
+        shard.inflight.acquire()
+        with self.lock:
+            shard.pending[u.id] = raw
+            shard.sent += 1
+            # under the lock restart() cannot close the inbox in between, and one after this point resends the
+            # update from pending; put only hands the item to the feeder thread, it does not block
+            shard.inbox.put((u.id, raw))
+
+    def run(self):
+        # feeds the updates the bot receives, by polling or webhook, until stop()
+        while self.running:
+            u = self.bot.get_update(self.check_interval)
+            if u is not None:
+                self.submit(u)
+
+    def collect(self):
+        while True:
+            with self.lock:
+                if not self.running and not any(s.pending for s in self.shards):
+                    return
+            # wakes up for acks and for workers exiting, whichever comes first
+            ready = set(wait([s.acks for s in self.shards] + [s.process.sentinel for s in self.shards],
+                             self.check_interval))
+            for shard in self.shards:
+                if shard.acks in ready:
+                    self.drain(shard)
+            for shard in self.shards:
+                if shard.process.sentinel in ready:
+                    if not self.running:
+                        # stopped: what it did not acknowledge is redelivered by the offset store after a restart
+                        self.drain(shard)
+                        with self.lock:
+                            shard.pending.clear()
+                        continue
+                    self.restart(shard)
+
+    def drain(self, shard):
+        try:
+            while shard.acks.poll():
+                self.acked(shard, shard.acks.recv())
+        except EOFError:
+            pass
+
+    def acked(self, shard, update_id):
+        with self.lock:
+            if shard.pending.pop(update_id, None) is None:
+                # acknowledged twice, the worker died after handling it but before its ack was read
+                return
+            self.attempts.pop(update_id, None)
+            shard.acked += 1
+            self.lock.notify_all()
+        shard.inflight.release()
+        if self.bot.offset_store is not None:
+            self.bot.ack(update_id)
+
+    def restart(self, shard):
+        # the sentinel fires as the worker goes away, joining reaps it and sets its exit code
+        shard.process.join()
+        print(f":: warning: shard {shard.index} exited with code {shard.process.exitcode}, restarting")
+        # acks already on their way must not turn into redeliveries
+        self.drain(shard)
+        shard.acks.close()
+        dropped = None
+        with self.lock:
+            # nobody reads the old inbox anymore, its feeder thread must not hold up the exit
+            shard.inbox.cancel_join_thread()
+            shard.inbox.close()
+            shard.restarts += 1
+            if shard.pending:
+                # the worker runs its updates one at a time, so the oldest pending one is the one it died on
+                update_id = next(iter(shard.pending))
+                self.attempts[update_id] = self.attempts.get(update_id, 1) + 1
+                if self.attempts[update_id] > self.max_attempts:
+                    del shard.pending[update_id]
+                    del self.attempts[update_id]
+                    shard.dropped += 1
+                    dropped = update_id
+            self.spawn(shard)
+            for item in shard.pending.items():
+                shard.inbox.put(item)
+        if dropped is not None:
+            print(f":: warning: update {dropped} crashed shard {shard.index} {self.max_attempts} times, dropped")
+            shard.inflight.release()
+            if self.bot.offset_store is not None:
+                self.bot.ack(dropped)
+
+    def join(self, timeout=None):
+        with self.lock:
+            return self.lock.wait_for(lambda: not any(s.pending for s in self.shards), timeout)
+
+    def stop(self, wait=True):
+        if wait:
+            self.join()
+        self.running = False
+        for shard in self.shards:
+            if shard.inbox is not None:
+                shard.inbox.put(None)
+        for shard in self.shards:
+            if shard.process is not None:
+                shard.process.join()
+        if self.collector is not None:
+            self.collector.join()
+
+    def stats(self):
+        with self.lock:
+            return {"shards": [s.stats() for s in self.shards], "pending": sum(len(s.pending) for s in self.shards)}
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def __str__(self):
+        return f"ShardedDispatcher({len(self.shards)} shards)"
+
+    def __repr__(self):
+        return str(self)
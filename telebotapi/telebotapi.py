@@ -1,37 +1,110 @@
 import threading
-from socket import timeout
-from requests import post
-from requests.exceptions import ConnectionError, ConnectTimeout, Timeout
-from time import sleep
+from socket import timeout as socket_timeout
+from requests.exceptions import ChunkedEncodingError, ConnectionError, ConnectTimeout, Timeout
+from time import perf_counter, sleep
+from queue import Empty, Full
+from functools import partial
 from collections.abc import Iterable
-from sys import stderr
+from os import PathLike
 from .update import Update
 from .chats import Chat, User
 from .messages import CallbackQuery, Message, Sticker
-from .files import PhotoFile, Document, File
-from .exceptions import QueryException, TooManyRequests
+from .files import File
+from .transport import SessionTransport
+from .inflight import InFlight
+from .ratelimit import RateLimiter
+from .retry import Attempts, CircuitBreaker, RetryPolicy
+from .broadcast import Broadcast
+from .edits import EditCoalescer
+from .offsets import FileOffsetStore
+from .webhook import WebhookServer
+from .uploads import CHUNK_SIZE, InputFile, MultipartBody
+from .chatcache import ChatCache
+from .metrics import Metrics, NULL_SPAN
+from .downloads import Download, FileCache, PathCache, deliver, file_ids
+from .queues import UpdateQueue
 
 
 class TelegramBot:
-    def __init__(self, token, name=None, safe_mode=None, max_telegram_timeout=60, auto_retry=None):
+    def __init__(self, token, name=None, safe_mode=None, max_telegram_timeout=60, auto_retry=None, transport=None,
+                 pool_connections=4, pool_maxsize=10, max_inflight=8, max_waiting=None,
+                 poll_timeout=0, poll_limit=None, allowed_updates=None, max_updates=0, updates_block=True,
+                 lazy=False, keep_raw=True, rate_limiter=None, offset_store=None, file_cache=None,
+                 chat_cache=None, codec=None, metrics=None, retry_policy=None, circuit_breaker=None):
         if len(token) == 46:
             self.token = token
         else:
             raise self.TokenException("Invalid token length, should be 46 and it's " + str(len(token)))
 
-        self.busy = False
         self.h = {"Content-type": "application/x-www-form-urlencoded", "Accept": "text/plain"}
-        self.updates = []
+        self.updates = UpdateQueue(max_updates, updates_block)
         self.last_update = 0
-        self.updated = False
+        self.updated = threading.Event()
+        # bumped for every queued update, tells a waiting consumer whether anything arrived meanwhile
+        self.fed = 0
         self.name = name
         self.daemon_delay = 1
         self.bootstrapped = False
         self.current_thread = threading.current_thread()
-        self.daemon = self.Daemon(self.poll, self.current_thread, self.daemon_delay)
+        self.poll_timeout = poll_timeout
+        self.poll_limit = poll_limit
+        self.allowed_updates = allowed_updates
+        self.daemon = self.Daemon(self.poll, self.current_thread, self.daemon_delay, self.poll_timeout > 0)
         self.safe_mode = safe_mode
+        if lazy and not keep_raw:
+            raise ValueError("lazy updates decode from the raw payload, they cannot drop it")
+        self.lazy = lazy
+        self.keep_raw = keep_raw
         self.max_telegram_timeout = max_telegram_timeout
         self.auto_retry = auto_retry
+        # telegram only answers once the whole upload is stored, which takes a while for big media
+        self.upload_timeout = max_telegram_timeout
+        if transport is None:
+            # one connection per in-flight request plus one for the poller
+            transport = SessionTransport(pool_connections=pool_connections,
+                                         pool_maxsize=max(pool_maxsize, max_inflight + 1))
+        if codec is not None:
+            transport.codec = codec
+        # json in both directions, orjson when it is installed
+        self.codec = transport.codec
+        self.transport = transport
+        self.inflight = InFlight(max_inflight, max_waiting)
+        self.poll_inflight = InFlight(1)
+        if metrics is True:
+            metrics = Metrics()
+        # None keeps instrumentation off, every hook is then a single attribute check
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.watch_bot(self)
+        if rate_limiter is None:
+            rate_limiter = RateLimiter()
+        # rate_limiter=False sends right away and only reacts to 429s
+        self.rate_limiter = rate_limiter or None
+        if metrics is not None and self.rate_limiter is not None and self.rate_limiter.on_wait is None:
+            self.rate_limiter.on_wait = self.rate_limited
+        if isinstance(offset_store, str):
+            offset_store = FileOffsetStore(offset_store)
+        # with a store the offset only moves past updates that handlers acknowledged with ack()
+        self.offset_store = offset_store
+        self.backlog = []
+        self.webhook_server = None
+        if isinstance(file_cache, str):
+            file_cache = FileCache(file_cache)
+        # downloads are kept by file_unique_id, a file seen again is served from disk without any request
+        self.file_cache = file_cache
+        self.file_paths = PathCache()
+        if chat_cache is None:
+            chat_cache = ChatCache()
+        # chat_cache=False asks telegram every time
+        self.chat_cache = chat_cache if chat_cache is not False else None
+        if retry_policy is None:
+            retry_policy = RetryPolicy(cap=max_telegram_timeout)
+        # retry_policy=False gives up at the first failure, except for polling
+        self.retry_policy = retry_policy or RetryPolicy(1)
+        if circuit_breaker is None:
+            circuit_breaker = CircuitBreaker()
+        # circuit_breaker=False keeps sending while the api is down
+        self.circuit_breaker = circuit_breaker or None
 
     class TokenException(Exception):
         pass
@@ -48,36 +121,117 @@ class TelegramBot:
     class TypeError(Exception):
         pass
 
-    def query(self, method, params, connection=None, headers=None):
-        if headers is None:
+    def request(self, method, params, headers, files, progress):
+        # what a query needs before its first attempt, the same for TelegramBot and AsyncTelegramBot
+        body = None
+        if files is not None:
+            # uploads are streamed, the body is produced while it is sent and rewound for every retry
+            body = MultipartBody(params, files, progress)
+            headers = dict(headers or {}, **{"Content-Type": body.content_type})
+            if body.size is not None:
+                headers["Content-Length"] = str(body.size)
+        elif headers is None:
             headers = self.h
-
-        while self.busy:
-            sleep(0.5)
-
-        delay = 1
+        # getUpdates has its own lane so that polling never waits behind outgoing requests
+        lane = self.poll_inflight if method == "getUpdates" else self.inflight
+        chat_id = params.get("chat_id") if isinstance(params, dict) else None
+        limited = self.rate_limiter is not None and self.rate_limiter.limits(method)
+        return body, headers, lane, chat_id, limited
+
+    def query(self, method, params, connection=None, headers=None, timeout=5, files=None, progress=None):
+        body, headers, lane, chat_id, limited = self.request(method, params, headers, files, progress)
+        if limited:
+            self.rate_limiter.wait(method, chat_id)
+        attempts = Attempts(self, method, params)
         while True:
+            attempts.begin()
             try:
-                self.busy = True
-                r = post("https://api.telegram.org/bot{0}/{1}".format(self.token, method), data=params,
-                         headers=headers, timeout=5).json()
-                break
-            except (timeout, Timeout, ConnectTimeout, ConnectionError):
-                print(f"Telegram timed out, retrying in {delay} seconds...")
-                sleep(delay)
-                delay = min(delay * 2, self.max_telegram_timeout)
+                if body is not None:
+                    body.rewind()
+                with lane.slot():
+                    start = perf_counter()
+                    r = self.transport.post(self.transport.url(self.token, method),
+                                            data=params if body is None else body, headers=headers, timeout=timeout)
+                delay = attempts.answered(r, perf_counter() - start)
+            except (socket_timeout, Timeout, ConnectTimeout, ConnectionError) as e:
+                delay = attempts.failed(e)
+                if delay is None:
+                    raise
             finally:
-                self.busy = False
+                attempts.settle()
+            if delay is None:
+                break
+            sleep(delay)
         if not r["ok"]:
-            exc = QueryException.cast(r, method, params)
-            if isinstance(exc, TooManyRequests) and self.auto_retry:
-                delay = int(exc.timeout or 30)
-                print(f"too many requests, waiting {delay} seconds", file=stderr)
-                sleep(delay)
-                return self.query(method, params, connection, headers)
-            raise exc
+            exc, delay = attempts.error(r, limited, chat_id)
+            if delay is None:
+                raise exc
+            sleep(delay)
+            return self.query(method, params, connection, headers if files is None else None, timeout, files,
+                              progress)
         return r
 
+    def call(self, method, params, cast=None, **kwargs):
+        # every api method goes through here, AsyncTelegramBot overrides it with a coroutine
+        with self.span(method):
+            r = self.query(method, params, **kwargs)
+        return r if cast is None else cast(r)
+
+    def span(self, method):
+        # one span per api call, retries included
+        if self.metrics is None:
+            return NULL_SPAN
+        return self.metrics.span(f"telegram.{method}", {"telegram.method": method, "telegram.bot": self.name or ""})
+
+    def rate_limited(self, method, chat_id, waited):
+        self.metrics.rate_limited.observe(waited, method)
+
+    def encode(self, value):
+        # json parameters such as reply_markup can also be passed already encoded
+        return value if isinstance(value, str) else self.codec.dumps(value)
+
+    @staticmethod
+    def cast_message(r):
+        return Message.cast(r)[0]
+
+    @staticmethod
+    def cast_chat(r):
+        return Chat(r["result"])
+
+    def broadcast(self, chats, template, workers=16, checkpoint=None, **kwargs):
+        # yields a Delivery per recipient as soon as it is done, sends still go through the rate limiter
+        return Broadcast(self, template, workers, checkpoint, **kwargs).run(chats)
+
+    def edit_coalescer(self, interval=1., workers=4, maxsize=10000):
+        # edits of live-updating messages, at most one call per message every interval seconds
+        return EditCoalescer(self, interval, workers, maxsize)
+
+    def connection_stats(self):
+        return self.transport.stats()
+
+    def retry_stats(self):
+        return {
+            "budget": self.retry_policy.stats(),
+            "circuit": self.circuit_breaker.stats() if self.circuit_breaker is not None else None
+        }
+
+    def dispatch_stats(self):
+        return {
+            "requests": self.inflight.stats(),
+            "polling": self.poll_inflight.stats(),
+            "rate_limit": self.rate_limiter.stats() if self.rate_limiter is not None else None,
+            "offsets": self.offset_store.stats() if self.offset_store is not None else None,
+            "downloads": self.file_cache.stats() if self.file_cache is not None else None,
+            "chats": self.chat_cache.stats() if self.chat_cache is not None else None
+        }
+
+    def close(self):
+        if self.webhook_server is not None:
+            self.webhook_server.stop()
+        self.transport.close()
+        if self.offset_store is not None:
+            self.offset_store.close()
+
     def getUpdates(self, a=None):
         # p = self.g
         if a is not None:
@@ -85,52 +239,164 @@ class TelegramBot:
         else:
             a = {}
         p = {"offset": self.last_update}
+        if self.poll_timeout:
+            p["timeout"] = self.poll_timeout
+        if self.poll_limit is not None:
+            p["limit"] = self.poll_limit
+        if self.allowed_updates is not None:
+            p["allowed_updates"] = self.codec.dumps(list(self.allowed_updates))
         p.update(a)
-        return self.query("getUpdates", p)
+        # the connection must outlive the server side long poll
+        return self.call("getUpdates", p, timeout=p.get("timeout", 0) + 5)
 
-    def bootstrap(self):
-        r = self.getUpdates()
+    def restore(self):
+        # resumes from the stored offset and queues what was fetched but never acknowledged
+        if self.offset_store is None:
+            return False
+        offset, self.backlog = self.offset_store.load()
+        if offset:
+            self.last_update = offset
+        return bool(offset)
+
+    def replay(self, block=None):
+        if self.backlog:
+            # whatever was journaled gets queued or dropped, one bad entry must not keep the bot from starting
+            next_ = self.feed(self.backlog, block, journal=False, skip_invalid=True)
+            self.backlog = [u for u in self.backlog if u["update_id"] >= next_]
+
+    def ack(self, *updates):
+        if self.offset_store is None:
+            return
+        ids = []
+        for u in updates:
+            if isinstance(u, Iterable):
+                ids.extend(i if isinstance(i, int) else i.id for i in u)
+            else:
+                ids.append(u if isinstance(u, int) else u.id)
+        self.offset_store.ack(ids)
+
+    def bootstrap(self, start_daemon=True):
+        # a BotManager polls the bot itself and bootstraps it without the daemon thread
+        if self.restore():
+            self.bootstrapped = True
+            if start_daemon:
+                self.daemon.start()
+            return
+        r = self.getUpdates({"timeout": 0})
         if not r["ok"]:
             raise self.GenericQueryException(
                 "Telegram responded: \"" + r["description"] + "\" with error code " + str(r["error_code"]))
         if len(r["result"]) > 0:
             self.last_update = r["result"][0]["update_id"]
         self.bootstrapped = True
-        self.daemon.start()
+        if start_daemon:
+            self.daemon.start()
+
+    def webhook(self, url=None, host="0.0.0.0", port=8443, path="/", secret_token=None, ssl_context=None,
+                max_connections=None, drop_pending_updates=None):
+        # receives updates over http instead of polling, they land in the same queue the daemon fills
+        self.restore()
+        # the backlog is queued before the server takes new updates, nothing is left running if it fails
+        self.replay()
+        self.webhook_server = WebhookServer(self, host, port, path, secret_token, ssl_context).start()
+        if url is not None:
+            try:
+                self.setWebhook(url, secret_token, max_connections, drop_pending_updates)
+            except Exception:
+                self.webhook_server.stop()
+                self.webhook_server = None
+                raise
+        self.bootstrapped = True
+        return self.webhook_server
+
+    def setWebhook(self, url, secret_token=None, max_connections=None, drop_pending_updates=None, a=None):
+        if a is not None:
+            assert type(a) == dict
+        else:
+            a = {}
+        p = {"url": url}
+        if secret_token is not None:
+            p["secret_token"] = secret_token
+        if max_connections is not None:
+            p["max_connections"] = max_connections
+        if drop_pending_updates is not None:
+            p["drop_pending_updates"] = drop_pending_updates
+        if self.allowed_updates is not None:
+            p["allowed_updates"] = self.codec.dumps(list(self.allowed_updates))
+        p.update(a)
+        return self.call("setWebhook", p)
+
+    def deleteWebhook(self, drop_pending_updates=None, a=None):
+        if a is not None:
+            assert type(a) == dict
+        else:
+            a = {}
+        p = {}
+        if drop_pending_updates is not None:
+            p["drop_pending_updates"] = drop_pending_updates
+        p.update(a)
+        return self.call("deleteWebhook", p)
+
+    def getWebhookInfo(self):
+        return self.call("getWebhookInfo", {})
 
     def poll(self):
         if not self.bootstrapped:
             raise self.BootstrapException("perform bootstrap before other operations.")
         # print("Polled")
+        self.replay()
         p = self.getUpdates()
         if p["ok"]:
             if len(p["result"]) > 0:
-                self.updated = True
-                for u in p["result"]:
-                    try:
-                        self.updates.append(Update(u))
-                    except TypeError as e:
-                        if not self.safe_mode:
-                            raise e
-                if len(self.updates) == 0:
-                    self.last_update = p["result"][-1]["update_id"]
-                else:
-                    self.last_update = self.updates[-1].id + 1
+                self.last_update = self.feed(p["result"])
+        return len(p["result"]) if p["ok"] else 0
+
+    def feed(self, results, block=None, journal=True, skip_invalid=None):
+        # queues raw updates and returns the offset that confirms the accepted ones
+        if journal and self.offset_store is not None:
+            # durable before the server is told to forget them, and before a handler can ack them
+            self.offset_store.received(results)
+        if self.metrics is not None:
+            self.metrics.received.inc(self.name or "bot", amount=len(results))
+        observe = self.chat_cache is not None and self.chat_cache.from_updates
+        for u in results:
+            if observe:
+                self.chat_cache.observe(u)
+            try:
+                update = Update(u, lazy=self.lazy)
+                if not self.keep_raw:
+                    update.drop_raw()
+            except TypeError as e:
+                # acknowledged before raising too, it is journaled already and would come back on every restart
+                self.ack(u["update_id"])
+                if not (self.safe_mode or skip_invalid):
+                    raise e
+                continue
+            try:
+                self.updates.put(update, block)
+            except Full:
+                # leave the rest on the server, the next poll fetches it again
+                return u["update_id"]
+            self.fed += 1
+            self.updated.set()
+        return results[-1]["update_id"] + 1
 
     class Daemon(threading.Thread):
-        def __init__(self, poll, parent_thread, delay):
+        def __init__(self, poll, parent_thread, delay, long_poll=False):
             threading.Thread.__init__(self)
             self.poll = poll
             self.active = True
             self.verbose = False
             self.delay = delay
+            self.long_poll = long_poll
             self.parent_thread = parent_thread
 
         def run(self):
             try:
                 while self.active and self.parent_thread.is_alive():
-                    self.poll()
-                    sleep(self.delay)
+                    # a long poll already waited on the server, and results mean more may be pending
+                    if not self.poll() and not self.long_poll:
+                        sleep(self.delay)
                     # print("Polled")
             except KeyboardInterrupt:
                 pass
@@ -141,21 +407,23 @@ class TelegramBot:
         if self.daemon.is_alive():
             self.daemon.active = False
             self.daemon.join()
-        self.daemon = self.Daemon(self.poll, self.current_thread, self.daemon_delay)
+        self.daemon = self.Daemon(self.poll, self.current_thread, self.daemon_delay, self.poll_timeout > 0)
         self.daemon.start()
 
-    def news(self):
+    def news(self, timeout=None):
         if not self.bootstrapped:
             raise self.BootstrapException("perform bootstrap before other operations.")
-        if self.updated:
-            self.updated = False
+        if timeout:
+            self.updated.wait(timeout)
+        if self.updated.is_set():
+            self.updated.clear()
             return True
         else:
             return False
 
     def sendMessage(self, user, body, parse_mode="markdown", reply_markup=None, reply_to_message=None, a=None):
         assert type(user) == User or type(user) == Chat
-        assert type(reply_markup) is str or reply_markup is None
+        assert reply_markup is None or isinstance(reply_markup, (str, dict))
         assert reply_to_message is None or isinstance(reply_to_message, Message)
         if not self.bootstrapped:
             raise self.BootstrapException("perform bootstrap before other operations.")
@@ -167,7 +435,7 @@ class TelegramBot:
         p.update(a)
         if reply_markup:
             a = {
-                "reply_markup": reply_markup
+                "reply_markup": self.encode(reply_markup)
             }
             p.update(a)
         if reply_to_message:
@@ -175,12 +443,12 @@ class TelegramBot:
                 "reply_to_message_id": reply_to_message.id
             }
             p.update(a)
-        return Message.cast(self.query("sendMessage", p))[0]
+        return self.call("sendMessage", p, self.cast_message)
         # return True if telegram does, otherwise False
 
     def editMessageText(self, message, body, parse_mode="markdown", reply_markup=None, a=None):
         assert isinstance(message, Message) or isinstance(message, CallbackQuery)
-        assert type(reply_markup) is str or reply_markup is None
+        assert reply_markup is None or isinstance(reply_markup, (str, dict))
         if not self.bootstrapped:
             raise self.BootstrapException("perform bootstrap before other operations.")
         if a is not None:
@@ -196,18 +464,15 @@ class TelegramBot:
         p.update(a)
         if reply_markup:
             a = {
-                "reply_markup": reply_markup
+                "reply_markup": self.encode(reply_markup)
             }
             p.update(a)
-        if (ret := self.query("editMessageText", p)) is None:
-            return message
-        else:
-            return Message.cast(ret)[0]
+        return self.call("editMessageText", p, lambda r: message if r is None else self.cast_message(r))
         # return True if telegram does, otherwise False
 
     def editMessageCaption(self, message, caption, parse_mode="markdown", reply_markup=None, a=None):
         assert isinstance(message, Message) or isinstance(message, CallbackQuery)
-        assert type(reply_markup) is str or reply_markup is None
+        assert reply_markup is None or isinstance(reply_markup, (str, dict))
         if not self.bootstrapped:
             raise self.BootstrapException("perform bootstrap before other operations.")
         if a is not None:
@@ -223,30 +488,27 @@ class TelegramBot:
         p.update(a)
         if reply_markup:
             a = {
-                "reply_markup": reply_markup
+                "reply_markup": self.encode(reply_markup)
             }
             p.update(a)
-        if (ret := self.query("editMessageCaption", p)) is None:
-            return message
-        else:
-            return Message.cast(ret)[0]
+        return self.call("editMessageCaption", p, lambda r: message if r is None else self.cast_message(r))
         # return True if telegram does, otherwise False
 
     def editMessageReplyMarkup(self, reply_markup, message=None, a=None):
         if not message:
             raise TypeError("message parameter must be specified.")
-        if not isinstance(reply_markup, str):
-            raise TypeError("reply_markup must be of type str")
+        if not isinstance(reply_markup, (str, dict)):
+            raise TypeError("reply_markup must be of type str or dict")
         if not isinstance(message, Message):
             raise TypeError("message must be of type Message")
         data = {
             "chat_id": message.chat.id,
             "message_id": message.id,
-            "reply_markup": reply_markup
+            "reply_markup": self.encode(reply_markup)
         }
         if a is not None:
             data.update(a)
-        return self.query("editMessageReplyMarkup", data)
+        return self.call("editMessageReplyMarkup", data)
 
     def deleteMessage(self, message, a=None):
         assert isinstance(message, Message)
@@ -256,20 +518,22 @@ class TelegramBot:
         }
         if a:
             p.update(a)
-        return self.query("deleteMessage", p)
+        return self.call("deleteMessage", p)
 
-    def sendPhoto(self, user, photo, caption=None, parse_mode="markdown", reply_to_message=None, a=None):
+    def sendPhoto(self, user, photo, caption=None, parse_mode="markdown", reply_to_message=None, a=None,
+                  progress=None):
         assert isinstance(user, Chat)
-        assert isinstance(photo, (PhotoFile, str))
         if a is not None:
             assert type(a) == dict
         else:
             a = {}
+        file_id, files = self.media("photo", photo)
         p = {
             "chat_id": user.id,
-            "photo": photo if isinstance(photo, str) else photo.id,
             "parse_mode": parse_mode
         }
+        if file_id is not None:
+            p["photo"] = file_id
         if caption is not None:
             p["caption"] = caption
         p.update(a)
@@ -278,7 +542,8 @@ class TelegramBot:
                 "reply_to_message_id": reply_to_message.id
             }
             p.update(a)
-        return Message.cast(self.query("sendPhoto", p))[0]
+        return self.call("sendPhoto", p, self.cast_message, files=files, progress=progress,
+                         timeout=self.upload_timeout if files else 5)
 
     def sendSticker(self, user, sticker, reply_to_message=None, a=None):
         if not isinstance(user, Chat):
@@ -295,46 +560,44 @@ class TelegramBot:
                 "reply_to_message_id": reply_to_message.id
             }
             p.update(a)
-        return Message.cast(self.query("sendSticker", p))[0]
+        return self.call("sendSticker", p, self.cast_message)
 
-    def sendDocument(self, user, document, name=None, mime=None, reply_to_message=None, a=None):
+    def sendDocument(self, user, document, name=None, mime=None, reply_to_message=None, a=None, progress=None):
         if type(user) is not User and type(user) is not Chat:
             raise TypeError(f"User argument must be User or Chat, {type(user)} given.")
-        if issubclass(type(document), File) is not File and type(document) is not bytes:
-            raise TypeError(f"Document argument must be a File object/children, {type(document)} given.")
         if a is not None:
             assert type(a) == dict
         else:
             a = {}
-        if type(document) is Document:
-            files = None
-            p = {"chat_id": user.id, "document": document.id}
-        else:
-            files = {
-                "document": (
-                    ["document", name][type(name) is str],
-                    document,
-                    ["application/octet-stream", mime][type(mime) is str]
-                )
-            }
-            p = {"chat_id": user.id}
+        file_id, files = self.media("document", document, name, mime)
+        p = {"chat_id": user.id}
+        if file_id is not None:
+            p["document"] = file_id
         p.update(a)
         if reply_to_message:
             a = {
                 "reply_to_message_id": reply_to_message.id
             }
             p.update(a)
-        while True:
+        return self.call("sendDocument", p, files=files, progress=progress,
+                         timeout=self.upload_timeout if files else 5)
+
+    @staticmethod
+    def media(field, value, name=None, mime=None):
+        # File objects, file ids and urls are sent by reference, paths, bytes, open files and iterators are uploaded
+        if isinstance(value, File):
+            return value.id, None
+        if isinstance(value, str):
+            return value, None
+        if not isinstance(value, InputFile):
+            # raw bytes and iterators have no name of their own
+            named = hasattr(value, "read") or isinstance(value, PathLike)
             try:
-                r = post("https://api.telegram.org/bot{0}/sendDocument".format(self.token),
-                         files=files, data=p, timeout=5).json()
-                break
-            except (timeout, Timeout, ConnectTimeout, ConnectionError):
-                print("Telegram timed out, retrying...")
-        if not r["ok"]:
-            raise self.GenericQueryException(
-                "Telegram responded: \"" + r["description"] + "\" with error code " + str(r["error_code"]))
-        return r
+                value = InputFile(value, name if name is not None or named else field, mime)
+            except TypeError:
+                raise TypeError(f"{field} must be a File, a file id, a path, bytes, a file object or an iterator, "
+                                f"{type(value)} given.") from None
+        return None, {field: value}
 
     def forwardMessage(self, chat_in, chat_out, message, reply_to_message=None, a=None):
         assert type(chat_in) == Chat
@@ -351,7 +614,7 @@ class TelegramBot:
             }
             p.update(a)
         p.update(a)
-        return Message.cast(self.query("forwardMessage", p))[0]
+        return self.call("forwardMessage", p, self.cast_message)
 
     def answerCallbackQuery(self, callback_query, text, show_alert=None, a=None):
         assert isinstance(callback_query, CallbackQuery)
@@ -367,16 +630,54 @@ class TelegramBot:
             show_alert = False
         p = {"callback_query_id": callback_query.id, "text": text, "show_alert": show_alert}
         p.update(a)
-        return self.query("answerCallbackQuery", p)
+        return self.call("answerCallbackQuery", p)
+
+    def getFile(self, file):
+        # returns the file_path to download from, telegram keeps it valid for at least an hour
+        file_id = file_ids(file)[0]
+        return self.call("getFile", {"file_id": file_id}, partial(self.cast_file_path, file_id))
+
+    def cast_file_path(self, file_id, r):
+        path = r["result"]["file_path"]
+        self.file_paths.put(file_id, path)
+        return path
+
+    def download(self, file, destination=None, chunk_size=CHUNK_SIZE):
+        # file is a File, a message with a .file or a file id; destination a path or a binary file object.
+        # Returns the destination, or the path inside the file cache when none is given
+        d = Download(self, file, destination)
+        cached = d.cached()
+        if cached is not None:
+            return deliver(cached, destination)
+        while True:
+            path = d.link() or self.getFile(d.file_id)
+            try:
+                with d.begin() as f:
+                    status = self.transport.fetch(self.transport.file_url(self.token, path), f, self.upload_timeout,
+                                                  chunk_size)
+            except (socket_timeout, Timeout, ConnectTimeout, ConnectionError, ChunkedEncodingError) as e:
+                delay = d.failed(e)
+                if delay is None:
+                    raise
+                sleep(delay)
+                continue
+            except BaseException:
+                d.discard()
+                raise
+            if d.fetched(status, path):
+                return d.commit()
 
     def chat_from_user(self, user):
         assert type(user) == User
-        p = {"chat_id": user.id}
-        q = self.query("getChat", p)
-        if not q["ok"]:
-            raise TelegramBot.ResponseNotOkException(q)
-        else:
-            return Chat(q["result"])
+        return self.getChat(user.id)
+
+    def getChat(self, chat_id):
+        if self.chat_cache is None:
+            return self.fetch_chat(chat_id)
+        return self.chat_cache.lookup(chat_id, self.fetch_chat)
+
+    def fetch_chat(self, chat_id):
+        return self.call("getChat", {"chat_id": chat_id}, self.cast_chat)
 
     def daemon_remote(self, active, delay):
         self.daemon.active = active
@@ -395,23 +696,19 @@ class TelegramBot:
     def get_updates(self, from_=None) -> Iterable[Update]:
         if not self.bootstrapped:
             raise self.BootstrapException("perform bootstrap before other operations.")
-        if from_ is None:
-            for i in range(len(self.updates)):
-                tmp = self.updates.pop(0)
-                yield tmp
-        else:
-            if type(from_) is User or type(from_) is Chat:
-                for i in [k for k in self.updates if k.message.from_.id == from_.id]:
-                    tmp = self.updates.pop(self.updates.index(i))
-                    yield tmp
-            elif type(from_) == list and \
-                    all((type(i) is Chat or type(i) is User for i in from_)):
-                for i in [k for k in self.updates if k.message.from_.id in from_.id]:
-                    tmp = self.updates.pop(self.updates.index(i))
-                    yield tmp
-            else:
-                raise self.TypeError(
-                    f"Parameter \"from_\" must be User or Chat {type(from_)} provided.")
+        if not (from_ is None or isinstance(from_, Chat) or
+                isinstance(from_, list) and all(isinstance(i, Chat) for i in from_)):
+            raise self.TypeError(
+                f"Parameter \"from_\" must be User or Chat {type(from_)} provided.")
+        yield from self.updates.drain(from_)
+
+    def get_update(self, timeout=None, from_=None):
+        if not self.bootstrapped:
+            raise self.BootstrapException("perform bootstrap before other operations.")
+        try:
+            return self.updates.get(timeout=timeout, from_=from_)
+        except Empty:
+            return None
 
     def read(self, from_=None, type_=None):
         pass
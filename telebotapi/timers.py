@@ -0,0 +1,78 @@
+import threading
+from time import monotonic
+
+
+class Timer:
+    __slots__ = ("callback", "rounds", "cancelled")
+
+    def __init__(self, callback, rounds):
+        self.callback = callback
+        self.rounds = rounds
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerWheel:
+    default_ = None
+    default_lock = threading.Lock()
+
+    def __init__(self, tick=0.1, slots=512):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.position = 0
+        self.pending = 0
+        self.cond = threading.Condition()
+        self.thread = None
+        self.next_tick = None
+
+    @classmethod
+    def default(cls):
+        with cls.default_lock:
+            if cls.default_ is None:
+                cls.default_ = cls()
+            return cls.default_
+
+    def schedule(self, delay, callback):
+        ticks = max(int(-(-delay // self.tick)), 1)
+        with self.cond:
+            timer = Timer(callback, (ticks - 1) // len(self.slots))
+            self.slots[(self.position + ticks) % len(self.slots)].append(timer)
+            self.pending += 1
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="telebotapi-timers", daemon=True)
+                self.thread.start()
+            self.cond.notify()
+        return timer
+
+    def run(self):
+        while True:
+            with self.cond:
+                # an empty wheel sleeps until something is scheduled instead of ticking
+                while not self.pending:
+                    self.next_tick = None
+                    self.cond.wait()
+                if self.next_tick is None:
+                    self.next_tick = monotonic() + self.tick
+                remaining = self.next_tick - monotonic()
+                if remaining > 0:
+                    self.cond.wait(remaining)
+                    continue
+                self.next_tick += self.tick
+                self.position = (self.position + 1) % len(self.slots)
+                slot = self.slots[self.position]
+                due = [t for t in slot if t.rounds == 0 or t.cancelled]
+                self.slots[self.position] = [t for t in slot if t.rounds > 0 and not t.cancelled]
+                for t in self.slots[self.position]:
+                    t.rounds -= 1
+                self.pending -= len(due)
+            for t in due:
+                if not t.cancelled:
+                    try:
+                        t.callback()
+                    except Exception as e:
+                        print(f"Exception caught in timer callback: {e!r}")
+
+    def __len__(self):
+        return self.pending
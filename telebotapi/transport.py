@@ -0,0 +1,88 @@
+from requests import Session
+from requests.adapters import HTTPAdapter
+from .uploads import CHUNK_SIZE
+from .codec import default_codec
+
+API_URL = "https://api.telegram.org"
+
+
+def error_response(status, reason):
+    # a proxy or an overloaded api answers with an html page, it becomes an api error with the http status
+    return {"ok": False, "error_code": status, "description": f"HTTP {status} {reason}"}
+
+
+class Transport:
+    def __init__(self, base_url=API_URL, codec=None):
+        self.base_url = base_url.rstrip("/")
+        self.codec = default_codec() if codec is None else codec
+
+    def url(self, token, method):
+        return f"{self.base_url}/bot{token}/{method}"
+
+    def file_url(self, token, path):
+        return f"{self.base_url}/file/bot{token}/{path}"
+
+    def post(self, url, data=None, files=None, headers=None, timeout=None):
+        raise NotImplementedError
+
+    def fetch(self, url, fileobj, timeout=None, chunk_size=CHUNK_SIZE):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+class SessionTransport(Transport):
+    def __init__(self, base_url=API_URL, pool_connections=4, pool_maxsize=10, pool_block=False, session=None,
+                 codec=None):
+        Transport.__init__(self, base_url, codec)
+        self.session = Session() if session is None else session
+        self.adapter = HTTPAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize,
+                                   pool_block=pool_block)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+
+    def post(self, url, data=None, files=None, headers=None, timeout=None):
+        # the body goes straight to the codec, without requests guessing its encoding first
+        r = self.session.post(url, data=data, files=files, headers=headers, timeout=timeout)
+        try:
+            return self.codec.loads(r.content)
+        except ValueError:
+            return error_response(r.status_code, r.reason)
+
+    def fetch(self, url, fileobj, timeout=None, chunk_size=CHUNK_SIZE):
+        # streams the response into fileobj and returns the status, nothing is written unless it is 200
+        with self.session.get(url, stream=True, timeout=timeout) as r:
+            if r.status_code == 200:
+                for chunk in r.iter_content(chunk_size):
+                    fileobj.write(chunk)
+            return r.status_code
+
+    def stats(self):
+        requests_ = 0
+        connections = 0
+        pools = self.adapter.poolmanager.pools
+        for k in list(pools.keys()):
+            pool = pools.get(k)
+            if pool is None:
+                continue
+            requests_ += pool.num_requests
+            connections += pool.num_connections
+        return {
+            "pools": len(pools),
+            "requests": requests_,
+            "connections": connections,
+            "reused": max(requests_ - connections, 0)
+        }
+
+    def close(self):
+        self.session.close()
+
+    def __str__(self):
+        return f"SessionTransport({self.base_url})"
+
+    def __repr__(self):
+        return str(self)
@@ -1,8 +1,14 @@
 from .messages import Message
+from .model import Model, lazy
 
 
-class Update:
-    def __init__(self, u):
+class Update(Model):
+    __slots__ = ("id", "content_class", "envelope", "type")
+    known = frozenset(("update_id", "message", "edited_message", "channel_post", "edited_channel_post",
+                       "callback_query"))
+
+    def __init__(self, u, lazy=False):
+        Model.__init__(self, u)
         self.id = u["update_id"]
         """
         for i in ("message", "edited_message", "channel_post", "edited_channel_post", "callback_query"):
@@ -17,8 +23,14 @@ class Update:
                 self.type = i
                 break
         """
-        self.content, self.type = Message.cast(u)
-        self.raw = u
+        # resolving the content class only looks at keys, so unrecognized updates still fail here
+        self.content_class, self.envelope, self.type = Message.resolve(u)
+        if not lazy:
+            self.content = self.content_class(u[self.envelope])
+
+    @lazy
+    def content(self, u):
+        return self.content_class(u[self.envelope], lazy=True)
 
     def __str__(self):
         return f"Update(content={self.content}, type=\"{self.type}\")"
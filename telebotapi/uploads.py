@@ -0,0 +1,163 @@
+import io
+import os
+from mimetypes import guess_type
+from uuid import uuid4
+
+CHUNK_SIZE = 1 << 16
+
+
+class InputFile:
+    # a file to upload: a path (os.PathLike), bytes, an open binary file or an iterable of bytes chunks
+    def __init__(self, source, name=None, mime=None, size=None):
+        self.source = source
+        self.start = None
+        self.opened = False
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self.kind = "bytes"
+            size = len(source)
+        elif isinstance(source, os.PathLike):
+            self.kind = "path"
+            size = os.path.getsize(source)
+            name = name or os.path.basename(source)
+        elif hasattr(source, "read"):
+            self.kind = "file"
+            name = name or os.path.basename(str(getattr(source, "name", ""))) or None
+            if size is None and self.seekable():
+                self.start = source.tell()
+                size = source.seek(0, io.SEEK_END) - self.start
+                source.seek(self.start)
+        elif hasattr(source, "__iter__"):
+            self.kind = "iterator"
+        else:
+            raise TypeError(f"Cannot upload {type(source)}")
+        self.name = name or "file"
+        self.mime = mime or guess_type(self.name)[0] or "application/octet-stream"
+        self.size = size
+
+    def seekable(self):
+        try:
+            return self.source.seekable()
+        except (AttributeError, ValueError):
+            return False
+
+    @property
+    def replayable(self):
+        # iterators and pipes can only be read once, so a failed upload of them cannot be retried
+        return self.kind in ("bytes", "path") or self.kind == "file" and self.start is not None
+
+    def chunks(self, chunk_size=CHUNK_SIZE):
+        if self.opened and not self.replayable:
+            raise MultipartBody.NotReplayable(f"{self.name} can only be uploaded once")
+        self.opened = True
+        if self.kind == "bytes":
+            view = memoryview(self.source)
+            for i in range(0, len(view), chunk_size):
+                yield view[i:i + chunk_size]
+        elif self.kind == "path":
+            with open(self.source, "rb") as f:
+                yield from iter(lambda: f.read(chunk_size), b"")
+        elif self.kind == "file":
+            if self.start is not None:
+                self.source.seek(self.start)
+            yield from iter(lambda: self.source.read(chunk_size), b"")
+        else:
+            for chunk in self.source:
+                if chunk:
+                    yield chunk
+
+    def __str__(self):
+        return f"InputFile({self.name}, {self.mime}, size={self.size})"
+
+    def __repr__(self):
+        return str(self)
+
+
+def quote(value):
+    return str(value).replace("\\", "\\\\").replace('"', "%22").replace("\r", "").replace("\n", "")
+
+
+class MultipartBody(io.RawIOBase):
+    # multipart/form-data produced while it is sent, memory use stays at about one chunk whatever the file size
+    class NotReplayable(Exception):
+        pass
+
+    def __init__(self, fields=None, files=None, progress=None, chunk_size=CHUNK_SIZE):
+        io.RawIOBase.__init__(self)
+        self.boundary = uuid4().hex
+        self.content_type = f"multipart/form-data; boundary={self.boundary}"
+        self.chunk_size = chunk_size
+        # called with (bytes sent, total bytes or None) after every chunk
+        self.progress = progress
+        self.parts = []
+        for k, v in (fields or {}).items():
+            self.parts.append(f"--{self.boundary}\r\nContent-Disposition: form-data; name=\"{quote(k)}\"\r\n\r\n"
+                              f"{v}\r\n".encode())
+        for k, f in (files or {}).items():
+            if not isinstance(f, InputFile):
+                f = InputFile(f)
+            self.parts.append(f"--{self.boundary}\r\nContent-Disposition: form-data; name=\"{quote(k)}\"; "
+                              f"filename=\"{quote(f.name)}\"\r\nContent-Type: {f.mime}\r\n\r\n".encode())
+            self.parts.append(f)
+            self.parts.append(b"\r\n")
+        self.parts.append(f"--{self.boundary}--\r\n".encode())
+        sizes = [len(p) if isinstance(p, bytes) else p.size for p in self.parts]
+        self.size = None if None in sizes else sum(sizes)
+        if self.size is not None:
+            # read by requests to send a Content-Length, without it the body goes out chunked
+            self.len = self.size
+        self.sent = 0
+        self.iterator = None
+        self.buffer = b""
+
+    @property
+    def replayable(self):
+        return all(isinstance(p, bytes) or p.replayable for p in self.parts)
+
+    def rewind(self):
+        # called before every attempt, a retry starts the body over
+        if self.iterator is not None and not self.replayable:
+            raise self.NotReplayable("the upload was interrupted and its source cannot be read again")
+        self.iterator = None
+        self.buffer = b""
+        self.sent = 0
+
+    def generate(self):
+        for p in self.parts:
+            for chunk in ([p] if isinstance(p, bytes) else p.chunks(self.chunk_size)):
+                self.sent += len(chunk)
+                if self.progress is not None:
+                    self.progress(self.sent, self.size)
+                yield bytes(chunk)
+
+    def __iter__(self):
+        if self.iterator is None:
+            self.iterator = self.generate()
+        return self.iterator
+
+    def readable(self):
+        return True
+
+    def read(self, n=-1):
+        if self.iterator is None:
+            self.iterator = self.generate()
+        if n < 0:
+            data = bytes(self.buffer) + b"".join(self.iterator)
+            self.buffer = b""
+            return data
+        while len(self.buffer) < n:
+            chunk = next(self.iterator, None)
+            if chunk is None:
+                break
+            self.buffer = memoryview(bytes(self.buffer) + chunk if self.buffer else chunk)
+        # slicing the memoryview hands out pieces of the current chunk without copying the rest around
+        data, self.buffer = bytes(self.buffer[:n]), self.buffer[n:]
+        return data
+
+    def tell(self):
+        # requests subtracts the position from the length it finds, so it has to start at 0
+        return self.sent - len(self.buffer)
+
+    def readinto(self, b):
+        data = self.read(len(b))
+        b[:len(data)] = data
+        return len(data)
@@ -0,0 +1,125 @@
+import threading
+from collections import OrderedDict
+from hmac import compare_digest
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "telebotapi"
+
+    def reply(self, code, body=b""):
+        self.send_response(code)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        server = self.server
+        try:
+            length = int(self.headers.get("Content-Length", 0))
+        except ValueError:
+            length = -1
+        if not 0 <= length <= server.max_body:
+            # the body is left unread, so the connection cannot be reused
+            self.close_connection = True
+            return self.reply(413 if length > 0 else 400)
+        body = self.rfile.read(length)
+        if self.path.split("?", 1)[0] != server.path:
+            return self.reply(404)
+        if server.secret_token is not None and \
+                not compare_digest(self.headers.get(SECRET_HEADER, "").encode(errors="replace"),
+                                   server.secret_token.encode()):
+            server.rejected += 1
+            return self.reply(403)
+        try:
+            u = server.bot.codec.loads(body)
+            update_id = u["update_id"]
+        except (ValueError, KeyError, TypeError):
+            server.invalid += 1
+            return self.reply(400)
+        if server.seen(update_id):
+            # telegram resends updates it thinks timed out, they are already queued
+            return self.reply(200)
+        try:
+            # only queues the update, handlers consume it from get_updates, wait_for or Forks later
+            accepted = server.bot.feed([u], block=False) > update_id
+        except TypeError:
+            # an unknown update kind, feed() acknowledged it; a non 2xx answer would only make telegram resend it
+            server.invalid += 1
+            return self.reply(200)
+        if not accepted:
+            server.forget(update_id)
+            # the queue is full, a non 2xx answer makes telegram retry later instead of dropping the update
+            return self.reply(503)
+        server.received += 1
+        self.reply(200)
+
+    def do_GET(self):
+        self.reply(405)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class WebhookServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, bot, host="0.0.0.0", port=8443, path="/", secret_token=None, ssl_context=None,
+                 max_body=1 << 20, remember=4096):
+        ThreadingHTTPServer.__init__(self, (host, port), WebhookHandler)
+        if ssl_context is not None:
+            self.socket = ssl_context.wrap_socket(self.socket, server_side=True)
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.max_body = max_body
+        self.remember = remember
+        self.recent = OrderedDict()
+        self.recent_lock = threading.Lock()
+        self.thread = None
+        self.received = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.invalid = 0
+
+    def seen(self, update_id):
+        with self.recent_lock:
+            if update_id in self.recent:
+                self.duplicates += 1
+                return True
+            self.recent[update_id] = None
+            if len(self.recent) > self.remember:
+                self.recent.popitem(last=False)
+            return False
+
+    def forget(self, update_id):
+        with self.recent_lock:
+            self.recent.pop(update_id, None)
+
+    @property
+    def address(self):
+        return self.server_address[:2]
+
+    def start(self):
+        self.thread = threading.Thread(target=self.serve_forever, name="telebotapi-webhook", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+        if self.thread is not None:
+            self.thread.join()
+
+    def stats(self):
+        return {"received": self.received, "duplicates": self.duplicates, "rejected": self.rejected,
+                "invalid": self.invalid}
+
+    def __str__(self):
+        return f"WebhookServer({self.address[0]}:{self.address[1]}{self.path})"
+
+    def __repr__(self):
+        return str(self)
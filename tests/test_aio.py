@@ -0,0 +1,78 @@
+import asyncio
+import pytest
+from telebotapi import AsyncTelegramBot, Chat, FakeBotAPI, RetryPolicy, SessionTransport
+from telebotapi.aio import AiohttpTransport, ExecutorTransport, aiohttp
+
+TOKEN = "0" * 46
+
+
+def message(update_id, chat_id):
+    return {"update_id": update_id, "message": {"message_id": update_id, "date": 0, "text": "hi",
+                                                "from": {"id": 5, "is_bot": False, "first_name": "a"},
+                                                "chat": {"id": chat_id, "type": "private"}}}
+
+
+def test_iter_updates_does_not_spin_on_other_chats():
+    with FakeBotAPI() as api:
+        async def run():
+            bot = AsyncTelegramBot(TOKEN, transport=ExecutorTransport(SessionTransport(api.base_url)),
+                                   rate_limiter=False, poll_timeout=1)
+            await bot.bootstrap()
+            api.push(message(1, 3))
+
+            async def first():
+                async for u in bot.iter_updates(Chat.by_id(7)):
+                    return u
+
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(.05)
+                    ticks += 1
+
+            t = asyncio.ensure_future(ticker())
+            try:
+                # the loop keeps running while the other chat's update sits in the queue
+                await asyncio.wait_for(first(), 1)
+            except asyncio.TimeoutError:
+                pass
+            assert ticks > 5
+            api.push(message(2, 7))
+            u = await asyncio.wait_for(first(), 5)
+            assert u.content.chat.id == 7
+            assert [u.id for u in bot.get_updates()] == [1]
+            t.cancel()
+            await bot.close()
+
+        asyncio.run(run())
+
+
+@pytest.mark.parametrize("transport", ["aiohttp", "executor"])
+def test_sends_uploads_and_polling(transport):
+    if transport == "aiohttp" and aiohttp is None:
+        pytest.skip("aiohttp is not installed")
+
+    async def run(api):
+        t = AiohttpTransport(api.base_url) if transport == "aiohttp" else \
+            ExecutorTransport(SessionTransport(api.base_url))
+        bot = AsyncTelegramBot(TOKEN, transport=t, rate_limiter=False, retry_policy=RetryPolicy(base=0.))
+        await bot.bootstrap()
+        try:
+            sent = await asyncio.gather(*(bot.sendMessage(Chat.by_id(i), f"hi {i}") for i in range(20)))
+            assert [m.text for m in sent] == [f"hi {i}" for i in range(20)]
+            r = await bot.sendDocument(Chat.by_id(5), b"x" * 5000, name="a.bin")
+            assert r["result"]["document"]["file_size"] == 5000
+            # idempotent calls are retried after a server error
+            api.inject("error", method="getChat")
+            assert (await bot.getChat(5)).id == 5
+            api.push(message(1, 5), message(2, 6))
+            assert await bot.poll() == 2
+            assert [u.id for u in bot.get_updates()] == [1, 2]
+        finally:
+            await bot.close()
+
+    with FakeBotAPI() as api:
+        asyncio.run(run(api))
+        assert api.calls["sendMessage"] == 20 and api.calls["getChat"] == 1
@@ -0,0 +1,67 @@
+from itertools import count
+from telebotapi import Broadcast, Chat, Checkpoint, FakeBotAPI, SessionTransport, TelegramBot
+
+TOKEN = "0" * 46
+
+
+def test_username_recipients_pass_through(tmp_path):
+    checkpoint = str(tmp_path / "sent.txt")
+    with FakeBotAPI() as api:
+        bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False)
+        bot.bootstrapped = True
+        deliveries = list(bot.broadcast(["@channel", 5, "7"], "hello", checkpoint=checkpoint))
+        assert all(d.ok for d in deliveries), deliveries
+        assert sorted(str(p["chat_id"]) for _, m, p in api.sent if m == "sendMessage") == ["5", "7", "@channel"]
+        assert "@channel" in Checkpoint(checkpoint)
+        # delivered recipients are skipped on a second run
+        assert list(bot.broadcast(["@channel", 5, 7], "hello", checkpoint=checkpoint)) == []
+
+
+def test_by_id():
+    assert Chat.by_id("@channel").id == "@channel"
+    assert Chat.by_id("-100").id == -100
+
+
+def test_failures_are_reported_and_retried_on_the_next_run(tmp_path):
+    checkpoint = str(tmp_path / "sent.txt")
+    with FakeBotAPI() as api:
+        bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False)
+        bot.bootstrapped = True
+        api.inject("error", method="sendMessage", chat_id=6)
+        b = Broadcast(bot, "hello", workers=4, checkpoint=checkpoint)
+        failed = [d.chat.id for d in b.run(range(1, 11)) if not d.ok]
+        assert failed == [6]
+        assert b.stats() == {"sent": 9, "failed": 1, "skipped": 0}
+        b = Broadcast(bot, "hello", workers=4, checkpoint=checkpoint)
+        assert [d.chat.id for d in b.run(range(1, 11))] == [6]
+        assert b.stats() == {"sent": 1, "failed": 0, "skipped": 9}
+
+
+def test_recipients_are_consumed_a_window_at_a_time():
+    with FakeBotAPI() as api:
+        bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False)
+        bot.bootstrapped = True
+        taken = []
+
+        def recipients():
+            for i in count(1):
+                taken.append(i)
+                yield i
+
+        deliveries = bot.broadcast(recipients(), "hello", workers=2)
+        first = [next(deliveries) for _ in range(3)]
+        deliveries.close()
+        assert all(d.ok for d in first)
+        # the window holds twice as many sends as there are workers
+        assert len(taken) <= 3 + 4
+
+
+def test_photo_and_callable_templates():
+    with FakeBotAPI() as api:
+        bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False)
+        bot.bootstrapped = True
+        assert all(d.ok for d in bot.broadcast([1, 2], "photo-id", photo=True))
+        assert api.calls["sendPhoto"] == 2
+        seen = []
+        assert all(d.ok for d in bot.broadcast([3], lambda bot_, chat: seen.append(chat.id)))
+        assert seen == [3] and api.calls["sendMessage"] == 0
@@ -0,0 +1,60 @@
+import pytest
+from telebotapi import CallbackQuery, DocumentMessage, Message, PhotoMessage, Sticker, Text, Video, Voice
+from telebotapi.messages import Audio, Location, DISPATCH, FALLBACK
+
+CHAT = {"id": 1, "type": "private"}
+FILE = {"file_id": "f", "file_unique_id": "u", "duration": 1, "height": 1, "width": 1}
+
+
+def message(**kwargs):
+    return dict({"message_id": 1, "date": 0, "chat": CHAT}, **kwargs)
+
+
+@pytest.mark.parametrize("content, cls, type_", [
+    (message(text="hi"), Text, "text"),
+    (message(photo=[FILE]), PhotoMessage, "photo"),
+    (message(audio=FILE), Audio, "audio"),
+    (message(sticker=FILE), Sticker, "sticker"),
+    (message(video=FILE), Video, "video"),
+    (message(voice=FILE), Voice, "voice"),
+    (message(document=FILE), DocumentMessage, "document"),
+    (message(location={"latitude": 1., "longitude": 2.}), Location, "location"),
+    # text is registered first, so it wins over media keys
+    (message(text="hi", photo=[FILE]), Text, "text"),
+    (message(contact={}), Message, "message"),
+])
+@pytest.mark.parametrize("envelope", ["message", "edited_message", "channel_post", "edited_channel_post"])
+def test_cast(envelope, content, cls, type_):
+    m, t = Message.cast({"update_id": 1, envelope: content})
+    assert type(m) is cls
+    assert t == (envelope if type_ == "message" else type_)
+
+
+def test_callback_query():
+    q = {"id": "1", "chat_instance": "1", "data": "d", "from": {"id": 1, "is_bot": False, "first_name": "a"}}
+    m, t = Message.cast({"update_id": 1, "callback_query": dict(q, message=message(text="hi"))})
+    assert type(m) is CallbackQuery and t == "message"
+    assert type(m.original_message) is Text
+    # inline messages carry no message, they still are callback queries
+    m, t = Message.cast({"update_id": 1, "callback_query": q})
+    assert type(m) is CallbackQuery and t == "callback_query"
+
+
+def test_unknown_envelope():
+    with pytest.raises(TypeError):
+        Message.cast({"update_id": 1, "poll": {}})
+
+
+def test_handles_registers_new_kinds():
+    saved = dict(DISPATCH)
+    try:
+        @Message.handles("dice", ("message", ))
+        class Dice(Message):
+            pass
+
+        assert type(Message.cast({"update_id": 1, "message": message(dice={})})[0]) is Dice
+        assert type(Message.cast({"update_id": 1, "channel_post": message(dice={})})[0]) is Message
+    finally:
+        DISPATCH.clear()
+        DISPATCH.update(saved)
+    assert FALLBACK == {"callback_query": CallbackQuery}
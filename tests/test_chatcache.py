@@ -0,0 +1,98 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep
+import pytest
+from telebotapi import Chat, ChatCache, FakeBotAPI, SessionTransport, TelegramBot, User
+
+TOKEN = "0" * 46
+
+
+def update(chat_id, text="hi"):
+    return {"update_id": 1, "message": {"message_id": 1, "date": 0, "text": text,
+                                        "from": {"id": 7, "is_bot": False, "first_name": "a"},
+                                        "chat": {"id": chat_id, "type": "supergroup", "title": "g"}}}
+
+
+def test_observed_chats_never_replace_get_chat_results():
+    cache = ChatCache(from_updates=True)
+    full = Chat({"id": -100, "type": "supergroup", "title": "g", "description": "about", "permissions": {}})
+    assert cache.lookup(-100, lambda chat_id: full) is full
+    cache.observe(update(-100))
+    assert cache.lookup(-100, lambda chat_id: None) is full
+    assert cache.get(-100).raw["description"] == "about"
+
+
+def test_observed_chats_fill_gaps():
+    cache = ChatCache(from_updates=True)
+    cache.observe(update(-100))
+    assert cache.get(-100).type == "supergroup"
+    assert cache.get(7).type == "private"
+    assert cache.stats()["observed"] == 2
+    # seen again, already there
+    cache.observe(update(-100))
+    assert cache.stats()["observed"] == 2
+
+
+def test_ttl_and_least_recently_used():
+    cache = ChatCache(ttl=.1, maxsize=2)
+    for i in (1, 2):
+        cache.put(Chat({"id": i}))
+    assert 1 in cache
+    cache.put(Chat({"id": 3}))
+    # 2 was used least recently
+    assert 2 not in cache and 1 in cache and 3 in cache
+    sleep(.15)
+    assert cache.get(1) is None and len(cache) == 1
+    cache.invalidate()
+    assert len(cache) == 0
+
+
+def test_concurrent_lookups_share_one_fetch():
+    cache = ChatCache()
+    release = threading.Event()
+    calls = []
+
+    def fetch(chat_id):
+        calls.append(chat_id)
+        release.wait(5)
+        return Chat({"id": chat_id})
+
+    with ThreadPoolExecutor(8) as pool:
+        results = [pool.submit(cache.lookup, 5, fetch) for _ in range(8)]
+        sleep(.1)
+        release.set()
+        chats = [f.result(5) for f in results]
+    assert calls == [5] and all(c is chats[0] for c in chats)
+    assert cache.stats()["misses"] == 1 and cache.stats()["coalesced"] == 7
+    cache.lookup(5, fetch)
+    assert cache.stats()["hits"] == 1
+
+
+def test_failed_fetches_are_not_cached():
+    cache = ChatCache()
+
+    def fail(chat_id):
+        raise ValueError(chat_id)
+
+    with pytest.raises(ValueError):
+        cache.lookup(5, fail)
+    assert 5 not in cache and cache.stats()["pending"] == 0
+    assert cache.lookup(5, lambda chat_id: Chat({"id": chat_id})).id == 5
+
+
+def test_bot_get_chat_is_cached():
+    with FakeBotAPI() as api:
+        bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False)
+        bot.bootstrapped = True
+        assert bot.getChat(-100).id == -100
+        assert bot.chat_from_user(User({"id": 5})).type == "private"
+        assert bot.getChat(-100).id == -100
+        assert api.calls["getChat"] == 2
+        bot.chat_cache.invalidate(-100)
+        bot.getChat(-100)
+        assert api.calls["getChat"] == 3
+        uncached = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False, chat_cache=False)
+        uncached.bootstrapped = True
+        uncached.getChat(-100)
+        uncached.getChat(-100)
+        assert api.calls["getChat"] == 5
@@ -0,0 +1,77 @@
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from json import loads
+from threading import Thread
+import pytest
+from telebotapi import Chat, FakeBotAPI, SessionTransport, TelegramBot
+from telebotapi import codec as codecs
+from telebotapi.codec import JsonCodec, OrjsonCodec, default_codec
+
+TOKEN = "0" * 46
+CODECS = [JsonCodec] + ([OrjsonCodec] if codecs.orjson is not None else [])
+
+
+@pytest.mark.parametrize("cls", CODECS, ids=lambda c: c.name)
+def test_round_trip(cls):
+    codec = cls()
+    value = {"ok": True, "result": [{"text": "ciao è 🎉", "n": 1, "f": 1.5, "none": None}]}
+    encoded = codec.dumps(value)
+    assert isinstance(encoded, str)
+    # compact and not escaped, the way form fields are sent
+    assert ", " not in encoded and ": " not in encoded and "è" in encoded
+    assert codec.loads(encoded.encode()) == codec.loads(encoded) == value
+
+
+def test_default_codec(monkeypatch):
+    assert type(default_codec()) is (OrjsonCodec if codecs.orjson is not None else JsonCodec)
+    monkeypatch.setattr(codecs, "orjson", None)
+    assert type(default_codec()) is JsonCodec
+    with pytest.raises(ImportError):
+        OrjsonCodec()
+
+
+class CountingCodec(JsonCodec):
+    name = "counting"
+
+    def __init__(self):
+        self.decoded = 0
+
+    def loads(self, data):
+        self.decoded += 1
+        return JsonCodec.loads(self, data)
+
+
+def test_bot_uses_its_codec_both_ways():
+    with FakeBotAPI() as api:
+        codec = CountingCodec()
+        bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False, codec=codec)
+        bot.bootstrapped = True
+        assert bot.transport.codec is codec and bot.codec is codec
+        bot.sendMessage(Chat.by_id(5), "hi", reply_markup={"inline_keyboard": [[{"text": "à", "callback_data": "1"}]]})
+        assert codec.decoded == 1
+        assert api.sent[-1][2]["reply_markup"] == '{"inline_keyboard":[[{"text":"à","callback_data":"1"}]]}'
+        # already encoded markup is passed through
+        bot.sendMessage(Chat.by_id(5), "hi", reply_markup='{"remove_keyboard": true}')
+        assert loads(api.sent[-1][2]["reply_markup"]) == {"remove_keyboard": True}
+
+
+class BadGateway(BaseHTTPRequestHandler):
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.send_error(502)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_non_json_answers_become_api_errors():
+    # what a proxy in front of the api answers with
+    server = HTTPServer(("127.0.0.1", 0), BadGateway)
+    Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        transport = SessionTransport(f"http://127.0.0.1:{server.server_address[1]}")
+        r = transport.post(transport.url(TOKEN, "getMe"), data={})
+        assert r == {"ok": False, "error_code": 502, "description": "HTTP 502 Bad Gateway"}
+        transport.close()
+    finally:
+        server.shutdown()
+        server.server_close()
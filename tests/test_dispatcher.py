@@ -0,0 +1,95 @@
+import threading
+from time import sleep, monotonic
+import pytest
+from telebotapi import TelegramBot, Update
+from telebotapi.daemon import Condition, Filter, wait_for
+from telebotapi.dispatcher import Dispatcher, chat_key, handler_name
+
+TOKEN = "0" * 46
+# module level, a nested lambda already has a readable qualified name
+ANONYMOUS = lambda: None  # noqa: E731
+
+
+def text(i, chat_id, body="hi"):
+    return {"update_id": i, "message": {"message_id": i, "date": 0, "text": body,
+                                        "from": {"id": chat_id, "is_bot": False, "first_name": "a"},
+                                        "chat": {"id": chat_id, "type": "private"}}}
+
+
+def test_chat_key_and_handler_name():
+    assert chat_key(Update(text(1, 7))) == 7
+    assert chat_key(Update({"update_id": 1, "message": {"message_id": 1, "date": 0, "from": {"id": 3}}})) == 3
+    assert handler_name(test_chat_key_and_handler_name) == "test_chat_key_and_handler_name"
+    assert handler_name(ANONYMOUS).startswith("<lambda>:test_dispatcher.py:")
+
+
+def test_ordered_per_chat_parallel_across_chats():
+    seen = {}
+    running = set()
+    overlap = []
+    lock = threading.Lock()
+
+    def handle(chat_id, i):
+        with lock:
+            if chat_id in running:
+                overlap.append(chat_id)
+            running.add(chat_id)
+        sleep(.01)
+        with lock:
+            running.discard(chat_id)
+            seen.setdefault(chat_id, []).append(i)
+
+    with Dispatcher(workers=8) as d:
+        start = monotonic()
+        for i in range(20):
+            for chat_id in range(4):
+                d.submit(chat_id, handle, chat_id, i)
+        assert d.join(5)
+        # 4 chats of 20 sleeps each run side by side
+        assert monotonic() - start < 20 * .01 * 3
+    assert overlap == []
+    assert seen == {chat_id: list(range(20)) for chat_id in range(4)}
+    assert d.stats()["busy_chats"] == 0
+
+
+def test_errors_reach_the_future_and_the_stats():
+    def fail():
+        raise ValueError("boom")
+
+    with Dispatcher(workers=2) as d:
+        f = d.submit(1, fail)
+        ok = d.submit(1, lambda: 5, name="five")
+        with pytest.raises(ValueError):
+            f.result(5)
+        # the chat keeps going after a failing handler
+        assert ok.result(5) == 5
+    handlers = d.stats()["handlers"]
+    assert handlers["test_errors_reach_the_future_and_the_stats.<locals>.fail"]["errors"] == 1
+    assert handlers["five"]["calls"] == 1 and handlers["five"]["errors"] == 0
+
+
+def test_submit_blocks_at_max_inflight():
+    release = threading.Event()
+    with Dispatcher(workers=4, max_inflight=2) as d:
+        d.submit(1, release.wait)
+        d.submit(2, release.wait)
+        third = threading.Thread(target=d.submit, args=(3, lambda: None))
+        third.start()
+        third.join(.2)
+        assert third.is_alive()
+        release.set()
+        third.join(5)
+        assert not third.is_alive()
+
+
+def test_wait_for_with_dispatcher():
+    bot = TelegramBot(TOKEN, rate_limiter=False)
+    bot.bootstrapped = True
+    handled = []
+    bot.feed([text(1, 5), text(2, 6), text(3, 5, "stop")])
+    with Dispatcher(workers=4) as d:
+        r = wait_for(bot, Condition(Filter(lambda m: m.text == "hi"), callback=lambda m: handled.append(m.id)),
+                     Condition(Filter(lambda m: m.text == "stop"), stop_return="done"), timeout=5, dispatcher=d)
+        assert r == "done"
+        d.join(5)
+    assert sorted(handled) == [1, 2]
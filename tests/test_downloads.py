@@ -0,0 +1,98 @@
+import asyncio
+import os
+from io import BytesIO
+import pytest
+from telebotapi import AsyncTelegramBot, FakeBotAPI, File, SessionTransport, TelegramBot
+from telebotapi.aio import AiohttpTransport, ExecutorTransport, aiohttp
+from telebotapi.exceptions import DownloadFailed
+
+TOKEN = "0" * 46
+DATA = os.urandom(300 << 10)
+
+
+def bot_for(api, tmp_path, **kwargs):
+    bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False,
+                      file_cache=str(tmp_path / "cache"), **kwargs)
+    bot.bootstrapped = True
+    return bot
+
+
+def test_download_to_path_file_and_cache(tmp_path):
+    with FakeBotAPI() as api:
+        f = File(api.add_file(DATA))
+        bot = bot_for(api, tmp_path)
+        target = tmp_path / "out.bin"
+        assert bot.download(f, target) == target
+        assert target.read_bytes() == DATA
+        # second time from the file cache, without asking the server
+        out = BytesIO()
+        bot.download(f, out)
+        assert out.getvalue() == DATA
+        assert api.calls["getFile"] == api.calls["download"] == 1
+        assert bot.file_cache.stats()["hits"] == 1
+
+
+def test_stale_link_is_refreshed_once(tmp_path):
+    with FakeBotAPI() as api:
+        file_id = api.add_file(DATA)["file_id"]
+        bot = bot_for(api, tmp_path)
+        # a bare file id has no unique id, so it never goes through the cache
+        bot.download(file_id, tmp_path / "a.bin")
+        api.expire()
+        bot.download(file_id, tmp_path / "b.bin")
+        assert (tmp_path / "b.bin").read_bytes() == DATA
+        assert api.calls["getFile"] == 2
+
+
+def test_failed_download_leaves_nothing_behind(tmp_path):
+    with FakeBotAPI() as api:
+        f = File(api.add_file(DATA))
+        bot = bot_for(api, tmp_path)
+        api.inject("error", method="download")
+        with pytest.raises(DownloadFailed):
+            bot.download(f, tmp_path / "out.bin")
+        assert os.listdir(tmp_path / "cache") == []
+        assert not (tmp_path / "out.bin").exists()
+
+
+def test_timed_out_download_starts_the_file_over(tmp_path):
+    with FakeBotAPI() as api:
+        file_id = api.add_file(DATA)["file_id"]
+        bot = bot_for(api, tmp_path)
+        bot.upload_timeout = .3
+        api.inject("timeout", method="download", delay=1.)
+        out = BytesIO(b"header")
+        out.seek(6)
+        bot.download(file_id, out)
+        assert out.getvalue() == b"header" + DATA
+        # the abandoned request is only counted once the server stops waiting
+        assert api.wait_for_calls("download", 2, timeout=5)
+
+
+@pytest.mark.parametrize("transport", ["aiohttp", "executor"])
+def test_async_download(tmp_path, transport):
+    if transport == "aiohttp" and aiohttp is None:
+        pytest.skip("aiohttp is not installed")
+
+    async def run(api):
+        t = AiohttpTransport(api.base_url) if transport == "aiohttp" else \
+            ExecutorTransport(SessionTransport(api.base_url))
+        bot = AsyncTelegramBot(TOKEN, transport=t, rate_limiter=False, file_cache=str(tmp_path / "cache"))
+        bot.bootstrapped = True
+        try:
+            f = File(api.add_file(DATA))
+            path = await bot.download(f)
+            with open(path, "rb") as r:
+                assert r.read() == DATA
+            api.expire()
+            await bot.download(f.id, tmp_path / "out.bin")
+            assert (tmp_path / "out.bin").read_bytes() == DATA
+            api.inject("error", method="download")
+            with pytest.raises(DownloadFailed):
+                await bot.download(f.id, tmp_path / "fail.bin")
+        finally:
+            await bot.close()
+
+    with FakeBotAPI() as api:
+        asyncio.run(run(api))
+        assert api.calls["getFile"] == 2
@@ -0,0 +1,138 @@
+import threading
+from time import monotonic, sleep
+import pytest
+from telebotapi import FakeBotAPI, Message, SessionTransport, TelegramBot
+from telebotapi.edits import EditCoalescer
+from telebotapi.exceptions import MessageNotModified
+
+TOKEN = "0" * 46
+
+
+class Recorder:
+    # stands in for the bot, answers edits like telegram does
+    def __init__(self, fail=None):
+        self.calls = []
+        self.shown = {}
+        self.fail = fail
+        self.lock = threading.Lock()
+
+    def encode(self, value):
+        return value if isinstance(value, str) else repr(value)
+
+    def editMessageText(self, message, body, parse_mode, reply_markup, a):
+        with self.lock:
+            self.calls.append((monotonic(), "text", body, reply_markup))
+        if self.fail is not None:
+            raise self.fail
+        if self.shown.get(message.id) == (body, reply_markup):
+            raise MessageNotModified({"ok": False, "error_code": 400,
+                                      "description": "Bad Request: message is not modified: same content"},
+                                     "editMessageText", {"chat_id": message.chat.id, "message_id": message.id,
+                                                         "text": body})
+        self.shown[message.id] = (body, reply_markup)
+        return message
+
+    def editMessageReplyMarkup(self, reply_markup, message, a):
+        with self.lock:
+            self.calls.append((monotonic(), "markup", None, reply_markup))
+        return True
+
+
+def message(i=1, chat_id=5):
+    return Message.by_id(i, chat_id)
+
+
+def test_bursts_are_coalesced_into_the_latest_edit():
+    bot = Recorder()
+    with EditCoalescer(bot, interval=.2) as c:
+        m = message()
+        assert c.edit_text(m, "progress 0%").result(5) is m
+        futures = [c.edit_text(m, f"progress {i}%") for i in range(10, 101, 10)]
+        assert all(f.result(5) is m for f in futures)
+        stats = c.stats()
+    # the first edit goes out right away, the next ones wait out the interval and only the last one is sent
+    assert [body for _, _, body, _ in bot.calls] == ["progress 0%", "progress 100%"]
+    assert bot.calls[1][0] - bot.calls[0][0] >= .19
+    assert stats["requested"] == 11 and stats["sent"] == 2 and stats["superseded"] == 9
+
+
+def test_messages_are_independent():
+    bot = Recorder()
+    with EditCoalescer(bot, interval=1.) as c:
+        start = monotonic()
+        futures = [c.edit_text(message(i), "x") for i in range(5)]
+        for f in futures:
+            f.result(5)
+        assert monotonic() - start < .5
+    assert len(bot.calls) == 5
+
+
+def test_unchanged_edits_are_not_sent():
+    bot = Recorder()
+    with EditCoalescer(bot, interval=.05) as c:
+        m = message()
+        c.edit_text(m, "same").result(5)
+        c.edit_text(m, "same").result(5)
+        # the message shows it already, telegram would only answer "message is not modified"
+        assert c.stats()["skipped"] == 1
+        c.edit_markup({"k": 1}, m).result(5)
+        c.edit_markup({"k": 1}, m).result(5)
+        assert c.stats()["skipped"] == 2
+    assert [kind for _, kind, _, _ in bot.calls] == ["text", "markup"]
+
+
+def test_markup_rides_along_with_a_pending_text_edit():
+    bot = Recorder()
+    with EditCoalescer(bot, interval=.2) as c:
+        m = message()
+        c.edit_text(m, "first").result(5)
+        c.edit_text(m, "second")
+        f = c.edit_markup({"k": 1}, m)
+        f.result(5)
+    assert [(kind, body, markup) for _, kind, body, markup in bot.calls] == \
+           [("text", "first", None), ("text", "second", "{'k': 1}")]
+
+
+def test_not_modified_is_not_an_error_and_failures_reach_every_waiter():
+    bot = Recorder()
+    bot.shown[1] = ("shown", None)
+    with EditCoalescer(bot, interval=.05) as c:
+        assert c.edit_text(message(), "shown").result(5) is not None
+        assert c.stats()["not_modified"] == 1
+    bot = Recorder(fail=ValueError("down"))
+    with EditCoalescer(bot, interval=.2) as c:
+        m = message()
+        c.edit_text(m, "a")
+        sleep(.05)
+        futures = [c.edit_text(m, "b"), c.edit_text(m, "c")]
+        for f in futures:
+            with pytest.raises(ValueError):
+                f.result(5)
+        assert c.stats()["failed"] == 2
+
+
+def test_close_flushes_pending_edits():
+    bot = Recorder()
+    c = EditCoalescer(bot, interval=10.)
+    m = message()
+    c.edit_text(m, "a").result(5)
+    f = c.edit_text(m, "b")
+    start = monotonic()
+    c.close()
+    assert f.done() and monotonic() - start < 1
+    assert [body for _, _, body, _ in bot.calls] == ["a", "b"]
+    with pytest.raises(TypeError):
+        c.edit_markup({})
+
+
+def test_through_the_bot():
+    with FakeBotAPI() as api:
+        bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False)
+        bot.bootstrapped = True
+        with bot.edit_coalescer(interval=.1) as c:
+            m = message(7)
+            c.edit_text(m, "0").result(5)
+            futures = [c.edit_text(m, str(i)) for i in range(1, 20)]
+            assert futures[-1].result(5).text == "19"
+        assert api.calls["editMessageText"] == 2
+        assert [p["text"] for _, method, p in api.sent if method == "editMessageText"] == ["0", "19"]
@@ -0,0 +1,26 @@
+from telebotapi import Chat, FakeBotAPI, SessionTransport, TelegramBot
+
+TOKEN = "0" * 46
+
+
+def test_chunked_upload_keeps_the_connection_usable():
+    with FakeBotAPI() as api:
+        bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False)
+        bot.bootstrapped = True
+        r = bot.sendDocument(Chat.by_id(5), iter([b"a" * 1000, b"b" * 24]), name="f.bin")
+        assert r["result"]["document"] == dict(r["result"]["document"], file_name="f.bin", file_size=1024)
+        _, method, params = api.sent[-1]
+        assert method == "sendDocument" and params["chat_id"] == "5"
+        # the same keep-alive connection answers the next request
+        assert bot.sendMessage(Chat.by_id(5), "after").text == "after"
+        assert bot.connection_stats()["connections"] == 1
+
+
+def test_send_photo():
+    with FakeBotAPI() as api:
+        bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False)
+        bot.bootstrapped = True
+        m = bot.sendPhoto(Chat.by_id(5), b"\xff\xd8" + b"x" * 2046, caption="c")
+        assert (m.photo.width, m.photo.size) == (800, 2048)
+        assert m.thumbnail.width == 90
+        assert bot.sendPhoto(Chat.by_id(5), m.photo.id).photo.id == m.photo.id
@@ -0,0 +1,62 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from queue import Full
+from time import monotonic, sleep
+import pytest
+from telebotapi import Chat, FakeBotAPI, InFlight, SessionTransport, TelegramBot
+
+
+def test_concurrency_is_bounded():
+    inflight = InFlight(3)
+    lock = threading.Lock()
+    running = [0, 0]
+
+    def work(i):
+        with inflight.slot():
+            with lock:
+                running[0] += 1
+                running[1] = max(running[1], running[0])
+            sleep(.01)
+            with lock:
+                running[0] -= 1
+
+    with ThreadPoolExecutor(8) as ex:
+        list(ex.map(work, range(40)))
+    assert running[1] == 3
+    stats = inflight.stats()
+    assert stats["completed"] == 40 and stats["inflight"] == 0 and stats["max_wait"] > 0
+
+
+def test_waiting_is_bounded():
+    inflight = InFlight(1, max_waiting=0)
+    inflight.acquire()
+    with pytest.raises(Full):
+        inflight.acquire()
+    inflight.release()
+    inflight.acquire()
+    assert inflight.stats()["rejected"] == 1
+
+
+def test_acquire_times_out():
+    inflight = InFlight(1)
+    inflight.acquire()
+    start = monotonic()
+    with pytest.raises(Full):
+        inflight.acquire(timeout=.05)
+    assert monotonic() - start >= .05
+
+
+def test_polling_does_not_wait_for_senders():
+    with FakeBotAPI() as api:
+        bot = TelegramBot("0" * 46, transport=SessionTransport(api.base_url), rate_limiter=False, max_inflight=1)
+        bot.bootstrapped = True
+        # the only send slot is held by a call the server answers late
+        api.inject("timeout", method="sendMessage", delay=.5)
+        with ThreadPoolExecutor(1) as ex:
+            sending = ex.submit(bot.sendMessage, Chat.by_id(1), "slow")
+            while bot.inflight.stats()["inflight"] == 0:
+                sleep(.005)
+            start = monotonic()
+            bot.poll()
+            assert monotonic() - start < .4
+            sending.result()
@@ -0,0 +1,64 @@
+import pytest
+from telebotapi import Update
+from telebotapi.messages import Message, Text
+
+RAW = {"update_id": 1, "message": {"message_id": 3, "date": 0, "text": "/start now",
+                                   "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+                                   "from": {"id": 5, "is_bot": False, "first_name": "a"},
+                                   "chat": {"id": 7, "type": "group"},
+                                   "reply_to_message": {"message_id": 2, "date": 0, "text": "hi",
+                                                        "chat": {"id": 7, "type": "group"}}}}
+
+
+def decoded(obj, name):
+    try:
+        getattr(type(obj), name).member.__get__(obj)
+    except AttributeError:
+        return False
+    return True
+
+
+def test_content_is_decoded_on_first_access():
+    u = Update(RAW, lazy=True)
+    assert u.id == 1 and u.envelope == "message" and u.type == "text" and u.content_class is Text
+    assert not decoded(u, "content")
+    m = u.content
+    assert decoded(u, "content")
+    assert m.id == 3
+    assert not decoded(m, "chat") and not decoded(m, "from_")
+    assert m.chat.id == 7
+    assert decoded(m, "chat") and not decoded(m, "from_")
+    # the same object on every access
+    assert u.content is m and m.chat is m.chat
+
+
+def test_lazy_and_eager_agree():
+    lazy, eager = Update(RAW, lazy=True).content, Update(RAW).content
+    for name in ("id", "text", "type"):
+        assert getattr(lazy, name) == getattr(eager, name)
+    assert lazy.chat.id == eager.chat.id and lazy.from_.id == eager.from_.id
+    assert lazy.reply_to_message.text == eager.reply_to_message.text == "hi"
+    assert [(e.type, e.offset, e.length) for e in lazy.entities] == \
+           [(e.type, e.offset, e.length) for e in eager.entities]
+    # eager decoding happens in the constructor
+    assert decoded(eager, "chat") and decoded(eager, "reply_to_message")
+
+
+def test_missing_fields_raise_attribute_error():
+    m = Message({"message_id": 1, "chat": {"id": 1}}, lazy=True)
+    assert not hasattr(m, "from_")
+    assert not hasattr(m, "reply_to_message")
+    assert m.entities == []
+    with pytest.raises(AttributeError):
+        m.text
+
+
+def test_unknown_kind_fails_even_when_lazy():
+    with pytest.raises(TypeError):
+        Update({"update_id": 1, "poll": {"id": "1"}}, lazy=True)
+
+
+def test_decode_forces_nested_fields():
+    u = Update(RAW, lazy=True).decode()
+    m = u.content
+    assert decoded(m, "chat") and decoded(m, "reply_to_message") and decoded(m.reply_to_message, "chat")
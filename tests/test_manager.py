@@ -0,0 +1,75 @@
+import threading
+from time import sleep
+import pytest
+from telebotapi import FakeBotAPI, SessionTransport, TelegramBot
+from telebotapi.manager import BotManager, bot_key
+
+
+def token(n):
+    prefix = f"{n}:"
+    return prefix + "a" * (46 - len(prefix))
+
+
+def text(i, body="hi"):
+    return {"update_id": i, "message": {"message_id": i, "date": 0, "text": body,
+                                        "from": {"id": 5, "is_bot": False, "first_name": "a"},
+                                        "chat": {"id": 5, "type": "private"}}}
+
+
+def test_bot_key():
+    assert bot_key(TelegramBot(token(123), rate_limiter=False)) == "123"
+    assert bot_key(TelegramBot(token(123), name="news", rate_limiter=False)) == "news"
+
+
+def test_handler_runs_in_order_on_the_shared_transport():
+    with FakeBotAPI() as api:
+        handled = []
+        done = threading.Event()
+
+        def handle(bot, u):
+            handled.append(u.id)
+            if u.content.text == "boom":
+                raise ValueError("boom")
+            if len(handled) == 6:
+                done.set()
+
+        with BotManager(workers=2, transport=SessionTransport(api.base_url), idle_delay=.1) as m:
+            bot = m.bot(token(1), handler=handle, rate_limiter=False)
+            assert bot.transport is m.transport
+            api.push(*(text(i, "boom" if i == 2 else "hi") for i in range(1, 4)))
+            sleep(.3)
+            api.push(*(text(i) for i in range(4, 7)))
+            assert done.wait(5)
+            stats = m.stats()["per_bot"]["1"]
+        # a failing handler does not stop the ones after it
+        assert handled == [1, 2, 3, 4, 5, 6]
+        assert stats["updates"] == 6 and stats["handler"]["errors"] == 1 and stats["errors"] == 0
+
+
+def test_hosting_several_bots():
+    with FakeBotAPI() as api:
+        transport = SessionTransport(api.base_url)
+        with BotManager(workers=2, transport=transport, idle_delay=.1) as m:
+            a = m.bot(token(1), rate_limiter=False)
+            own = TelegramBot(token(2), transport=SessionTransport(api.base_url), rate_limiter=False)
+            b = m.add(own)
+            assert b.transport is transport
+            with pytest.raises(KeyError):
+                m.bot(token(2), rate_limiter=False)
+            assert len(m) == 2 and "1" in m and m.get("2") is b
+            sleep(.5)
+            # idle bots back off instead of polling in a tight loop
+            polls = m.stats()["per_bot"]["1"]["polls"]
+            assert 0 < polls < 15
+            assert m.stats()["per_bot"]["2"]["polls"] > 0
+            assert m.remove("1") is a
+            sleep(.3)
+            assert "1" not in m
+            # no more polls for a removed bot, and without a handler updates stay queued
+            api.push(text(1))
+            for _ in range(50):
+                if b.has_updates():
+                    break
+                sleep(.05)
+            assert [u.id for u in b.get_updates()] == [1]
+            assert not a.has_updates()
@@ -0,0 +1,105 @@
+from contextlib import contextmanager
+from urllib.request import urlopen
+import pytest
+from telebotapi import Chat, FakeBotAPI, SessionTransport, TelegramBot
+from telebotapi.daemon import Condition, Filter, Forks, wait_for
+from telebotapi.exceptions import TooManyRequests
+from telebotapi.metrics import Metrics, Registry
+
+TOKEN = "0" * 46
+
+
+def text(i):
+    return {"update_id": i, "message": {"message_id": i, "date": 0, "text": "hi",
+                                        "from": {"id": 5, "is_bot": False, "first_name": "a"},
+                                        "chat": {"id": 5, "type": "private"}}}
+
+
+def test_exposition_format():
+    r = Registry()
+    c = r.counter("sent_total", "Sent", ("method",))
+    c.inc("say \"hi\"\n")
+    c.inc("sendMessage", amount=2)
+    r.gauge("queued", "Queued", fn=lambda: 3)
+    h = r.histogram("latency_seconds", "Latency", ("method",), buckets=(.1, 1.))
+    for v in (.05, .5, .5, 5.):
+        h.observe(v, "getMe")
+    assert r.render() == "\n".join([
+        "# HELP sent_total Sent",
+        "# TYPE sent_total counter",
+        'sent_total{method="say \\"hi\\"\\n"} 1',
+        'sent_total{method="sendMessage"} 2',
+        "# HELP queued Queued",
+        "# TYPE queued gauge",
+        "queued 3",
+        "# HELP latency_seconds Latency",
+        "# TYPE latency_seconds histogram",
+        'latency_seconds_bucket{method="getMe",le="0.1"} 1',
+        'latency_seconds_bucket{method="getMe",le="1.0"} 3',
+        'latency_seconds_bucket{method="getMe",le="+Inf"} 4',
+        'latency_seconds_sum{method="getMe"} 6.05',
+        'latency_seconds_count{method="getMe"} 4',
+    ]) + "\n"
+    assert h.count("getMe") == 4 and c.get("sendMessage") == 2
+
+
+def test_registering_twice():
+    r = Registry()
+    assert r.counter("a") is r.counter("a")
+    with pytest.raises(ValueError):
+        r.gauge("a")
+
+
+def test_scrape_endpoint():
+    m = Metrics()
+    m.received.inc("bot")
+    server = m.registry.serve("127.0.0.1", 0)
+    try:
+        with urlopen(f"http://127.0.0.1:{server.server_address[1]}/metrics") as r:
+            assert r.headers["Content-Type"].startswith("text/plain")
+            assert 'telebotapi_updates_received_total{bot="bot"} 1' in r.read().decode()
+    finally:
+        m.registry.close()
+
+
+class Tracer:
+    def __init__(self):
+        self.spans = []
+
+    @contextmanager
+    def start_as_current_span(self, name, attributes=None):
+        self.spans.append((name, attributes))
+        yield
+
+
+def test_bot_reports_queries_updates_and_handlers():
+    with FakeBotAPI() as api:
+        tracer = Tracer()
+        m = Metrics(tracer=tracer)
+        bot = TelegramBot(TOKEN, name="news", transport=SessionTransport(api.base_url), rate_limiter=False,
+                          metrics=m)
+        bot.bootstrapped = True
+        bot.sendMessage(Chat.by_id(5), "hi")
+        api.inject("429", method="getChat")
+        with pytest.raises(TooManyRequests):
+            bot.getChat(7)
+        assert m.query_seconds.count("sendMessage") == 1
+        assert m.errors.get("getChat", "TooManyRequests") == 1
+        assert ("telegram.sendMessage", {"telegram.method": "sendMessage", "telegram.bot": "news"}) in tracer.spans
+
+        bot.feed([text(1), text(2)])
+        assert m.received.get("news") == 2
+        assert "telebotapi_updates_backlog{bot=\"news\"} 2" in m.render()
+
+        def reply(msg):
+            if msg.id == 2:
+                raise ValueError("boom")
+
+        forks = Forks()
+        forks.attach(completed=Condition(Filter(lambda msg: False), stop_return=True))
+        with pytest.raises(ValueError):
+            wait_for(bot, Condition(callback=reply), timeout=1, forks=forks)
+        name = "test_bot_reports_queries_updates_and_handlers.<locals>.reply"
+        assert m.handler_seconds.count(name) == 2 and m.handler_errors.get(name) == 1
+        assert ("telebotapi.handler", {"handler": name}) in tracer.spans
+        assert "telebotapi_forks_active 1" in m.render()
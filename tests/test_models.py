@@ -0,0 +1,63 @@
+import pytest
+from telebotapi import Chat, TelegramBot, Update
+from telebotapi.model import EMPTY
+
+TOKEN = "0" * 46
+RAW = {"update_id": 1, "message": {"message_id": 3, "date": 9, "text": "hi", "via_bot": {"id": 1},
+                                   "from": {"id": 5, "is_bot": False, "first_name": "a", "is_premium": True},
+                                   "chat": {"id": 7, "type": "group", "title": "t"},
+                                   "photo": None}}
+
+
+def models(obj):
+    yield obj
+    for f in type(obj).lazy_fields:
+        try:
+            value = f.member.__get__(obj)
+        except AttributeError:
+            continue
+        if hasattr(value, "lazy_fields"):
+            yield from models(value)
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_models_have_no_instance_dict(lazy):
+    u = Update(RAW, lazy=lazy).decode()
+    for m in models(u):
+        assert not hasattr(m, "__dict__"), m
+    with pytest.raises(AttributeError):
+        u.content.chat.anything = 1
+
+
+@pytest.mark.parametrize("lazy", [False, True])
+def test_drop_raw_keeps_every_value(lazy):
+    u = Update(dict(RAW, message=dict(RAW["message"], photo=[])), lazy=lazy).drop_raw()
+    m = u.content
+    assert all(i.raw is None for i in models(u))
+    assert (m.id, m.text, m.chat.id, m.from_.id) == (3, "hi", 7, 5)
+    # unknown keys are still there, decoded from the raw dict before it was dropped
+    assert m.date == 9 and m.via_bot == {"id": 1}
+    assert m.chat.title == "t" and m.from_.is_premium
+    with pytest.raises(AttributeError):
+        m.missing
+    assert u.drop_raw() is u
+
+
+def test_extra_only_holds_unknown_keys():
+    c = Chat({"id": 1, "type": "private"})
+    assert c.extra is EMPTY
+    assert Chat({"id": 1, "title": "x"}).extra == {"title": "x"}
+    with pytest.raises(AttributeError):
+        c._private
+
+
+def test_bot_drops_raw_when_asked():
+    for keep_raw in (True, False):
+        bot = TelegramBot(TOKEN, rate_limiter=False, keep_raw=keep_raw)
+        bot.bootstrapped = True
+        bot.feed([RAW])
+        u = bot.get_update()
+        assert (u.raw is not None) == keep_raw
+        assert u.content.text == "hi"
+    with pytest.raises(ValueError):
+        TelegramBot(TOKEN, rate_limiter=False, keep_raw=False, lazy=True)
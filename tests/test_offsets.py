@@ -0,0 +1,108 @@
+from telebotapi import FakeBotAPI, SessionTransport, TelegramBot
+from telebotapi.offsets import FileOffsetStore, OffsetStore
+
+TOKEN = "0" * 46
+
+
+def update(i):
+    return {"update_id": i, "message": {"message_id": i, "date": 0, "chat": {"id": 1, "type": "private"}}}
+
+
+def test_torn_write_then_append_survives_restart(tmp_path):
+    path = str(tmp_path / "offsets.jsonl")
+    store = FileOffsetStore(path)
+    store.received([update(1), update(2)])
+    store.close()
+    with open(path, "a") as f:
+        f.write('{"u":{"update_id":')
+
+    store = FileOffsetStore(path)
+    assert sorted(store.pending) == [1, 2]
+    store.received([update(3), update(4)])
+    store.ack([1])
+    store.close()
+
+    store = FileOffsetStore(path)
+    assert sorted(store.pending) == [2, 3, 4]
+    assert store.fetched == 5
+    store.close()
+
+
+def test_line_missing_its_newline_is_dropped(tmp_path):
+    path = str(tmp_path / "offsets.jsonl")
+    with open(path, "w") as f:
+        f.write('{"o":7}\n{"o":9}')
+    store = FileOffsetStore(path)
+    assert store.fetched == 7
+    store.received([update(7)])
+    store.close()
+    assert FileOffsetStore(path).fetched == 8
+
+
+def test_offset_follows_the_oldest_unacknowledged_update():
+    store = OffsetStore()
+    store.received([update(3), update(4), update(5)])
+    assert store.offset == 3
+    store.ack([4])
+    assert store.offset == 3
+    store.ack([3, 3, 9])
+    assert store.offset == 5
+    store.ack([5])
+    assert store.offset == 6
+    assert store.stats() == {"fetched": 6, "pending": 0, "acked": 3}
+
+
+def test_acks_are_batched(tmp_path):
+    path = str(tmp_path / "offsets.jsonl")
+    store = FileOffsetStore(path, batch=3, interval=60)
+    store.received([update(i) for i in range(1, 6)])
+    syncs = store.syncs
+    store.ack([1])
+    store.ack([2])
+    assert store.syncs == syncs and store.stats()["unflushed"] == 2
+    store.ack([3])
+    assert store.syncs == syncs + 1 and store.stats()["unflushed"] == 0
+    store.ack([4])
+    # unflushed acks ride along with the next received batch
+    store.received([update(6)])
+    assert store.syncs == syncs + 2 and store.stats()["unflushed"] == 0
+    store.file.close()
+    assert sorted(FileOffsetStore(path).pending) == [5, 6]
+
+
+def test_compaction_keeps_pending_and_offset(tmp_path):
+    path = str(tmp_path / "offsets.jsonl")
+    store = FileOffsetStore(path, batch=1, compact_every=20)
+    for i in range(1, 31):
+        store.received([update(i)])
+        if i != 7:
+            store.ack([i])
+    assert store.stats()["journal_lines"] < 20
+    store.close()
+    with open(path) as f:
+        assert len(f.readlines()) < 20
+    store = FileOffsetStore(path)
+    assert sorted(store.pending) == [7] and store.fetched == 31
+    store.close()
+
+
+def test_bot_resumes_with_what_it_did_not_acknowledge(tmp_path):
+    path = str(tmp_path / "offsets.jsonl")
+    with FakeBotAPI() as api:
+        api.push(*(update(i) for i in range(1, 4)))
+        bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False, offset_store=path)
+        bot.bootstrap(start_daemon=False)
+        bot.poll()
+        bot.ack(bot.get_update())
+        bot.close()
+
+        api.push(update(4))
+        bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False, offset_store=path)
+        bot.bootstrap(start_daemon=False)
+        # restored from the journal, the server is not asked where to start from
+        assert bot.last_update == 4
+        bot.poll()
+        assert [u.id for u in bot.get_updates()] == [2, 3, 4]
+        bot.ack(2, [3, 4])
+        assert bot.offset_store.offset == 5
+        bot.close()
@@ -0,0 +1,62 @@
+import threading
+from json import loads
+from time import monotonic
+from telebotapi import FakeBotAPI, SessionTransport, TelegramBot
+
+TOKEN = "0" * 46
+
+
+def text(i, chat_id=5):
+    return {"update_id": i, "message": {"message_id": i, "date": 0, "text": "hi",
+                                        "from": {"id": chat_id, "is_bot": False, "first_name": "a"},
+                                        "chat": {"id": chat_id, "type": "private"}}}
+
+
+def bot_for(api, **kwargs):
+    bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False, **kwargs)
+    bot.bootstrap(start_daemon=False)
+    return bot
+
+
+def last_params(api, method="getUpdates"):
+    return [p for _, m, p in api.sent if m == method][-1]
+
+
+def test_poll_parameters_and_offset():
+    with FakeBotAPI() as api:
+        api.push(*(text(i) for i in range(1, 4)))
+        bot = bot_for(api, poll_timeout=1, poll_limit=2, allowed_updates=["message"])
+        assert bot.poll() == 2
+        p = last_params(api)
+        assert p["timeout"] == "1" and p["limit"] == "2" and loads(p["allowed_updates"]) == ["message"]
+        assert bot.poll() == 1
+        assert last_params(api)["offset"] == "3"
+        # the offset moves past the last update, a drained queue must not fetch it again
+        assert [u.id for u in bot.get_updates()] == [1, 2, 3]
+        start = monotonic()
+        assert bot.poll() == 0
+        assert last_params(api)["offset"] == "4"
+        assert monotonic() - start >= .9
+
+
+def test_long_poll_returns_as_soon_as_an_update_arrives():
+    with FakeBotAPI() as api:
+        bot = bot_for(api, poll_timeout=5)
+        threading.Timer(.2, api.push, (text(1), )).start()
+        start = monotonic()
+        assert bot.poll() == 1
+        assert monotonic() - start < 2
+
+
+def test_daemon_long_polls_without_sleeping():
+    with FakeBotAPI() as api:
+        bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False, poll_timeout=1)
+        bot.daemon_delay = 10
+        bot.bootstrap()
+        try:
+            for i in range(1, 4):
+                api.push(text(i))
+                assert bot.news(2)
+            assert [u.id for u in bot.get_updates()] == [1, 2, 3]
+        finally:
+            bot.daemon.active = False
@@ -0,0 +1,57 @@
+import pytest
+from queue import Empty
+from telebotapi import Chat, User
+from telebotapi.queues import UpdateQueue
+from telebotapi.update import Update
+
+USER = {"id": 42, "is_bot": False, "first_name": "a"}
+GROUP = {"id": -1001, "type": "supergroup", "title": "g"}
+
+
+def message(chat):
+    return {"message_id": 1, "date": 0, "text": "hi", "from": USER, "chat": chat}
+
+
+UPDATES = [
+    {"update_id": 1, "message": message(GROUP)},
+    {"update_id": 2, "edited_message": dict(message(GROUP), edit_date=1)},
+    {"update_id": 3, "channel_post": {"message_id": 1, "date": 0, "text": "hi",
+                                      "chat": {"id": -1002, "type": "channel", "title": "c"}}},
+    {"update_id": 4, "callback_query": {"id": "1", "from": USER, "chat_instance": "1", "data": "x",
+                                        "message": message(GROUP)}},
+]
+
+
+def decoded_keys(update):
+    content = update.content
+    chat = getattr(content, "chat", None)
+    from_ = getattr(content, "from_", None)
+    return None if chat is None else chat.id, None if from_ is None else from_.id
+
+
+@pytest.mark.parametrize("raw", UPDATES, ids=lambda u: [k for k in u if k != "update_id"][0])
+def test_raw_keys_match_decoded_ones(raw):
+    assert UpdateQueue.keys(Update(raw, lazy=True)) == decoded_keys(Update(raw))
+    assert UpdateQueue.keys(Update(raw).drop_raw()) == decoded_keys(Update(raw))
+
+
+def test_put_does_not_decode_lazy_updates():
+    q = UpdateQueue()
+    updates = [Update(u, lazy=True) for u in UPDATES]
+    for u in updates:
+        q.put(u)
+    for u in updates:
+        with pytest.raises(AttributeError):
+            u._content
+    assert [u.id for u in q.drain(Chat.by_id(-1001))] == [1, 2, 4]
+    assert [u.id for u in q.drain()] == [3]
+
+
+def test_user_index():
+    q = UpdateQueue()
+    for u in UPDATES:
+        q.put(Update(u, lazy=True))
+    assert [u.id for u in q.drain(User(USER))] == [1, 2, 4]
+    with pytest.raises(Empty):
+        q.get_nowait(User(USER))
+    assert q.get_nowait().id == 3
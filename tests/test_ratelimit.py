@@ -0,0 +1,89 @@
+import threading
+from time import monotonic
+import pytest
+from telebotapi import Chat, FakeBotAPI, SessionTransport, TelegramBot
+from telebotapi.ratelimit import RateLimiter, TokenBucket, is_group
+
+TOKEN = "0" * 46
+
+
+def test_token_bucket_burst_then_spacing():
+    b = TokenBucket(rate=10, burst=3)
+    at = []
+    for _ in range(5):
+        t = b.ready(100.)
+        b.take(t)
+        at.append(round(t - 100., 3))
+    assert at == [0., 0., 0., .1, .2]
+    assert not b.idle(100.) and b.idle(100.5)
+
+
+def test_is_group():
+    assert is_group(-100123) and is_group("-5") and is_group("@channel")
+    assert not is_group(5) and not is_group("5")
+
+
+def test_reserve_per_chat():
+    limiter = RateLimiter(chat_rate=10, chat_burst=2, group_rate=2, group_burst=1)
+    assert [round(limiter.reserve(5), 1) for _ in range(4)] == [0., 0., .1, .2]
+    # every chat has its own bucket, groups a slower one
+    assert limiter.reserve(6) == 0.
+    assert [round(limiter.reserve(-1), 1) for _ in range(3)] == [0., .5, 1.]
+    assert limiter.reserve() == 0.
+    assert limiter.stats()["tracked_chats"] == 3
+
+
+def test_penalize_holds_back_one_chat():
+    limiter = RateLimiter()
+    limiter.penalize(5, 2)
+    assert limiter.reserve(5) == pytest.approx(2, abs=.05)
+    assert limiter.reserve(6) == 0.
+    assert limiter.stats()["blocked_chats"] == 1
+    # without a chat the global bucket waits
+    limiter.penalize(None, 1)
+    assert limiter.reserve_global() == pytest.approx(1, abs=.05)
+    assert limiter.stats()["throttled"] == 2
+
+
+def test_prune_forgets_idle_chats():
+    limiter = RateLimiter()
+    limiter.reserve(5)
+    limiter.penalize(6, 0)
+    limiter.prune(monotonic() + 10)
+    assert limiter.chats == {} and limiter.blocked == {}
+
+
+def test_sends_are_spaced_per_chat():
+    with FakeBotAPI() as api:
+        limiter = RateLimiter(chat_rate=10, chat_burst=1)
+        bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=limiter)
+        bot.bootstrapped = True
+        threads = [threading.Thread(target=bot.sendMessage, args=(Chat.by_id(i % 2 + 1), "hi")) for i in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        for chat_id in ("1", "2"):
+            times = [t for t, m, p in api.sent if m == "sendMessage" and p["chat_id"] == chat_id]
+            assert len(times) == 4
+            assert all(b - a > .08 for a, b in zip(times, times[1:]))
+        stats = limiter.stats()
+        assert stats["calls"] == 8 and stats["delayed"] == 6
+
+
+def test_too_many_requests_penalizes_the_chat_and_retries():
+    with FakeBotAPI() as api:
+        limiter = RateLimiter()
+        bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=limiter, auto_retry=True)
+        bot.bootstrapped = True
+        api.inject("429", method="sendMessage", chat_id=5, retry_after=1)
+        start = monotonic()
+        bot.sendMessage(Chat.by_id(5), "hi")
+        assert monotonic() - start >= .9
+        # another chat is not held back
+        start = monotonic()
+        bot.sendMessage(Chat.by_id(6), "hi")
+        assert monotonic() - start < .5
+        # rejected calls are not recorded by the server
+        assert api.calls["sendMessage"] == 2
+        assert limiter.stats()["throttled"] == 1
@@ -0,0 +1,203 @@
+import asyncio
+from time import monotonic, sleep
+import pytest
+from requests.exceptions import ReadTimeout
+from telebotapi import AsyncTelegramBot, Chat, CircuitBreaker, FakeBotAPI, RetryPolicy, SessionTransport, TelegramBot
+from telebotapi.aio import ExecutorTransport
+from telebotapi.exceptions import CircuitOpen, QueryException, TooManyRequests
+from telebotapi.metrics import Metrics
+from telebotapi.retry import RetryBudget
+from telebotapi.transport import Transport
+
+TOKEN = "0" * 46
+
+
+class Failing(Transport):
+    # raises something query() does not retry, then answers
+    def __init__(self):
+        Transport.__init__(self)
+        self.calls = 0
+
+    def post(self, url, data=None, files=None, headers=None, timeout=None):
+        self.calls += 1
+        if self.calls == 1:
+            raise RuntimeError("not a network error")
+        return {"ok": True, "result": True}
+
+
+def half_open(breaker):
+    for _ in range(breaker.threshold):
+        breaker.failure()
+    assert breaker.state == breaker.OPEN
+
+
+def test_probe_leaving_query_with_another_error_releases_its_slot():
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0.)
+    bot = TelegramBot(TOKEN, transport=Failing(), rate_limiter=False, circuit_breaker=breaker)
+    half_open(breaker)
+    with pytest.raises(RuntimeError):
+        bot.query("sendChatAction", {"chat_id": 1})
+    bot.query("sendChatAction", {"chat_id": 1})
+    assert breaker.state == breaker.CLOSED
+
+
+def test_cancelled_probe_releases_its_slot():
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0.)
+    with FakeBotAPI() as api:
+        async def run():
+            bot = AsyncTelegramBot(TOKEN, transport=ExecutorTransport(SessionTransport(api.base_url)),
+                                   rate_limiter=False, circuit_breaker=breaker)
+            bot.bootstrapped = True
+            half_open(breaker)
+            api.inject("timeout", method="sendMessage", delay=1.)
+            probe = asyncio.ensure_future(bot.sendMessage(Chat.by_id(1), "probe"))
+            await asyncio.sleep(.2)
+            probe.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await probe
+            await bot.sendMessage(Chat.by_id(1), "after")
+            assert breaker.state == breaker.CLOSED
+            await bot.close()
+
+        asyncio.run(run())
+
+
+def test_only_one_probe_at_a_time():
+    breaker = CircuitBreaker(threshold=1, reset_timeout=0.)
+    half_open(breaker)
+    assert breaker.allow() == (None, True)
+    wait, probe = breaker.allow()
+    assert wait == 0. and not probe
+    breaker.abandon()
+    assert breaker.allow() == (None, True)
+    breaker.success()
+    assert breaker.allow() == (None, False)
+
+
+def test_sends_are_not_repeated_after_reaching_the_server():
+    policy = RetryPolicy(base=0.)
+    assert policy.retry("sendMessage", 1) is None
+    assert policy.retry("sendMessage", 1, sent=False) is not None
+    assert policy.retry("editMessageText", 1) is not None
+    assert policy.retry("editMessageText", policy.max_attempts) is None
+
+
+def test_backoff_after_a_very_long_outage():
+    policy = RetryPolicy(base=.5, cap=30.)
+    for attempt in (1030, 10 ** 6):
+        assert 0 <= policy.backoff(attempt) <= 30.
+        assert 0 <= policy.retry("getUpdates", attempt) <= 30.
+
+
+def test_breaker_opens_probes_and_closes():
+    breaker = CircuitBreaker(threshold=3, reset_timeout=.2)
+    for _ in range(2):
+        breaker.failure()
+    assert breaker.allow() == (None, False)
+    breaker.success()
+    # only failures in a row count
+    for _ in range(2):
+        breaker.failure()
+    assert breaker.state == breaker.CLOSED
+    breaker.failure()
+    assert breaker.state == breaker.OPEN
+    wait, probe = breaker.allow()
+    assert 0 < wait <= .2 and not probe
+    sleep(.25)
+    assert breaker.allow() == (None, True)
+    assert breaker.state == breaker.HALF_OPEN
+    # a failed probe opens it again right away
+    breaker.failure()
+    assert breaker.state == breaker.OPEN and breaker.allow()[0] > 0
+    sleep(.25)
+    assert breaker.allow() == (None, True)
+    breaker.success()
+    assert breaker.stats() == {"state": "closed", "failures": 0, "rejected": 2, "trips": 1}
+
+
+def test_budget_limits_retries():
+    budget = RetryBudget(ratio=.5, min_per_second=0., max_tokens=2.)
+    assert budget.withdraw() and budget.withdraw()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert not budget.withdraw()
+    budget.deposit()
+    assert budget.withdraw()
+    assert budget.stats() == {"tokens": 0., "spent": 3, "denied": 2}
+    policy = RetryPolicy(base=0., budget=RetryBudget(min_per_second=0., max_tokens=1.))
+    assert policy.retry("getChat", 1) == 0.
+    assert policy.retry("getChat", 1) is None
+    # polling is never out of budget
+    assert policy.retry("getUpdates", 50) == 0.
+
+
+def bot_for(api, **kwargs):
+    kwargs.setdefault("retry_policy", RetryPolicy(base=0., budget=False))
+    # getChat is the idempotent call used here, it has to reach the server every time
+    bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False, chat_cache=False,
+                      metrics=Metrics(), **kwargs)
+    bot.bootstrapped = True
+    return bot
+
+
+def test_server_errors_are_retried_for_idempotent_methods_only():
+    with FakeBotAPI() as api:
+        bot = bot_for(api, circuit_breaker=False)
+        api.inject("error", method="getChat", count=2)
+        assert bot.getChat(5).id == 5
+        assert bot.metrics.retries.get("getChat", "server_error") == 2
+        api.inject("error", method="getChat", count=10)
+        with pytest.raises(QueryException) as e:
+            bot.getChat(5)
+        assert e.value.error_code == 500
+        # a send may have gone through before the error, it is not repeated
+        api.inject("error", method="sendMessage")
+        with pytest.raises(QueryException):
+            bot.sendMessage(Chat.by_id(5), "hi")
+        assert bot.metrics.retries.get("sendMessage", "server_error") == 0
+        assert bot.sendMessage(Chat.by_id(5), "hi").text == "hi"
+
+
+def test_timeouts_are_retried_for_idempotent_methods_only():
+    with FakeBotAPI() as api:
+        bot = bot_for(api, circuit_breaker=False)
+        api.inject("timeout", method="getChat", delay=1.)
+        assert bot.call("getChat", {"chat_id": 5}, timeout=.2)["ok"]
+        assert bot.metrics.retries.get("getChat", "timeout") == 1
+        api.inject("timeout", method="sendMessage", delay=1.)
+        with pytest.raises(ReadTimeout):
+            bot.call("sendMessage", {"chat_id": 5, "text": "hi"}, timeout=.2)
+
+
+def test_open_circuit_fails_fast_but_keeps_polling():
+    with FakeBotAPI() as api:
+        breaker = CircuitBreaker(threshold=2, reset_timeout=60.)
+        bot = bot_for(api, circuit_breaker=breaker)
+        api.inject("error", method="sendMessage", count=2)
+        for _ in range(2):
+            with pytest.raises(QueryException):
+                bot.sendMessage(Chat.by_id(5), "hi")
+        assert breaker.state == breaker.OPEN
+        with pytest.raises(CircuitOpen):
+            bot.sendMessage(Chat.by_id(5), "hi")
+        assert api.calls["sendMessage"] == 0
+        assert bot.getUpdates()["ok"]
+        # a polling answer is proof enough that the api is back
+        assert breaker.state == breaker.CLOSED
+        assert bot.sendMessage(Chat.by_id(5), "hi").text == "hi"
+
+
+def test_too_many_requests_waits_retry_after():
+    with FakeBotAPI() as api:
+        bot = bot_for(api, auto_retry=True)
+        api.inject("429", method="getChat", retry_after=1)
+        start = monotonic()
+        assert bot.getChat(5).id == 5
+        assert monotonic() - start >= 1
+        assert bot.metrics.retries.get("getChat", "too_many_requests") == 1
+        # without auto_retry it is raised
+        bot.auto_retry = False
+        api.inject("429", method="getChat", retry_after=1)
+        with pytest.raises(TooManyRequests) as e:
+            bot.getChat(5)
+        assert e.value.parameters == {"retry_after": 1}
@@ -0,0 +1,70 @@
+from telebotapi import Update
+from telebotapi.daemon import Condition, Filter, Forks
+from telebotapi.routing import Route, RouteIndex, command_of
+
+
+def text(body, chat_id=5, user_id=5):
+    return Update({"update_id": 1, "message": {"message_id": 1, "date": 0, "text": body,
+                                               "from": {"id": user_id, "is_bot": False, "first_name": "a"},
+                                               "chat": {"id": chat_id, "type": "private"}}}).content
+
+
+def callback(data, chat_id=5):
+    return Update({"update_id": 2, "callback_query": {
+        "id": "1", "data": data, "chat_instance": "1", "from": {"id": 5, "is_bot": False, "first_name": "a"},
+        "message": {"message_id": 1, "date": 0, "text": "pick", "chat": {"id": chat_id, "type": "private"}}}}).content
+
+
+def test_command_of():
+    assert command_of(text("/start@my_bot payload")) == "start"
+    assert command_of(text("/help")) == "help"
+    assert command_of(text("start")) is None
+    assert command_of(text("/")) is None
+
+
+def test_candidates_per_dimension_in_insertion_order():
+    index = RouteIndex()
+    index.add("any")
+    index.add("chat", Route(chat=5))
+    index.add("other", Route(chat=7))
+    index.add("user", Route(user=9))
+    index.add("start", Route(command="start"))
+    index.add("pick", Route(callback_prefix="pick:"))
+    index.add("chat-start", Route(chat=5, command="start"))
+    assert index.candidates(text("hello")) == ["any", "chat"]
+    assert index.candidates(text("/start", chat_id=7, user_id=9)) == ["any", "other", "user", "start"]
+    # indexed under the chat, the command is still checked
+    assert index.candidates(text("/start")) == ["any", "chat", "start", "chat-start"]
+    assert index.candidates(callback("pick:3")) == ["any", "chat", "pick"]
+    assert index.candidates(callback("drop:3")) == ["any", "chat"]
+
+
+def test_remove_and_readd():
+    index = RouteIndex()
+    index.add("a", Route(callback_prefix="a:"))
+    index.add("b", Route(chat=5))
+    index.remove("a")
+    index.remove("missing")
+    assert index.candidates(callback("a:1")) == ["b"]
+    assert index.prefixes == {} and index.prefix_lengths == {}
+    # adding a key again moves it to the end
+    index.add("a", Route(chat=5))
+    index.add("b", Route(chat=5))
+    assert index.candidates(text("x")) == ["a", "b"]
+    assert len(index) == 2 and "a" in index
+
+
+def test_forks_only_evaluate_routed_candidates():
+    evaluated = []
+
+    def watch(name):
+        return Filter(lambda m: evaluated.append(name) or False)
+
+    forks = Forks()
+    for chat_id in range(100):
+        forks.attach(completed=Condition(watch(chat_id), stop_return=True), route=Route(chat=chat_id))
+    forks.attach(completed=Condition(watch("any"), stop_return=True))
+    forks.send(Update({"update_id": 1, "message": {"message_id": 1, "date": 0, "text": "x",
+                                                   "chat": {"id": 42, "type": "private"}}}))
+    # completed is checked both before and after the other conditions
+    assert set(evaluated) == {42, "any"}
@@ -0,0 +1,148 @@
+import os
+import pytest
+from signal import SIGKILL
+from threading import Thread
+from time import sleep
+from telebotapi import TelegramBot
+from telebotapi.dispatcher import chat_key
+from telebotapi.sharding import HashRing, ShardedDispatcher, raw_chat_key
+from telebotapi.update import Update
+
+USER = {"id": 42, "is_bot": False, "first_name": "a"}
+GROUP = {"id": -1001, "type": "supergroup", "title": "g"}
+
+
+def message(chat):
+    return {"message_id": 1, "date": 0, "text": "hi", "from": USER, "chat": chat}
+
+
+UPDATES = [
+    {"update_id": 1, "message": message(GROUP)},
+    {"update_id": 2, "message": message({"id": 42, "type": "private", "first_name": "a"})},
+    {"update_id": 3, "edited_message": dict(message(GROUP), edit_date=1)},
+    {"update_id": 4, "channel_post": {"message_id": 1, "date": 0, "text": "hi",
+                                      "chat": {"id": -1002, "type": "channel", "title": "c"}}},
+    {"update_id": 5, "callback_query": {"id": "1", "from": USER, "chat_instance": "1", "data": "x",
+                                        "message": message(GROUP)}},
+]
+
+
+@pytest.mark.parametrize("raw", UPDATES, ids=lambda u: [k for k in u if k != "update_id"][0])
+@pytest.mark.parametrize("lazy", [False, True])
+def test_raw_chat_key_matches_dispatcher(raw, lazy):
+    assert raw_chat_key(raw) == chat_key(Update(raw, lazy=lazy))
+
+
+def test_group_callback_shares_the_group_shard():
+    ring = HashRing(8)
+    assert ring.shard(raw_chat_key(UPDATES[4])) == ring.shard(raw_chat_key(UPDATES[0])) == ring.shard(-1001)
+
+
+def crash_on_poison(index):
+    def handle(u):
+        if u.content.text == "poison":
+            os._exit(1)
+    return handle
+
+
+def test_worker_crashes_while_submitting():
+    # restarts race with submit(): every update is either handled or dropped as poison, and submit never raises
+    bot = TelegramBot("0" * 46, rate_limiter=False)
+    poison = {50, 120, 260}
+    with ShardedDispatcher(bot, crash_on_poison, workers=1, max_attempts=2, start_method="fork",
+                           check_interval=.05) as d:
+        for i in range(1, 401):
+            d.submit(Update({"update_id": i, "message": dict(message(GROUP), text="poison" if i in poison else "hi")}))
+        assert d.join(30)
+        stats = d.stats()["shards"][0]
+    assert stats["dropped"] == len(poison)
+    assert stats["acked"] == 400 - len(poison)
+    assert stats["restarts"] == 2 * len(poison)
+
+
+def handle_nothing(index):
+    return lambda u: None
+
+
+def test_submit_survives_restarts():
+    bot = TelegramBot("0" * 46, rate_limiter=False)
+    with ShardedDispatcher(bot, handle_nothing, workers=1, max_attempts=1000, start_method="fork",
+                           check_interval=.01) as d:
+        shard = d.shards[0]
+        done = []
+
+        def kill():
+            # a bounded number of kills spaced out enough for each new worker to get some work done
+            for _ in range(40):
+                if done:
+                    return
+                try:
+                    os.kill(shard.process.pid, SIGKILL)
+                except (ProcessLookupError, TypeError):
+                    # already reaped by the restart, or its replacement is not started yet
+                    pass
+                sleep(.01)
+
+        killer = Thread(target=kill)
+        killer.start()
+        try:
+            for i in range(1, 3001):
+                d.submit(Update({"update_id": i, "message": message(GROUP)}, lazy=True))
+        finally:
+            done.append(True)
+            killer.join()
+        assert d.join(30)
+        stats = d.stats()["shards"][0]
+    assert stats["acked"] == 3000 and stats["restarts"] > 0
+
+
+def test_ring_resize_only_moves_keys_to_the_new_shard():
+    keys = range(-5000, 5000)
+    small, big = HashRing(4), HashRing(5)
+    moved = [k for k in keys if small.shard(k) != big.shard(k)]
+    assert all(big.shard(k) == 4 for k in moved)
+    # about a fifth of the chats move, every shard gets its share
+    assert .1 < len(moved) / len(keys) < .3
+    counts = [0] * 5
+    for k in keys:
+        counts[big.shard(k)] += 1
+    assert min(counts) > len(keys) / 5 * .7
+    with pytest.raises(ValueError):
+        HashRing(0)
+
+
+def logging_to(path):
+    def setup(index):
+        def handle(u):
+            with open(path, "a") as f:
+                f.write(f"{index} {u.content.chat.id} {u.id}\n")
+        return handle
+    return setup
+
+
+def test_chats_stay_on_one_shard_in_order(tmp_path):
+    log = str(tmp_path / "handled.txt")
+    bot = TelegramBot("0" * 46, rate_limiter=False, offset_store=str(tmp_path / "offsets.jsonl"))
+    updates = [{"update_id": i, "message": message(dict(GROUP, id=-(i % 7) - 1))} for i in range(1, 201)]
+    bot.offset_store.received(updates)
+    with ShardedDispatcher(bot, logging_to(log), workers=3, start_method="fork") as d:
+        for u in updates:
+            d.submit(Update(u))
+        assert d.join(30)
+        assert sum(s["acked"] for s in d.stats()["shards"]) == 200
+    # everything acknowledged ends up in the offset store
+    assert bot.offset_store.offset == 201
+    shards, order = {}, {}
+    with open(log) as f:
+        for line in f:
+            index, chat, update_id = map(int, line.split())
+            shards.setdefault(chat, set()).add(index)
+            order.setdefault(chat, []).append(update_id)
+    assert len(order) == 7 and all(len(s) == 1 for s in shards.values())
+    assert all(ids == sorted(ids) for ids in order.values())
+    bot.close()
+
+
+def test_raw_payload_is_required():
+    with pytest.raises(ValueError):
+        ShardedDispatcher(TelegramBot("0" * 46, rate_limiter=False, keep_raw=False), handle_nothing)
@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+from telebotapi import Chat, FakeBotAPI, SessionTransport, TelegramBot
+
+TOKEN = "0" * 46
+
+
+def bot_for(transport):
+    bot = TelegramBot(TOKEN, transport=transport, rate_limiter=False)
+    bot.bootstrapped = True
+    return bot
+
+
+def test_urls():
+    t = SessionTransport("http://127.0.0.1:8081/")
+    assert t.url(TOKEN, "getMe") == f"http://127.0.0.1:8081/bot{TOKEN}/getMe"
+    assert t.file_url(TOKEN, "photos/a.jpg") == f"http://127.0.0.1:8081/file/bot{TOKEN}/photos/a.jpg"
+
+
+def test_sequential_queries_share_one_connection():
+    with FakeBotAPI() as api:
+        bot = bot_for(SessionTransport(api.base_url))
+        for i in range(20):
+            bot.sendMessage(Chat.by_id(i + 1), "hi")
+        stats = bot.connection_stats()
+        assert stats["connections"] == 1
+        assert stats["requests"] == 20 and stats["reused"] == 19
+        bot.transport.close()
+
+
+def test_concurrent_queries_stay_within_the_pool():
+    with FakeBotAPI(latency=.02) as api:
+        bot = bot_for(SessionTransport(api.base_url, pool_maxsize=2, pool_block=True))
+        with ThreadPoolExecutor(6) as ex:
+            list(ex.map(lambda i: bot.sendMessage(Chat.by_id(i + 1), "hi"), range(30)))
+        stats = bot.connection_stats()
+        assert stats["requests"] == 30
+        assert stats["connections"] <= 2
+        assert api.calls["sendMessage"] == 30
+        bot.transport.close()
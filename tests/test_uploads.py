@@ -0,0 +1,97 @@
+import io
+import os
+from email.parser import BytesParser
+from email.policy import HTTP
+from pathlib import Path
+import pytest
+from telebotapi import Chat, FakeBotAPI, SessionTransport, TelegramBot
+from telebotapi.uploads import InputFile, MultipartBody
+
+TOKEN = "0" * 46
+DATA = os.urandom(200 << 10)
+
+
+def parse(body):
+    data = body.read()
+    form = BytesParser(policy=HTTP).parsebytes(f"Content-Type: {body.content_type}\r\n\r\n".encode() + data)
+    return data, {p.get_param("name", header="content-disposition"): (p.get_filename(), p.get_content_type(),
+                                                                       p.get_payload(decode=True))
+                  for p in form.iter_parts()}
+
+
+def test_input_file_sources(tmp_path):
+    path = tmp_path / "photo.jpg"
+    path.write_bytes(DATA)
+    f = InputFile(path)
+    assert (f.kind, f.name, f.mime, f.size) == ("path", "photo.jpg", "image/jpeg", len(DATA))
+    assert InputFile(b"abc").size == 3 and InputFile(b"abc").name == "file"
+    with open(path, "rb") as r:
+        r.seek(10)
+        f = InputFile(r)
+        # an open file is uploaded from where it stands
+        assert (f.name, f.size) == ("photo.jpg", len(DATA) - 10)
+        assert b"".join(f.chunks()) == DATA[10:]
+    f = InputFile(iter([b"a"]), name="a.txt")
+    assert (f.kind, f.size, f.mime, f.replayable) == ("iterator", None, "text/plain", False)
+    with pytest.raises(TypeError):
+        InputFile(5)
+
+
+def test_body_encodes_fields_and_files():
+    body = MultipartBody({"chat_id": 5, "caption": 'say "hi"'}, {"document": InputFile(DATA, 'a "b".bin')},
+                         chunk_size=4096)
+    data, parts = parse(body)
+    assert len(data) == body.size == body.len
+    assert parts["chat_id"][2] == b"5"
+    assert parts["caption"][2] == b'say "hi"'
+    # quotes would end the header parameter early
+    assert parts["document"] == ("a %22b%22.bin", "application/octet-stream", DATA)
+
+
+def test_small_reads_and_rewind():
+    body = MultipartBody({"a": 1}, {"f": DATA}, chunk_size=1000)
+    first = b"".join(iter(lambda: body.read(777), b""))
+    assert len(first) == body.size and body.tell() == body.size
+    body.rewind()
+    assert body.tell() == 0
+    buf = bytearray(body.size)
+    assert body.readinto(buf) == body.size and bytes(buf) == first
+
+
+def test_iterator_cannot_be_sent_twice():
+    body = MultipartBody(files={"f": iter([b"a" * 10, b"b" * 10])})
+    assert body.size is None and not hasattr(body, "len")
+    body.rewind()
+    body.read(5)
+    with pytest.raises(MultipartBody.NotReplayable):
+        body.rewind()
+
+
+def test_progress():
+    seen = []
+    body = MultipartBody({"a": 1}, {"f": DATA}, progress=lambda sent, total: seen.append((sent, total)),
+                         chunk_size=1 << 14)
+    body.read()
+    sent = [s for s, _ in seen]
+    assert sent == sorted(sent) and sent[-1] == body.size
+    assert all(t == body.size for _, t in seen)
+    assert len(seen) > len(DATA) >> 14
+
+
+def test_upload_path_and_open_file(tmp_path):
+    path = tmp_path / "report.pdf"
+    path.write_bytes(DATA)
+    with FakeBotAPI() as api:
+        bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False)
+        bot.bootstrapped = True
+        seen = []
+        r = bot.sendDocument(Chat.by_id(5), Path(path), progress=lambda sent, total: seen.append((sent, total)))
+        assert r["result"]["document"]["file_name"] == "report.pdf"
+        assert r["result"]["document"]["file_size"] == len(DATA)
+        assert seen[-1][0] == seen[-1][1] == api.sent[-1][2]["upload"]
+        with open(path, "rb") as f:
+            r = bot.sendDocument(Chat.by_id(5), f, name="renamed.pdf")
+        assert r["result"]["document"]["file_name"] == "renamed.pdf"
+        m = bot.sendPhoto(Chat.by_id(5), io.BytesIO(DATA), caption="c")
+        assert m.photo.size == len(DATA)
+        assert api.sent[-1][2]["caption"] == "c"
@@ -0,0 +1,92 @@
+import threading
+from datetime import timedelta
+from time import monotonic
+import pytest
+from telebotapi import TelegramBot
+from telebotapi.daemon import Condition, ExpiredException, Filter, Forks, wait_for
+
+TOKEN = "0" * 46
+
+
+def text(i, chat_id=5):
+    return {"update_id": i, "message": {"message_id": i, "date": 0, "text": str(i),
+                                        "from": {"id": chat_id, "is_bot": False, "first_name": "a"},
+                                        "chat": {"id": chat_id, "type": "private"}}}
+
+
+def offline_bot():
+    bot = TelegramBot(TOKEN, rate_limiter=False)
+    bot.bootstrapped = True
+    return bot
+
+
+def later(delay, f, *args):
+    t = threading.Timer(delay, f, args)
+    t.start()
+    return t
+
+
+def completed(text_):
+    return Condition(Filter(lambda m: m.text == text_), stop_return=text_)
+
+
+def test_news_wakes_up_on_arrival():
+    bot = offline_bot()
+    assert not bot.news()
+    later(.1, bot.feed, [text(1)])
+    start = monotonic()
+    assert bot.news(5)
+    assert monotonic() - start < 1
+    # consumed by the first call
+    assert not bot.news()
+
+
+def test_wait_for_returns_as_soon_as_the_condition_is_met():
+    bot = offline_bot()
+    later(.1, bot.feed, [text(1)])
+    later(.2, bot.feed, [text(2)])
+    start = monotonic()
+    assert wait_for(bot, completed("2"), timeout=5) == "2"
+    assert monotonic() - start < 1
+
+
+def test_wait_for_times_out():
+    bot = offline_bot()
+    start = monotonic()
+    assert wait_for(bot, completed("1"), timeout=.3) is False
+    assert .3 <= monotonic() - start < 1
+
+
+def test_fork_join_wakes_up_on_finish():
+    forks = Forks()
+    id_ = forks.attach(completed=completed("1"))
+    bot = offline_bot()
+    bot.feed([text(1)])
+    later(.1, forks.send, bot.get_update())
+    start = monotonic()
+    forks.get(id_).join()
+    assert forks.get(id_).result == "1"
+    assert monotonic() - start < 1
+
+
+def test_fork_join_raises_on_expiry():
+    forks = Forks()
+    id_ = forks.attach(completed=completed("1"), timeout=timedelta(seconds=.2))
+    start = monotonic()
+    with pytest.raises(ExpiredException):
+        forks.get(id_).join()
+    assert monotonic() - start < 1.5
+
+
+def test_fork_join_follows_its_replacement():
+    forks = Forks()
+    id_ = forks.attach(completed=completed("1"))
+    old = forks.get(id_)
+    bot = offline_bot()
+    bot.feed([text(2)])
+    done = threading.Event()
+    threading.Thread(target=lambda: (old.join(), done.set()), daemon=True).start()
+    later(.1, lambda: forks.replace(id_, completed=completed("2"))).join()
+    forks.send(bot.get_update())
+    assert done.wait(1)
+    assert forks.get(id_).result == "2"
@@ -0,0 +1,113 @@
+from json import dumps
+from urllib.error import HTTPError
+from urllib.request import Request, urlopen
+import pytest
+from telebotapi import FakeBotAPI, SessionTransport, TelegramBot
+from telebotapi.exceptions import QueryException
+from telebotapi.webhook import SECRET_HEADER
+
+TOKEN = "0" * 46
+
+
+def text(i):
+    return {"update_id": i, "message": {"message_id": i, "date": 0, "text": "hi",
+                                        "from": {"id": 5, "is_bot": False, "first_name": "a"},
+                                        "chat": {"id": 5, "type": "private"}}}
+
+
+def unknown(i):
+    return {"update_id": i, "my_chat_member": {"chat": {"id": 5, "type": "private"}, "date": 0}}
+
+
+def post(server, update, path="/", headers=None):
+    host, port = server.address
+    body = update if isinstance(update, bytes) else dumps(update).encode()
+    r = Request(f"http://127.0.0.1:{port}{path}", body, dict(headers or {}, **{"Content-Type": "application/json"}))
+    try:
+        with urlopen(r) as resp:
+            return resp.status
+    except HTTPError as e:
+        return e.code
+
+
+def test_unknown_update_kind_is_acked_and_does_not_block_restart(tmp_path):
+    journal = str(tmp_path / "offsets.jsonl")
+    bot = TelegramBot(TOKEN, offset_store=journal, safe_mode=False)
+    server = bot.webhook(host="127.0.0.1", port=0)
+    assert post(server, unknown(10)) == 200
+    assert post(server, text(11)) == 200
+    assert len(bot.offset_store) == 1
+    bot.close()
+
+    bot = TelegramBot(TOKEN, offset_store=journal, safe_mode=False)
+    bot.webhook(host="127.0.0.1", port=0)
+    assert [u.id for u in bot.get_updates()] == [11]
+    bot.close()
+
+
+def test_replay_skips_entries_it_cannot_parse(tmp_path):
+    journal = str(tmp_path / "offsets.jsonl")
+    with open(journal, "w") as f:
+        # journaled by a version that did not acknowledge what it could not parse
+        for u in (text(1), unknown(2), text(3)):
+            f.write(dumps({"u": u}) + "\n")
+    bot = TelegramBot(TOKEN, offset_store=journal, safe_mode=False)
+    bot.webhook(host="127.0.0.1", port=0)
+    assert [u.id for u in bot.get_updates()] == [1, 3]
+    assert sorted(bot.offset_store.pending) == [1, 3]
+    bot.close()
+
+
+def test_secret_token_and_path():
+    bot = TelegramBot(TOKEN, rate_limiter=False)
+    server = bot.webhook(host="127.0.0.1", port=0, path="/hook", secret_token="s3cret")
+    try:
+        assert post(server, text(1), "/hook") == 403
+        assert post(server, text(1), "/hook", {SECRET_HEADER: "wrong"}) == 403
+        assert post(server, text(1), "/", {SECRET_HEADER: "s3cret"}) == 404
+        assert post(server, text(1), "/hook?x=1", {SECRET_HEADER: "s3cret"}) == 200
+        assert [u.id for u in bot.get_updates()] == [1]
+        assert server.stats() == {"received": 1, "duplicates": 0, "rejected": 2, "invalid": 0}
+    finally:
+        bot.close()
+
+
+def test_duplicates_and_invalid_bodies():
+    bot = TelegramBot(TOKEN, rate_limiter=False)
+    server = bot.webhook(host="127.0.0.1", port=0)
+    server.max_body = 1000
+    try:
+        assert post(server, text(1)) == 200
+        # telegram resends what it thinks timed out
+        assert post(server, text(1)) == 200
+        assert post(server, b"{not json") == 400
+        assert post(server, {"message": {}}) == 400
+        assert post(server, dict(text(2), padding="x" * 1000)) == 413
+        assert [u.id for u in bot.get_updates()] == [1]
+        assert server.stats() == {"received": 1, "duplicates": 1, "rejected": 0, "invalid": 2}
+    finally:
+        bot.close()
+
+
+def test_full_queue_asks_telegram_to_retry():
+    bot = TelegramBot(TOKEN, rate_limiter=False, max_updates=1)
+    server = bot.webhook(host="127.0.0.1", port=0)
+    try:
+        assert post(server, text(1)) == 200
+        assert post(server, text(2)) == 503
+        assert [u.id for u in bot.get_updates()] == [1]
+        # not remembered as seen, the resent update is queued
+        assert post(server, text(2)) == 200
+        assert [u.id for u in bot.get_updates()] == [2]
+    finally:
+        bot.close()
+
+
+def test_failed_set_webhook_stops_the_server():
+    with FakeBotAPI() as api:
+        bot = TelegramBot(TOKEN, transport=SessionTransport(api.base_url), rate_limiter=False)
+        with pytest.raises(QueryException):
+            # the fake server does not implement setWebhook
+            bot.webhook("https://example.org/hook", host="127.0.0.1", port=0, secret_token="s3cret")
+        assert bot.webhook_server is None and not bot.bootstrapped
+        assert api.sent[-1][1:] == ("setWebhook", {"url": "https://example.org/hook", "secret_token": "s3cret"})